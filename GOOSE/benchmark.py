@@ -0,0 +1,334 @@
+import os
+import sys
+import json
+import time
+import shutil
+import argparse
+import datetime
+import platform
+import tempfile
+import subprocess
+import itertools
+
+import cv2
+import numpy as np
+
+from core.frame_bus import FramePacket
+from core.replay import ReplaySource
+from core.tello_emulator import synthetic_frames
+
+CASES = ('detect', 'sampler', 'display', 'transcode')
+REPORT_VERSION = 1
+MODEL_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "assets", "models")
+
+def load_frames(source, count, width, height):
+    """
+    Loads the benchmark input into memory, so decoding never shows up in
+    the measurements: RGB frames from a recording/image folder, or the
+    emulator's deterministic synthetic pattern.
+    """
+    if source:
+        frames = [packet.frame for packet in itertools.islice(ReplaySource(source), count)]
+        if not frames:
+            raise ValueError(f"No frames in {source}")
+    else:
+        frames = list(itertools.islice(synthetic_frames(width, height), count))
+    return frames
+
+def summarize(latencies, items=None):
+    """
+    :param latencies: Seconds per call.
+    :param items: Items processed in total (default: one per call).
+    :return: Dict of latency percentiles (ms) and throughput (items/s)
+    """
+    ms = np.array(latencies) * 1000
+    total = float(np.sum(latencies))
+    return {
+        'calls': len(ms),
+        'mean_ms': round(float(ms.mean()), 3),
+        'p50_ms': round(float(np.percentile(ms, 50)), 3),
+        'p99_ms': round(float(np.percentile(ms, 99)), 3),
+        'fps': round((items or len(ms)) / total, 2) if total else None,
+    }
+
+def environment():
+    info = {
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'machine': platform.machine(),
+        'cpus': os.cpu_count(),
+        'numpy': np.__version__,
+        'opencv': cv2.__version__,
+    }
+    for module in ('onnxruntime', 'ultralytics', 'pygame'):
+        try:
+            info[module] = __import__(module).__version__
+        except Exception:
+            info[module] = None
+    try:
+        info['git_commit'] = subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True,
+                                            text=True, cwd=os.path.dirname(os.path.abspath(__file__))
+                                            ).stdout.strip() or None
+    except OSError:
+        info['git_commit'] = None
+    return info
+
+def find_models():
+    """The app's models from assets/models (.onnx and .pt), whichever exist."""
+    paths = [os.path.join(MODEL_DIR, name) for name in ("targetModel.onnx", "targetModel.pt")]
+    return [path for path in paths if os.path.exists(path)]
+
+def bench_detect(model_path, frames, backend='auto', threads=0, conf=0.5, warmup=10, batch=4):
+    """ObjectDetector.detect() latency/throughput on one model, plus batched throughput."""
+    from vision.detector import ObjectDetector
+
+    detector = ObjectDetector(model_path, backend=backend, num_threads=threads)
+    detector.load_model()
+    if detector.model is None:
+        return {'error': f"could not load {os.path.basename(model_path)} ({backend})"}
+
+    for frame in frames[:warmup]:
+        detector.detect(frame, conf, annotate=False)
+    latencies = []
+    detections = 0
+    for frame in frames:
+        start = time.perf_counter()
+        _, found = detector.detect(frame, conf, annotate=False)
+        latencies.append(time.perf_counter() - start)
+        detections += len(found)
+    result = dict(summarize(latencies), backend=detector.backend, detections=detections)
+
+    if batch > 1:
+        batch_latencies = []
+        for start_index in range(0, len(frames) - batch + 1, batch):
+            start = time.perf_counter()
+            detector.detect_batch(frames[start_index:start_index + batch], conf, max_batch=batch)
+            batch_latencies.append(time.perf_counter() - start)
+        if batch_latencies:
+            batched = summarize(batch_latencies, items=len(batch_latencies) * batch)
+            result.update(batch=batch, batch_p50_ms=batched['p50_ms'], batch_fps=batched['fps'])
+    return result
+
+def bench_sampler(frames, work_dir, workers=2):
+    """
+    HybridSampler write throughput: every frame is sampled (context rate =
+    stream rate, no dedup) and the queue blocks instead of dropping, so the
+    result is the rate frames are encoded and stored.
+    """
+    from vision.sampler import HybridSampler
+
+    sampler = HybridSampler(base_dir=os.path.join(work_dir, "sampler"), context_fps=30, stream_fps=30,
+                            dedup=False, drop_policy='block', write_workers=workers)
+    enqueue = []
+    start = time.perf_counter()
+    for index, frame in enumerate(frames):
+        call = time.perf_counter()
+        sampler.process_frame(frame, [], now=index / 30.0)
+        enqueue.append(time.perf_counter() - call)
+    sampler.close(timeout=None)
+    elapsed = time.perf_counter() - start
+
+    stats = sampler.write_stats
+    stored = sum(os.path.getsize(os.path.join(sampler.store.root, name))
+                 for name in os.listdir(sampler.store.root))
+    enqueued = summarize(enqueue)
+    return {
+        'written': stats['written'],
+        'fps': round(stats['written'] / elapsed, 2),
+        'mb_per_s': round(stored / elapsed / 1e6, 2),
+        'write_mean_ms': round(stats['write_ms_avg'], 3),
+        'enqueue_p50_ms': enqueued['p50_ms'],
+        'enqueue_p99_ms': enqueued['p99_ms'],
+    }
+
+def bench_display(frames, size=(960, 720), repeats=3):
+    """
+    main.py's display path: VideoView.draw() on a new frame (upload, format
+    conversion, scale if needed, blit) and on a repeated one (blit only).
+    Runs on SDL's dummy driver unless a video driver is set.
+    """
+    os.environ.setdefault('SDL_VIDEODRIVER', 'dummy')
+    import pygame
+    from core.display import VideoView
+
+    pygame.init()
+    window = pygame.display.set_mode(size)
+    view = VideoView(window, pygame.font.SysFont(None, 24))
+    new_frame, same_frame = [], []
+    seq = 0
+    for _ in range(repeats):
+        for frame in frames:
+            seq += 1
+            packet = FramePacket(seq, time.monotonic(), frame)
+            start = time.perf_counter()
+            view.draw(packet, [])
+            new_frame.append(time.perf_counter() - start)
+            start = time.perf_counter()
+            view.draw(packet, [])
+            same_frame.append(time.perf_counter() - start)
+    pygame.quit()
+    result = summarize(new_frame)
+    repeated = summarize(same_frame)
+    result.update(same_frame_p50_ms=repeated['p50_ms'], same_frame_p99_ms=repeated['p99_ms'])
+    return result
+
+def bench_transcode(frames, work_dir, codec='mp4v', fps=30.0):
+    """fix_recordings.fix_video() throughput on a legacy (R/B-swapped) recording made from the frames."""
+    from fix_recordings import fix_video
+
+    directory = os.path.join(work_dir, "transcode")
+    os.makedirs(directory, exist_ok=True)
+    source = os.path.join(directory, "legacy.mp4")
+    height, width = frames[0].shape[:2]
+    writer = cv2.VideoWriter(source, cv2.VideoWriter_fourcc(*'mp4v'), fps, (width, height))
+    for frame in frames:
+        writer.write(frame) # RGB written as-is, like the old recorder
+    writer.release()
+
+    # No sidecar: treated as a legacy recording (RGB2BGR of djitellopy < 2.4's BGR frames)
+    result = fix_video(source, codec=codec)
+    if result['status'] != 'fixed':
+        return {'error': f"transcode failed ({result['status']}); is the '{codec}' encoder available?"}
+    return {'frames': result['frames'], 'codec': codec,
+            'fps': round(result['frames'] / result['seconds'], 2) if result['seconds'] else None}
+
+def run_benchmarks(frames, cases, models, work_dir, backend='auto', threads=0, codec='mp4v', batch=4):
+    results = {}
+    if 'detect' in cases:
+        for model_path in models:
+            name = f"detect[{os.path.basename(model_path)}]"
+            print(f"[Benchmark] {name}...")
+            results[name] = bench_detect(model_path, frames, backend=backend, threads=threads, batch=batch)
+    if 'sampler' in cases:
+        print("[Benchmark] sampler...")
+        results['sampler'] = bench_sampler(frames, work_dir)
+    if 'display' in cases:
+        print("[Benchmark] display...")
+        results['display'] = bench_display(frames)
+    if 'transcode' in cases:
+        print("[Benchmark] transcode...")
+        results['transcode'] = bench_transcode(frames, work_dir, codec=codec)
+    return results
+
+def metric_direction(metric):
+    """+1 if higher is better, -1 if lower is better, 0 if not compared."""
+    if metric.endswith('_ms'):
+        return -1
+    if metric.endswith('fps') or metric.endswith('_per_s'):
+        return 1
+    return 0
+
+def time_per_item_ms(metric, value):
+    """A metric as milliseconds per item (frame, call, MB), so rates and latencies share one noise floor."""
+    if metric.endswith('_ms'):
+        return value
+    return 1000.0 / value if value else float('inf')
+
+def compare(report, baseline, tolerance=0.10, min_delta_ms=0.5):
+    """
+    Compares two reports metric by metric.
+    :param tolerance: Relative change in the bad direction that counts as a regression.
+    :param min_delta_ms: Smaller absolute changes (per item, see time_per_item_ms) are noise,
+                         however large relatively; a 1 ms stage moving by 0.2 ms isn't a regression.
+    :return: List of (case, metric, baseline value, new value, relative change, regressed)
+    """
+    rows = []
+    for case, metrics in report['results'].items():
+        old_metrics = baseline['results'].get(case, {})
+        for metric, value in metrics.items():
+            old = old_metrics.get(metric)
+            direction = metric_direction(metric)
+            if not direction or not isinstance(value, (int, float)) or not isinstance(old, (int, float)) or not old:
+                continue
+            change = (value - old) / old
+            delta_ms = abs(time_per_item_ms(metric, value) - time_per_item_ms(metric, old))
+            regressed = change * direction < -tolerance and delta_ms >= min_delta_ms
+            rows.append((case, metric, old, value, change, regressed))
+    return rows
+
+def print_comparison(rows, tolerance, min_delta_ms):
+    print(f"\n{'case':34} {'metric':18} {'baseline':>10} {'now':>10} {'change':>8}")
+    for case, metric, old, value, change, regressed in rows:
+        flag = "  REGRESSION" if regressed else ""
+        print(f"{case:34} {metric:18} {old:10.2f} {value:10.2f} {change:+8.1%}{flag}")
+    regressions = sum(1 for row in rows if row[-1])
+    print(f"\n{regressions} regression(s) beyond {tolerance:.0%} and {min_delta_ms} ms.")
+    return regressions
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Benchmark the vision and I/O hot paths on recorded frames.")
+    parser.add_argument("source", nargs="?", default=None,
+                        help="Recording or image folder to use (default: synthetic frames)")
+    parser.add_argument("--frames", type=int, default=200, help="Frames to load and run through each case")
+    parser.add_argument("--width", type=int, default=960, help="Synthetic frame width")
+    parser.add_argument("--height", type=int, default=720, help="Synthetic frame height")
+    parser.add_argument("--cases", default=",".join(CASES), help=f"Comma-separated subset of {','.join(CASES)}")
+    parser.add_argument("--model", action="append", default=None,
+                        help="Model to benchmark (repeatable; default: targetModel.onnx and .pt)")
+    parser.add_argument("--backend", choices=['auto', 'onnxruntime', 'ultralytics'], default='auto',
+                        help="Inference backend for .onnx models")
+    parser.add_argument("--threads", type=int, default=0, help="onnxruntime threads (0 = library default)")
+    parser.add_argument("--batch", type=int, default=4, help="Batch size for the detect_batch measurement (1 = skip)")
+    parser.add_argument("--codec", default='mp4v',
+                        help="FourCC for the transcode case (avc1 needs an H.264 encoder in OpenCV)")
+    parser.add_argument("--out", default="benchmark.json", help="Where to write the JSON report")
+    parser.add_argument("--baseline", default=None, help="Report to compare against")
+    parser.add_argument("--tolerance", type=float, default=0.10,
+                        help="Relative slowdown that counts as a regression (default 10%%)")
+    parser.add_argument("--min-delta-ms", type=float, default=0.5,
+                        help="Ignore changes smaller than this many ms per frame/call (default 0.5)")
+    return parser.parse_args()
+
+def main():
+    args = parse_args()
+    cases = [case.strip() for case in args.cases.split(",") if case.strip()]
+    unknown = set(cases) - set(CASES)
+    if unknown:
+        print(f"Unknown case(s): {', '.join(sorted(unknown))}")
+        return 2
+    models = args.model or find_models()
+    if 'detect' in cases and not models:
+        print("No models found; skipping the detect case. Pass --model <path>.")
+
+    frames = load_frames(args.source, args.frames, args.width, args.height)
+    print(f"[Benchmark] {len(frames)} frame(s) of {frames[0].shape[1]}x{frames[0].shape[0]} "
+          f"from {args.source or 'synthetic pattern'}")
+
+    work_dir = tempfile.mkdtemp(prefix="goose_bench_")
+    try:
+        results = run_benchmarks(frames, cases, models, work_dir, backend=args.backend,
+                                 threads=args.threads, codec=args.codec, batch=args.batch)
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+    report = {
+        'version': REPORT_VERSION,
+        'created': datetime.datetime.now().isoformat(timespec='seconds'),
+        'environment': environment(),
+        'config': {'source': args.source, 'frames': len(frames),
+                   'frame_size': [frames[0].shape[1], frames[0].shape[0]],
+                   'backend': args.backend, 'threads': args.threads, 'batch': args.batch,
+                   'codec': args.codec},
+        'results': results,
+    }
+    with open(args.out, "w") as f:
+        json.dump(report, f, indent=1)
+    print(f"\nReport written to {args.out}")
+    for case, metrics in results.items():
+        print(f"  {case}: {metrics}")
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        if baseline.get('config', {}).get('frame_size') != report['config']['frame_size']:
+            print("Warning: baseline was measured on a different frame size.")
+        if baseline.get('environment', {}).get('machine') != report['environment']['machine'] or \
+                baseline.get('environment', {}).get('cpus') != report['environment']['cpus']:
+            print("Warning: baseline comes from a different machine; numbers may not be comparable.")
+        rows = compare(report, baseline, args.tolerance, args.min_delta_ms)
+        if print_comparison(rows, args.tolerance, args.min_delta_ms):
+            return 1
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,229 @@
+import json
+import struct
+import threading
+import time
+
+import numpy as np
+
+COURSE_MAGIC = b'GCR1'
+# One fixed-size record per event: seconds since start, event type, lr/fb/ud/yv
+EVENT_DTYPE = np.dtype([('t', '<f8'), ('event', 'u1'), ('rc', 'i1', (4,))])
+EVENT_RECORD = struct.Struct('<dB4b')
+EVENTS = ('rc', 'takeoff', 'land', 'emergency')
+EVENT_CODES = {name: code for code, name in enumerate(EVENTS)}
+
+# The last stretch before an event is busy-waited for sub-millisecond accuracy
+SPIN_WINDOW = 0.002
+
+
+class CourseRecorder:
+    """
+    Records flight commands into a compact binary course log: a JSON header
+    followed by fixed 13-byte records (monotonic offset, event, RC values).
+    RC commands are recorded when they change, since the RC target is held
+    until the next one; takeoff/land/emergency are always recorded.
+    """
+    def __init__(self, path, session=None):
+        """
+        :param path: Output file (e.g. recordings/<session>.course).
+        :param session: Name of the matching video session, stored in the header.
+        """
+        self.path = path
+        self.start = time.monotonic()
+        self.count = 0
+        self._last_rc = None
+        self._lock = threading.Lock()
+
+        header = json.dumps({
+            'start_monotonic': self.start,
+            'start_wallclock': time.time(),
+            'session': session,
+            'events': list(EVENTS),
+        }).encode()
+        self._file = open(path, 'wb')
+        self._file.write(COURSE_MAGIC + struct.pack('<I', len(header)) + header)
+
+    def record(self, event, rc=(0, 0, 0, 0), timestamp=None):
+        """
+        :param event: One of EVENTS.
+        :param rc: (lr, fb, ud, yv) for 'rc' events.
+        :param timestamp: time.monotonic() of the command (defaults to now).
+        """
+        if timestamp is None:
+            timestamp = time.monotonic()
+        rc = tuple(int(v) for v in rc)
+        with self._lock:
+            if self._file is None:
+                return
+            if event == 'rc':
+                if rc == self._last_rc:
+                    return
+                self._last_rc = rc
+            self._file.write(EVENT_RECORD.pack(timestamp - self.start, EVENT_CODES[event], *rc))
+            self.count += 1
+
+    def close(self):
+        with self._lock:
+            if self._file:
+                self._file.close()
+                self._file = None
+
+
+def load_course(path):
+    """
+    Loads a course log in one read.
+    :return: Tuple(header dict, structured array with EVENT_DTYPE)
+    """
+    with open(path, 'rb') as f:
+        data = f.read()
+    if data[:4] != COURSE_MAGIC:
+        raise ValueError(f"{path} is not a course log")
+    header_len = struct.unpack_from('<I', data, 4)[0]
+    header = json.loads(data[8:8 + header_len])
+    body = data[8 + header_len:]
+    count = len(body) // EVENT_DTYPE.itemsize # A torn last record is ignored
+    return header, np.frombuffer(body, dtype=EVENT_DTYPE, count=count)
+
+
+class CoursePlayer(threading.Thread):
+    """
+    Re-issues a recorded course on a controller with the original timing.
+
+    Events are scheduled on absolute monotonic deadlines (sleep, then a
+    short busy-wait), so errors don't accumulate over long courses. The
+    speed factor can change during playback, and seek() jumps to any
+    point, restoring the RC state that was active there.
+    """
+    def __init__(self, controller, events, speed=1.0):
+        """
+        :param controller: Anything with send_rc_control/takeoff/land/emergency.
+        :param events: Structured array from load_course().
+        :param speed: Playback speed factor (> 0).
+        """
+        super().__init__(daemon=True)
+        self.controller = controller
+        self.events = events
+        self.speed = self._check_speed(speed)
+        self.position = 0 # Index of the next event
+        self.lateness = [] # Seconds each event was issued after its deadline
+        self._cond = threading.Condition()
+        self._running = True
+        self._paused = False
+        self._paused_at = 0.0
+        self._origin = None # Monotonic time that corresponds to course time 0
+
+    @property
+    def duration(self):
+        return float(self.events['t'][-1]) if len(self.events) else 0.0
+
+    @property
+    def playing(self):
+        return self.is_alive() and not self._paused
+
+    @property
+    def course_time(self):
+        """Current position in course seconds (frozen while paused)."""
+        with self._cond:
+            if self._paused:
+                return self._paused_at
+            if self._origin is None:
+                return 0.0
+            return (time.monotonic() - self._origin) * self.speed
+
+    def _rebase(self, course_time):
+        self._origin = time.monotonic() - course_time / self.speed
+
+    @staticmethod
+    def _check_speed(speed):
+        # Deadlines divide by the speed; zero or negative would stall or run the course backwards
+        if not speed > 0:
+            raise ValueError(f"Playback speed must be positive, got {speed}")
+        return speed
+
+    def set_speed(self, speed):
+        speed = self._check_speed(speed)
+        with self._cond:
+            current = self.course_time
+            self.speed = speed
+            self._rebase(current)
+            self._cond.notify()
+
+    def _active_rc(self):
+        """RC state set by the last rc event before the current position."""
+        rc_before = np.nonzero(self.events['event'][:self.position] == EVENT_CODES['rc'])[0]
+        return tuple(self.events['rc'][rc_before[-1]].tolist()) if len(rc_before) else (0, 0, 0, 0)
+
+    def seek(self, course_time):
+        """Jumps to course_time (seconds) and applies the RC state active at that point."""
+        with self._cond:
+            course_time = min(max(0.0, course_time), self.duration)
+            self.position = int(np.searchsorted(self.events['t'], course_time, side='left'))
+            rc = self._active_rc()
+            self._rebase(course_time)
+            if self._paused:
+                self._paused_at = course_time # Resume from here
+                rc = (0, 0, 0, 0) # Stay put until resumed
+            self._cond.notify()
+        self.controller.send_rc_control(*rc)
+
+    def pause(self):
+        with self._cond:
+            self._paused_at = self.course_time
+            self._paused = True
+        self.controller.send_rc_control(0, 0, 0, 0)
+
+    def resume(self):
+        with self._cond:
+            self._paused = False
+            self._rebase(self._paused_at)
+            rc = self._active_rc()
+            self._cond.notify()
+        self.controller.send_rc_control(*rc)
+
+    def _dispatch(self, event):
+        name = EVENTS[event['event']]
+        if name == 'rc':
+            self.controller.send_rc_control(*event['rc'].tolist())
+        else:
+            getattr(self.controller, name)()
+
+    def run(self):
+        with self._cond:
+            if self._origin is None:
+                self._rebase(0.0)
+        print(f"[Course] Playing {len(self.events)} events ({self.duration:.1f}s) at {self.speed}x")
+        while self._running:
+            with self._cond:
+                if self.position >= len(self.events):
+                    break
+                if self._paused:
+                    self._cond.wait(0.1)
+                    continue
+                event = self.events[self.position]
+                deadline = self._origin + event['t'] / self.speed
+                remaining = deadline - time.monotonic()
+                if remaining > SPIN_WINDOW:
+                    # Wake early; seek/speed changes notify and re-plan
+                    self._cond.wait(remaining - SPIN_WINDOW)
+                    continue
+                position = self.position
+            while time.monotonic() < deadline:
+                pass
+            with self._cond:
+                if self.position != position or self._paused:
+                    continue # Seeked or paused while spinning
+                self.position += 1
+            self.lateness.append(time.monotonic() - deadline)
+            self._dispatch(event)
+        self.controller.send_rc_control(0, 0, 0, 0)
+        if self.lateness:
+            late_ms = np.array(self.lateness) * 1000
+            print(f"[Course] Finished. Timing error: mean {late_ms.mean():.3f} ms, "
+                  f"max {late_ms.max():.3f} ms")
+
+    def stop(self):
+        with self._cond:
+            self._running = False
+            self._cond.notify()
+        if self.is_alive():
+            self.join()
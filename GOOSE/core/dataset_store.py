@@ -0,0 +1,229 @@
+import argparse
+import datetime
+import glob
+import json
+import os
+import struct
+import threading
+import time
+
+import cv2
+import numpy as np
+
+# Record layout inside a shard: magic, meta length, payload length, meta JSON, payload
+RECORD_MAGIC = b'GSR1'
+RECORD_HEADER = struct.Struct('<4sII')
+SHARD_EXT = '.gsr'
+INDEX_EXT = '.idx'
+SHARD_BYTES = 256 * 1024 * 1024
+
+
+class DatasetWriter:
+    """
+    Append-only store for sampled frames, packed into large shard files.
+
+    Each record is the encoded frame plus JSON metadata (capture time,
+    sampling reason, detections). A shard is self-describing; next to it,
+    an index file gets one JSON line per record with its offset and
+    metadata, so readers can filter and seek without opening the shards.
+    The frame bytes are written before their index line, so a crash can
+    only lose the last record, never corrupt the index.
+
+    Every writer owns its own shards (named after its session), so several
+    processes can add to the same root directory safely.
+    """
+    def __init__(self, root, session=None, shard_bytes=SHARD_BYTES):
+        """
+        :param root: Directory holding the shards and their indexes.
+        :param session: Prefix for shard names and record ids (default: timestamp + pid).
+        :param shard_bytes: Size after which a new shard is started.
+        """
+        self.root = os.path.abspath(root)
+        os.makedirs(self.root, exist_ok=True)
+        self.session = session or f"{datetime.datetime.now().strftime('%Y%m%d_%H%M%S')}_{os.getpid()}"
+        self.shard_bytes = shard_bytes
+
+        self._lock = threading.Lock()
+        self._shard_index = -1
+        self._shard = None
+        self._index = None
+        self._count = 0
+
+    def _shard_name(self, index):
+        return f"{self.session}_{index:03d}"
+
+    def _open_shard(self):
+        self._close_shard()
+        self._shard_index += 1
+        base = os.path.join(self.root, self._shard_name(self._shard_index))
+        self._shard = open(base + SHARD_EXT, 'ab')
+        self._index = open(base + INDEX_EXT, 'a')
+
+    def _close_shard(self):
+        if self._shard:
+            self._shard.close()
+            self._index.close()
+            self._shard = self._index = None
+
+    def append(self, payload, meta):
+        """
+        Appends one record. Thread-safe; writes are serialized.
+        :param payload: Encoded frame bytes (e.g. JPEG).
+        :param meta: JSON-serializable metadata (reason, time, detections, ...).
+        :return: The record id.
+        """
+        with self._lock:
+            if self._shard is None or self._shard.tell() >= self.shard_bytes:
+                self._open_shard()
+            record_id = f"{self.session}_{self._count:07d}"
+            self._count += 1
+            meta = dict(meta, id=record_id)
+            meta_bytes = json.dumps(meta).encode()
+
+            offset = self._shard.tell()
+            self._shard.write(RECORD_HEADER.pack(RECORD_MAGIC, len(meta_bytes), len(payload)))
+            self._shard.write(meta_bytes)
+            self._shard.write(payload)
+            self._shard.flush()
+
+            entry = dict(meta, shard=self._shard_name(self._shard_index), offset=offset,
+                         meta_len=len(meta_bytes), length=len(payload))
+            self._index.write(json.dumps(entry) + "\n")
+            self._index.flush()
+        return record_id
+
+    def __len__(self):
+        return self._count
+
+    def close(self):
+        with self._lock:
+            self._close_shard()
+
+
+def scan_shard(path):
+    """Rebuilds index entries from a shard alone (e.g. if its index was lost)."""
+    name = os.path.splitext(os.path.basename(path))[0]
+    entries = []
+    with open(path, 'rb') as f:
+        while True:
+            offset = f.tell()
+            header = f.read(RECORD_HEADER.size)
+            if len(header) < RECORD_HEADER.size:
+                break
+            magic, meta_len, length = RECORD_HEADER.unpack(header)
+            if magic != RECORD_MAGIC:
+                break
+            meta_bytes = f.read(meta_len)
+            f.seek(length, os.SEEK_CUR)
+            if len(meta_bytes) < meta_len or f.tell() > os.fstat(f.fileno()).st_size:
+                break # Truncated last record
+            entries.append(dict(json.loads(meta_bytes), shard=name, offset=offset,
+                                meta_len=meta_len, length=length))
+    return entries
+
+
+class DatasetReader:
+    """
+    Reads a DatasetWriter root: random access by position or id, and a
+    streaming iterator that walks each shard sequentially.
+    """
+    def __init__(self, root):
+        self.root = os.path.abspath(root)
+        self.entries = []
+        for shard_path in sorted(glob.glob(os.path.join(self.root, '*' + SHARD_EXT))):
+            self.entries.extend(self._load_index(shard_path))
+        self._by_id = {e['id']: i for i, e in enumerate(self.entries)}
+        self._files = {}
+
+    @staticmethod
+    def _load_index(shard_path):
+        index_path = os.path.splitext(shard_path)[0] + INDEX_EXT
+        if not os.path.exists(index_path):
+            return scan_shard(shard_path)
+        entries = []
+        with open(index_path) as f:
+            for line in f:
+                try:
+                    entries.append(json.loads(line))
+                except ValueError:
+                    break # Partially written last line
+        return entries
+
+    def __len__(self):
+        return len(self.entries)
+
+    def _file(self, shard):
+        f = self._files.get(shard)
+        if f is None:
+            f = self._files[shard] = open(os.path.join(self.root, shard + SHARD_EXT), 'rb')
+        return f
+
+    def read_bytes(self, entry):
+        """Returns the encoded frame of an index entry."""
+        f = self._file(entry['shard'])
+        f.seek(entry['offset'] + RECORD_HEADER.size + entry['meta_len'])
+        return f.read(entry['length'])
+
+    @staticmethod
+    def decode(payload):
+        """Decodes stored bytes into a BGR frame."""
+        return cv2.imdecode(np.frombuffer(payload, dtype=np.uint8), cv2.IMREAD_COLOR)
+
+    def __getitem__(self, key):
+        """
+        :param key: Position in the index or record id.
+        :return: Tuple(index entry, BGR frame)
+        """
+        entry = self.entries[self._by_id[key] if isinstance(key, str) else key]
+        return entry, self.decode(self.read_bytes(entry))
+
+    def select(self, reason=None):
+        """Index entries, optionally only those sampled for one reason ('context'/'uncertain')."""
+        return [e for e in self.entries if reason is None or e.get('reason') == reason]
+
+    def iter_records(self, reason=None, decode=False):
+        """
+        Streams records in storage order, one sequential pass per shard.
+        :param reason: Only yield records with this sampling reason.
+        :param decode: Yield decoded BGR frames instead of encoded bytes.
+        :return: Iterator of (index entry, bytes or frame)
+        """
+        for entry in self.select(reason):
+            payload = self.read_bytes(entry)
+            yield entry, self.decode(payload) if decode else payload
+
+    def export(self, out_dir, reason=None):
+        """Writes records back out as <id>.jpg files (no re-encoding)."""
+        os.makedirs(out_dir, exist_ok=True)
+        count = 0
+        for entry, payload in self.iter_records(reason):
+            with open(os.path.join(out_dir, f"{entry['id']}.jpg"), 'wb') as f:
+                f.write(payload)
+            count += 1
+        return count
+
+    def close(self):
+        for f in self._files.values():
+            f.close()
+        self._files = {}
+
+
+def wallclock(monotonic_time):
+    """Converts a time.monotonic() capture time into a Unix timestamp."""
+    return time.time() - (time.monotonic() - monotonic_time)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Inspect or export a packed sample store.")
+    parser.add_argument("root", nargs="?", default="./flight_data", help="Store directory")
+    parser.add_argument("--reason", choices=['context', 'uncertain'], default=None)
+    parser.add_argument("--export", metavar="DIR", help="Write the records out as JPEG files")
+    args = parser.parse_args()
+
+    reader = DatasetReader(args.root)
+    selected = reader.select(args.reason)
+    shards = len({e['shard'] for e in reader.entries})
+    print(f"{len(reader)} record(s) in {shards} shard(s); {len(selected)} selected.")
+    if args.export:
+        print(f"Exported {reader.export(args.export, args.reason)} image(s) to {args.export}")
+    reader.close()
@@ -0,0 +1,103 @@
+import numpy as np
+import pygame
+
+from vision.ring_detector import ring_outline
+
+
+class VideoView:
+    """
+    Pygame video view that avoids per-tick frame copies.
+
+    A new frame is wrapped as a pygame surface directly on top of its numpy
+    buffer (no rot90/flipud, no intermediate array) and converted once into a
+    preallocated, display-format surface, scaled there if the window size
+    differs. UI ticks without a new frame only blit that surface. R/B
+    handling is a choice of pixel format, not a per-frame cvtColor, and
+    overlays are drawn on the window surface, never on the frame.
+    """
+    LABEL_CACHE_SIZE = 256
+
+    def __init__(self, window, font):
+        """
+        :param window: The pygame display surface.
+        :param font: pygame font used for labels and OSD text.
+        """
+        self.window = window
+        self.font = font
+        self.size = window.get_size()
+        self.swap_rb = False
+
+        self._display = pygame.Surface(self.size).convert() # Reused every frame
+        self._staging = None # Frame-sized surface, only needed when scaling
+        self._frame_seq = None
+        self._frame_size = None
+        self._labels = {}
+
+    def toggle_swap_rb(self):
+        """Switches between showing raw frames as RGB or as BGR."""
+        self.swap_rb = not self.swap_rb
+        self._frame_seq = None # Re-upload the current frame with the new format
+        return self.swap_rb
+
+    def _upload(self, packet):
+        frame = np.ascontiguousarray(packet.frame) # No-op for decoder output
+        height, width = frame.shape[:2]
+        source = pygame.image.frombuffer(frame, (width, height), 'BGR' if self.swap_rb else 'RGB')
+        if (width, height) == self.size:
+            self._display.blit(source, (0, 0))
+        else:
+            # transform.scale needs matching formats, so convert at frame size first
+            if self._staging is None or self._staging.get_size() != (width, height):
+                self._staging = pygame.Surface((width, height)).convert()
+            self._staging.blit(source, (0, 0))
+            pygame.transform.scale(self._staging, self.size, self._display)
+
+        self._frame_seq = packet.seq
+        self._frame_size = (width, height)
+
+    def text(self, text, color):
+        """Returns a rendered label, cached since most labels repeat frame to frame."""
+        key = (text, color)
+        surface = self._labels.get(key)
+        if surface is None:
+            if len(self._labels) >= self.LABEL_CACHE_SIZE:
+                self._labels.clear()
+            surface = self._labels[key] = self.font.render(text, True, color)
+        return surface
+
+    def draw_detections(self, detections):
+        """
+        Draws boxes, centers, labels and fitted ring outlines (RingDetector
+        estimates) on the window, scaled from frame coordinates.
+        """
+        if not self._frame_size:
+            return
+        sx = self.size[0] / self._frame_size[0]
+        sy = self.size[1] / self._frame_size[1]
+        for d in detections:
+            x1, y1, x2, y2 = d['box']
+            rect = pygame.Rect(int(x1 * sx), int(y1 * sy), int((x2 - x1) * sx), int((y2 - y1) * sy))
+            pygame.draw.rect(self.window, (0, 255, 0), rect, 2)
+
+            if 'radius' in d:
+                outline = ring_outline(d) * (sx, sy)
+                pygame.draw.lines(self.window, (255, 255, 0), True, outline.tolist(), 2)
+
+            cx, cy = d['center']
+            pygame.draw.circle(self.window, (255, 0, 0), (int(cx * sx), int(cy * sy)), 5)
+
+            track_id = d.get('track_id')
+            id_text = f"ID: {track_id} " if track_id is not None else ""
+            label = self.text(f"{id_text}{d['name']} {d['conf']:.2f}", (0, 255, 0))
+            self.window.blit(label, (rect.x, rect.y - label.get_height() - 2))
+
+    def draw(self, packet, detections):
+        """
+        Draws the frame and its overlays onto the window.
+        :param packet: FramePacket to show; uploaded only if it is new.
+        :param detections: Detection dicts in frame coordinates.
+        """
+        if packet.seq != self._frame_seq:
+            self._upload(packet)
+        self.window.blit(self._display, (0, 0))
+        self.draw_detections(detections)
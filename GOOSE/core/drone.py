@@ -1,18 +1,98 @@
 from djitellopy import Tello
+from collections import deque
+import importlib.metadata
+import re
+import threading
 import time
 
+import numpy as np
+
+from core.course import CourseRecorder
+from core.frame_bus import FrameBus
+from core.metrics import metrics
+from core.telemetry import TelemetryMonitor
+from core.video_ingest import VideoIngest
+
+# djitellopy release that switched its reader from cv2.VideoCapture (BGR) to PyAV (RGB)
+DJITELLOPY_RGB_SINCE = (2, 4)
+
+def djitellopy_version():
+    """(major, minor) of the installed djitellopy, or None if its metadata is missing."""
+    try:
+        match = re.match(r"(\d+)\.(\d+)", importlib.metadata.version("djitellopy"))
+    except importlib.metadata.PackageNotFoundError:
+        return None
+    return (int(match.group(1)), int(match.group(2))) if match else None
+
+def ingest_frame_order(ingest):
+    """
+    Channel order of the frames an ingest delivers.
+    The native ingest converts to rgb24. djitellopy >= 2.4 decodes with PyAV and
+    stores frame.to_image() (RGB); older releases read the stream through
+    cv2.VideoCapture, which delivers BGR. Unknown versions count as current.
+    """
+    if ingest == "native":
+        return 'RGB'
+    version = djitellopy_version()
+    return 'BGR' if version and version < DJITELLOPY_RGB_SINCE else 'RGB'
+
 class DroneController:
-    def __init__(self):
+    # How often the pump checks djitellopy's reader for a new frame object
+    FRAME_PUMP_INTERVAL = 0.002
+    # RC ticks whose timing is kept for the jitter statistics
+    JITTER_WINDOW = 500
+    # Longest wait for the first decoded frame after 'streamon'
+    STREAM_TIMEOUT = 5.0
+
+    def __init__(self, rc_hz=20.0, rc_keepalive=0.5, ingest="native", decoder_threads=2, ingest_size=None):
+        """
+        :param rc_hz: Rate of the RC control loop.
+        :param rc_keepalive: Resend an unchanged RC command after this many seconds.
+        :param ingest: 'native' (own low-latency decoder, see core.video_ingest)
+                       or 'djitellopy' (djitellopy's frame reader).
+        :param decoder_threads: H.264 decoder threads for the native ingest.
+        :param ingest_size: (width, height) the native ingest scales frames to while
+                            converting them, or None for the stream's own size.
+        """
         self.tello = None
         self.is_connected = False
         self.frame_reader = None
+        self.ingest_mode = ingest
+        self.decoder_threads = decoder_threads
+        self.ingest_size = ingest_size
+        self.ingest = None # VideoIngest in native mode
+        self.frame_order = ingest_frame_order(ingest) # Channel order of published frames
+        self.frame_bus = FrameBus()
+        self._pump_thread = None
+        self._pump_running = False
+        self.telemetry = None # TelemetryMonitor, started on connect
+        self.course_recorder = None # CourseRecorder while a course is being recorded
 
-    def connect(self, host="192.168.10.1", port=8889):
-        """Connects to the Tello drone and starts video stream with optimizations."""
+        # RC target written by any thread; replacing the tuple is atomic, so no lock
+        self.rc_period = 1.0 / rc_hz
+        self.rc_keepalive = rc_keepalive
+        self._rc_target = (0, 0, 0, 0)
+        self._control_thread = None
+        self._control_running = False
+        self._tick_lateness = deque(maxlen=self.JITTER_WINDOW)
+        self.control_counts = {'ticks': 0, 'sent': 0, 'coalesced': 0, 'keepalive': 0, 'overruns': 0}
+
+    def connect(self, host="192.168.10.1", port=8889, video_port=Tello.VS_UDP_PORT):
+        """
+        Connects to the Tello drone and starts video stream with optimizations.
+        :param video_port: Local UDP port for this drone's video; several drones
+                           on one machine each need their own.
+        """
         try:
-            self.tello = Tello(host=host, port=port)
+            # djitellopy always sends to port 8889; a different port (e.g. the
+            # local emulator's) is set on the command address directly
+            self.tello = Tello(host=host, vs_udp=video_port)
+            self.tello.address = (host, port)
             self.tello.connect()
             print(f"Connected to {host}:{port}. Battery: {self.tello.get_battery()}%")
+            if video_port != Tello.VS_UDP_PORT:
+                self.tello.change_vs_udp(video_port)
+            self._start_telemetry()
             
             # --- VIDEO OPTIMIZATIONS ---
             # Set to max quality as suggested
@@ -20,6 +100,21 @@ class DroneController:
             self.tello.set_video_resolution(Tello.RESOLUTION_720P)
             
             self.tello.streamoff() # Reset stream
+            if self.ingest_mode == "native":
+                # Listen before 'streamon' so the first keyframe isn't missed, then
+                # wait exactly as long as the first frame takes to decode
+                self._start_ingest(video_port)
+                self.tello.streamon()
+                print("Starting video stream, waiting for the first keyframe...")
+                ready = self.ingest.wait_ready(self.STREAM_TIMEOUT)
+                self._start_control_loop()
+                self.is_connected = True # Still connected, might just need more time
+                if ready:
+                    print("Video stream initialized successfully.")
+                else:
+                    print("Warning: Stream initialized but no frames received yet.")
+                return
+
             self.tello.streamon()
             
             # Stabilization delay: Tello needs a moment to start the UDP stream 
@@ -29,6 +124,8 @@ class DroneController:
             
             # Background thread that captures frames
             self.frame_reader = self.tello.get_frame_read()
+            self._start_frame_pump()
+            self._start_control_loop()
             
             # Test frame grab
             if self.frame_reader.frame is not None:
@@ -42,9 +139,167 @@ class DroneController:
             print(f"Connection Error: {e}")
             self.is_connected = False
 
+    def _start_ingest(self, video_port):
+        """Starts the native receiver/decoder, publishing straight onto a fresh frame bus."""
+        self._stop_ingest()
+        self.frame_bus = FrameBus()
+        self.ingest = VideoIngest(self.frame_bus, port=video_port, threads=self.decoder_threads,
+                                  output_size=self.ingest_size)
+        self.ingest.start()
+
+    def _stop_ingest(self):
+        ingest, self.ingest = self.ingest, None
+        if ingest:
+            ingest.stop()
+        self.frame_bus.close()
+
+    def _start_frame_pump(self):
+        """Starts the thread that republishes djitellopy frames on the frame bus."""
+        self._stop_frame_pump()
+        self.frame_bus = FrameBus()
+        self._pump_running = True
+        self._pump_thread = threading.Thread(target=self._pump_frames, daemon=True)
+        self._pump_thread.start()
+
+    def _stop_frame_pump(self):
+        self._pump_running = False
+        if self._pump_thread:
+            self._pump_thread.join(timeout=1.0)
+            self._pump_thread = None
+        self.frame_bus.close()
+
+    def _pump_frames(self):
+        """
+        djitellopy's reader only exposes its latest frame as an attribute and
+        offers no new-frame callback. This is the single place that watches it:
+        every new frame object is published once, with the time it was seen,
+        so consumers can block on the bus instead of polling.
+        """
+        # Whatever the reader holds now is its blank 400x300 placeholder (the decoder
+        # hasn't delivered yet); only frames decoded from here on are published
+        last_frame = self.frame_reader.frame if self.frame_reader else None
+        last_arrival = None
+        while self._pump_running:
+            reader = self.frame_reader
+            frame = reader.frame if reader else None
+            if frame is not None and frame is not last_frame:
+                last_frame = frame
+                arrival = time.monotonic()
+                self.frame_bus.publish(frame, arrival)
+                metrics.inc('frames_arrived')
+                if last_arrival is not None:
+                    metrics.observe('frame_interval', arrival - last_arrival)
+                last_arrival = arrival
+            else:
+                time.sleep(self.FRAME_PUMP_INTERVAL)
+
+    def _start_telemetry(self):
+        """Starts recording the Tello state stream into a telemetry ring."""
+        self._stop_telemetry()
+        self.telemetry = TelemetryMonitor(self.tello.get_current_state)
+        self.telemetry.start()
+
+    def _stop_telemetry(self):
+        if self.telemetry:
+            self.telemetry.stop()
+
+    def start_telemetry_log(self, path, session=None):
+        """Writes every telemetry sample to a log file (see core.telemetry), once connected."""
+        if self.telemetry:
+            self.telemetry.start_log(path, session=session)
+
+    def get_telemetry(self):
+        """Returns the newest telemetry sample (dict of state fields plus 't'), or None."""
+        return self.telemetry.latest() if self.telemetry else None
+
+    def _start_control_loop(self):
+        """Starts the fixed-rate RC thread (see _control_loop)."""
+        self._stop_control_loop()
+        self._rc_target = (0, 0, 0, 0)
+        self._control_running = True
+        self._control_thread = threading.Thread(target=self._control_loop, daemon=True)
+        self._control_thread.start()
+
+    def _stop_control_loop(self):
+        self._control_running = False
+        if self._control_thread:
+            self._control_thread.join(timeout=1.0)
+            self._control_thread = None
+
+    def _control_loop(self):
+        """
+        Sends RC commands on a fixed tick, independent of UI, video and
+        inference load. Each tick reads the latest target; an unchanged
+        command is only resent once rc_keepalive has passed. Ticks are
+        scheduled on absolute deadlines, so a late tick doesn't shift the
+        ones after it.
+        """
+        last_sent = None
+        last_sent_at = 0.0
+        next_tick = time.monotonic()
+        while self._control_running:
+            now = time.monotonic()
+            self._tick_lateness.append(now - next_tick)
+            metrics.observe('rc_tick_lateness', max(0.0, now - next_tick))
+            self.control_counts['ticks'] += 1
+
+            target = self._rc_target
+            if target != last_sent or now - last_sent_at >= self.rc_keepalive:
+                if self.is_connected and self.tello:
+                    try:
+                        with metrics.span('rc_send'):
+                            self.tello.send_rc_control(*target)
+                    except Exception:
+                        pass # Prevent crashing on transient comms errors
+                self.control_counts['sent' if target != last_sent else 'keepalive'] += 1
+                last_sent, last_sent_at = target, now
+            else:
+                self.control_counts['coalesced'] += 1
+
+            next_tick += self.rc_period
+            delay = next_tick - time.monotonic()
+            if delay > 0:
+                time.sleep(delay)
+            elif delay < -self.rc_period:
+                # Fell more than a tick behind (e.g. machine stalled): resync instead of bursting
+                self.control_counts['overruns'] += 1
+                next_tick = time.monotonic()
+
+    @property
+    def control_stats(self):
+        """RC loop counters plus tick lateness (ms) over the last JITTER_WINDOW ticks."""
+        stats = dict(self.control_counts, rc_hz=round(1.0 / self.rc_period, 1))
+        if self._tick_lateness:
+            lateness = np.array(self._tick_lateness) * 1000
+            stats.update(jitter_ms_mean=round(float(lateness.mean()), 3),
+                         jitter_ms_p99=round(float(np.percentile(lateness, 99)), 3),
+                         jitter_ms_max=round(float(lateness.max()), 3))
+        return stats
+
+    def start_course_recording(self, path, session=None):
+        """Starts logging every flight command to a course file (see core.course)."""
+        self.stop_course_recording()
+        self.course_recorder = CourseRecorder(path, session=session)
+        print(f"[Drone] Recording course to: {path}")
+
+    def stop_course_recording(self):
+        recorder, self.course_recorder = self.course_recorder, None
+        if recorder:
+            recorder.close()
+            print(f"[Drone] Course saved ({recorder.count} events): {recorder.path}")
+
+    def _record_command(self, event, rc=(0, 0, 0, 0)):
+        recorder = self.course_recorder
+        if recorder:
+            recorder.record(event, rc)
+
     def disconnect(self):
         """Stops video stream and disconnects."""
         try:
+            self._stop_control_loop()
+            self._stop_frame_pump()
+            self._stop_ingest()
+            self._stop_telemetry()
             if self.frame_reader:
                 self.frame_reader.stop()
             if self.tello:
@@ -58,6 +313,8 @@ class DroneController:
 
     def emergency(self):
         """Immediate motor cutoff (Kill Switch)."""
+        self._rc_target = (0, 0, 0, 0)
+        self._record_command('emergency')
         try:
             if self.tello:
                 self.tello.emergency()
@@ -69,30 +326,50 @@ class DroneController:
     def takeoff(self):
         """Initiates takeoff if connected and not already flying."""
         if self.is_connected and self.tello and not self.tello.is_flying:
+            self._record_command('takeoff')
             self.tello.takeoff()
 
     def land(self):
         """Initiates landing if connected and flying."""
         if self.is_connected and self.tello and self.tello.is_flying:
+            self._record_command('land')
             self.tello.land()
 
     def send_rc_control(self, lr, fb, ud, yv):
-        """Sends RC control commands if connected."""
-        if self.is_connected and self.tello:
-            try:
-                self.tello.send_rc_control(lr, fb, ud, yv)
-            except Exception:
-                pass # Prevent crashing on transient comms errors
+        """
+        Sets the RC target. Never blocks: the control thread sends it on its
+        next tick, so callers may update it as often as they like.
+        """
+        self._rc_target = (lr, fb, ud, yv)
+        self._record_command('rc', self._rc_target)
 
     def get_frame(self):
         """Returns the most recent video frame from the drone (NumPy array)."""
-        if self.frame_reader:
-            return self.frame_reader.frame
-        return None
+        packet = self.frame_bus.latest()
+        return packet.frame if packet else None
+
+    def get_frame_packet(self):
+        """Returns the most recent FramePacket (seq, timestamp, frame), or None."""
+        return self.frame_bus.latest()
+
+    def wait_for_frame(self, after_seq=0, timeout=None):
+        """
+        Blocks until a frame newer than after_seq arrives, skipping stale ones.
+        :param after_seq: Sequence number of the last frame the caller handled.
+        :param timeout: Seconds to wait at most (None = forever).
+        :return: FramePacket, or None on timeout/disconnect.
+        """
+        return self.frame_bus.wait_newer(after_seq, timeout)
 
     def cleanup(self):
         """Lands and closes connection."""
         try:
+            self._stop_control_loop()
+            print(f"[Drone] RC loop stats: {self.control_stats}")
+            self._stop_frame_pump()
+            self._stop_ingest()
+            self._stop_telemetry()
+            self.stop_course_recording()
             if self.frame_reader:
                 self.frame_reader.stop()
             if self.is_connected and self.tello:
@@ -0,0 +1,67 @@
+import threading
+import time
+from collections import namedtuple
+
+# seq increases by one per published frame; timestamp is time.monotonic()
+FramePacket = namedtuple("FramePacket", ["seq", "timestamp", "frame"])
+
+
+class FrameBus:
+    """
+    Latest-frame slot shared between one producer and any number of consumers.
+
+    Each published frame gets a sequence number and a capture timestamp.
+    Consumers block in wait_newer() until a frame newer than the one they
+    already handled arrives; intermediate frames are skipped, never queued,
+    so a slow consumer always gets the freshest frame. Packets are immutable,
+    so readers never observe a half-updated buffer.
+    """
+    def __init__(self):
+        self._cond = threading.Condition()
+        self._latest = None
+        self._closed = False
+
+    def publish(self, frame, timestamp=None):
+        """
+        Publishes a new frame and wakes all waiting consumers.
+        :param frame: The decoded frame (numpy array). Must not be mutated afterwards.
+        :param timestamp: Capture time (time.monotonic()); defaults to now.
+        :return: Sequence number assigned to the frame.
+        """
+        if timestamp is None:
+            timestamp = time.monotonic()
+        with self._cond:
+            seq = self._latest.seq + 1 if self._latest else 1
+            self._latest = FramePacket(seq, timestamp, frame)
+            self._cond.notify_all()
+        return seq
+
+    def latest(self):
+        """Returns the most recent FramePacket without blocking (None if nothing published yet)."""
+        return self._latest
+
+    def wait_newer(self, after_seq=0, timeout=None):
+        """
+        Blocks until a frame with seq > after_seq is available.
+        :param after_seq: Sequence number of the last frame the caller processed.
+        :param timeout: Seconds to wait at most (None = forever).
+        :return: The latest FramePacket, or None on timeout or when the bus is closed.
+        """
+        with self._cond:
+            ready = self._cond.wait_for(
+                lambda: self._closed or (self._latest is not None and self._latest.seq > after_seq),
+                timeout
+            )
+            if not ready or self._closed:
+                return None
+            return self._latest
+
+    def close(self):
+        """Wakes all waiting consumers; subsequent waits return None immediately."""
+        with self._cond:
+            self._closed = True
+            self._cond.notify_all()
+
+    @property
+    def closed(self):
+        return self._closed
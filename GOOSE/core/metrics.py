@@ -0,0 +1,255 @@
+import bisect
+import json
+import os
+import threading
+import time
+
+# Histogram bucket upper bounds in milliseconds, 0.1 ms .. 10 s
+LATENCY_BUCKETS_MS = (0.1, 0.25, 0.5, 1, 2, 4, 8, 12, 16, 25, 33, 50, 75, 100,
+                      150, 250, 500, 1000, 2500, 5000, 10000)
+PROMETHEUS_PREFIX = 'goose_'
+
+
+class Counter:
+    def __init__(self):
+        self.value = 0
+        self._lock = threading.Lock()
+
+    def inc(self, n=1):
+        with self._lock:
+            self.value += n
+
+
+class Histogram:
+    """
+    Fixed-bucket latency histogram (milliseconds). Recording is one bisect
+    and a few additions under a lock, so it can stay on in flight;
+    quantiles are estimated from the buckets when a snapshot is taken.
+    """
+    def __init__(self, buckets=LATENCY_BUCKETS_MS):
+        self.buckets = tuple(buckets)
+        self.counts = [0] * (len(self.buckets) + 1) # Last one is +Inf
+        self.count = 0
+        self.sum = 0.0
+        self.max = 0.0
+        self._lock = threading.Lock()
+
+    def observe(self, value_ms):
+        index = bisect.bisect_left(self.buckets, value_ms)
+        with self._lock:
+            self.counts[index] += 1
+            self.count += 1
+            self.sum += value_ms
+            if value_ms > self.max:
+                self.max = value_ms
+
+    def _quantile(self, counts, count, q):
+        """Linear interpolation inside the bucket that holds the q-th observation."""
+        rank = q * count
+        seen = 0
+        for index, n in enumerate(counts):
+            if n and seen + n >= rank:
+                lower = self.buckets[index - 1] if index else 0.0
+                upper = self.buckets[index] if index < len(self.buckets) else self.max
+                return lower + (upper - lower) * (rank - seen) / n
+            seen += n
+        return self.max
+
+    def snapshot(self):
+        with self._lock:
+            counts, count, total, peak = list(self.counts), self.count, self.sum, self.max
+        if not count:
+            return {'count': 0}
+        return {
+            'count': count,
+            'mean': round(total / count, 3),
+            'p50': round(min(self._quantile(counts, count, 0.5), peak), 3),
+            'p90': round(min(self._quantile(counts, count, 0.9), peak), 3),
+            'p99': round(min(self._quantile(counts, count, 0.99), peak), 3),
+            'max': round(peak, 3),
+            'sum': round(total, 3),
+            'buckets': counts,
+        }
+
+
+class _Span:
+    """Times a with-block on the monotonic clock into a histogram."""
+    __slots__ = ('histogram', 'start')
+
+    def __init__(self, histogram):
+        self.histogram = histogram
+
+    def __enter__(self):
+        self.start = time.monotonic()
+        return self
+
+    def __exit__(self, *exc):
+        self.histogram.observe((time.monotonic() - self.start) * 1000)
+        return False
+
+
+class _NullSpan:
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+
+_NULL_SPAN = _NullSpan()
+
+
+class Metrics:
+    """
+    Registry of per-stage spans, counters and gauges for one process.
+
+    Stages record into named histograms (milliseconds) with `with
+    metrics.span('detect'):` or metrics.observe(name, seconds) for
+    intervals measured elsewhere (e.g. capture-to-screen from a
+    FramePacket timestamp). Metrics are created on first use, so
+    instrumented code needs no setup; set enabled = False to turn
+    recording into no-ops.
+    """
+    def __init__(self):
+        self.enabled = True
+        self.started = time.monotonic()
+        self._histograms = {}
+        self._counters = {}
+        self._gauges = {}
+        self._lock = threading.Lock()
+
+    def histogram(self, name):
+        histogram = self._histograms.get(name)
+        if histogram is None:
+            with self._lock:
+                histogram = self._histograms.setdefault(name, Histogram())
+        return histogram
+
+    def counter(self, name):
+        counter = self._counters.get(name)
+        if counter is None:
+            with self._lock:
+                counter = self._counters.setdefault(name, Counter())
+        return counter
+
+    def span(self, name):
+        """Context manager that records the duration of its block under name."""
+        if not self.enabled:
+            return _NULL_SPAN
+        return _Span(self.histogram(name))
+
+    def observe(self, name, seconds):
+        if self.enabled:
+            self.histogram(name).observe(seconds * 1000)
+
+    def inc(self, name, n=1):
+        if self.enabled:
+            self.counter(name).inc(n)
+
+    def set(self, name, value):
+        """Sets a gauge (e.g. a queue depth) to its current value."""
+        if self.enabled:
+            self._gauges[name] = value
+
+    def snapshot(self):
+        """All metrics as a JSON-serializable dict."""
+        with self._lock:
+            histograms = dict(self._histograms)
+            counters = dict(self._counters)
+        return {
+            'pid': os.getpid(),
+            'uptime': round(time.monotonic() - self.started, 3),
+            'wallclock': time.time(),
+            'spans_ms': {name: h.snapshot() for name, h in sorted(histograms.items())},
+            'counters': {name: c.value for name, c in sorted(counters.items())},
+            'gauges': dict(sorted(self._gauges.items())),
+        }
+
+    def to_prometheus(self, snapshot=None):
+        """Renders a snapshot in the Prometheus text exposition format."""
+        snapshot = snapshot or self.snapshot()
+        lines = []
+        for name, span in snapshot['spans_ms'].items():
+            metric = f"{PROMETHEUS_PREFIX}{name}_ms"
+            lines.append(f"# TYPE {metric} histogram")
+            cumulative = 0
+            counts = span.get('buckets', [0] * (len(LATENCY_BUCKETS_MS) + 1))
+            for bound, n in zip(LATENCY_BUCKETS_MS + ('+Inf',), counts):
+                cumulative += n
+                lines.append(f'{metric}_bucket{{le="{bound}"}} {cumulative}')
+            lines.append(f"{metric}_sum {span.get('sum', 0)}")
+            lines.append(f"{metric}_count {span['count']}")
+        for name, value in snapshot['counters'].items():
+            metric = f"{PROMETHEUS_PREFIX}{name}_total"
+            lines.append(f"# TYPE {metric} counter")
+            lines.append(f"{metric} {value}")
+        for name, value in snapshot['gauges'].items():
+            metric = f"{PROMETHEUS_PREFIX}{name}"
+            lines.append(f"# TYPE {metric} gauge")
+            lines.append(f"{metric} {value}")
+        return "\n".join(lines) + "\n"
+
+    def osd_lines(self, names=None):
+        """Short 'stage p50/p99 ms' lines for an on-screen overlay."""
+        lines = []
+        for name, span in self.snapshot()['spans_ms'].items():
+            if span['count'] and (names is None or name in names):
+                lines.append(f"{name}: {span['p50']:.1f}/{span['p99']:.1f} ms (n={span['count']})")
+        return lines
+
+
+class MetricsExporter(threading.Thread):
+    """
+    Periodically writes a registry to <path>.json and <path>.prom (the
+    latter for a node_exporter textfile collector). Files are replaced
+    atomically, so readers never see a partial write.
+    """
+    def __init__(self, path, registry=None, interval=5.0):
+        """
+        :param path: Output path without extension.
+        :param registry: Metrics to export (default: this process's registry).
+        :param interval: Seconds between writes.
+        """
+        super().__init__(daemon=True)
+        self.path = path
+        self.registry = registry or metrics
+        self.interval = interval
+        self._stop_event = threading.Event()
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+    def _replace(self, path, text):
+        tmp = f"{path}.tmp"
+        with open(tmp, 'w') as f:
+            f.write(text)
+        os.replace(tmp, path)
+
+    def write(self):
+        snapshot = self.registry.snapshot()
+        self._replace(self.path + '.json', json.dumps(snapshot, indent=1))
+        self._replace(self.path + '.prom', self.registry.to_prometheus(snapshot))
+
+    def run(self):
+        print(f"[Metrics] Exporting to {self.path}.json/.prom every {self.interval}s")
+        while not self._stop_event.wait(self.interval):
+            try:
+                self.write()
+            except OSError as e:
+                print(f"[Metrics] Export failed: {e}")
+
+    def stop(self):
+        """Stops the exporter after one final write."""
+        self._stop_event.set()
+        if self.is_alive():
+            self.join()
+        try:
+            self.write()
+        except OSError as e:
+            print(f"[Metrics] Export failed: {e}")
+
+
+# Process-wide registry used by the instrumented stages
+metrics = Metrics()
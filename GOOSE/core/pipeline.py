@@ -0,0 +1,363 @@
+import multiprocessing as mp
+import queue
+import threading
+
+from core.metrics import MetricsExporter
+from core.shared_frames import SharedFrameRing
+
+# Ring frame shape if the stream hasn't delivered a frame by the time connect() returns
+# (the Tello streams at this size after connect() forces 720p)
+FRAME_SHAPE = (720, 960, 3)
+# Longest wait for the first decoded frame, whose shape sizes the ring
+FIRST_FRAME_TIMEOUT = 10.0
+
+
+def _start_exporter(metrics_path, role):
+    """Each process has its own metrics registry, exported next to the UI's as <path>_<role>."""
+    if not metrics_path:
+        return None
+    exporter = MetricsExporter(f"{metrics_path}_{role}")
+    exporter.start()
+    return exporter
+
+
+def _capture_process(ring_specs, frame_shape, condition, commands, connected, ready, stop_event, host, port,
+                     rc_hz, metrics_path=None, ingest="native", decoder_threads=2, telemetry=None):
+    """
+    Capture/decode process: owns the Tello connection, copies every new frame
+    into the shared ring, executes flight and recording commands sent by the
+    UI process and publishes the newest telemetry sample to `telemetry`.
+    The shape of the first decoded frame is reported through `frame_shape`
+    before `ready` is set; the UI then sizes the ring to it and sends its
+    spec over `ring_specs`.
+    """
+    from core.drone import DroneController
+    from core.telemetry import TELEMETRY_DTYPE
+
+    exporter = _start_exporter(metrics_path, 'capture')
+    controller = DroneController(rc_hz=rc_hz, ingest=ingest, decoder_threads=decoder_threads)
+    controller.connect(host=host, port=port)
+    connected.value = controller.is_connected
+    first = controller.wait_for_frame(0, timeout=FIRST_FRAME_TIMEOUT) if controller.is_connected else None
+    if first is not None:
+        frame_shape[:] = first.frame.shape
+    ready.set()
+    ring = SharedFrameRing(create=False, condition=condition, **ring_specs.get())
+
+    def publish_telemetry():
+        sample = controller.get_telemetry()
+        if telemetry is not None and sample and sample['t'] != telemetry[0]:
+            with telemetry.get_lock():
+                telemetry[:] = [sample[name] for name in TELEMETRY_DTYPE.names]
+
+    def handle_commands():
+        while not stop_event.is_set():
+            publish_telemetry() # At least every 0.1 s, about the Tello's state rate
+            try:
+                batch = [commands.get(timeout=0.1)]
+            except queue.Empty:
+                continue
+            while True:
+                try:
+                    batch.append(commands.get_nowait())
+                except queue.Empty:
+                    break
+
+            # Only the newest RC command matters (the controller's RC loop sends it on its
+            # own tick); discrete commands run in order
+            last_rc = max((i for i, cmd in enumerate(batch) if cmd[0] == 'rc'), default=None)
+            for i, (name, *args) in enumerate(batch):
+                if name == 'rc':
+                    if i == last_rc:
+                        controller.send_rc_control(*args)
+                elif name == 'takeoff':
+                    controller.takeoff()
+                elif name == 'land':
+                    controller.land()
+                elif name == 'emergency':
+                    controller.emergency()
+                elif name == 'course_start':
+                    controller.start_course_recording(*args)
+                elif name == 'course_stop':
+                    controller.stop_course_recording()
+                elif name == 'telemetry_log':
+                    controller.start_telemetry_log(*args)
+            connected.value = controller.is_connected
+
+    threading.Thread(target=handle_commands, daemon=True).start()
+
+    last_seq = 0
+    dropped_shape = None
+    try:
+        while not stop_event.is_set():
+            packet = controller.wait_for_frame(last_seq, timeout=0.5)
+            if packet is None:
+                continue
+            last_seq = packet.seq
+            if packet.frame.shape == ring.shape:
+                ring.write(packet.frame, packet.timestamp)
+                dropped_shape = None
+            elif packet.frame.shape != dropped_shape:
+                # E.g. djitellopy's startup placeholder, or a resolution change mid-flight
+                dropped_shape = packet.frame.shape
+                print(f"[Pipeline] Dropping {dropped_shape} frames: the shared ring holds {ring.shape}")
+    finally:
+        controller.cleanup()
+        ring.close()
+        if exporter:
+            exporter.stop()
+
+
+def _inference_process(ring_spec, condition, results, conf_threshold, stop_event, model_path, backend,
+                       detect_every, target_dps, max_latency, roi, metrics_path=None, ring_cv=False):
+    """
+    Inference process: reads the newest frame from the ring, runs the
+    vision step (detector, tracker, sampler, optional adaptive scheduler)
+    and sends display detections plus a status line back to the UI.
+    """
+    from vision.detector import ObjectDetector
+    from vision.frame_processor import FrameProcessor
+    from vision.ring_detector import RingDetector
+    from vision.roi import RoiPlanner
+    from vision.sampler import HybridSampler
+    from vision.scheduler import InferenceScheduler
+
+    ring = SharedFrameRing(create=False, condition=condition, **ring_spec)
+    detector = ObjectDetector(model_path, backend=backend)
+    detector.load_model()
+    scheduler = None
+    if target_dps:
+        scheduler = InferenceScheduler(target_dps, max_latency, allow_imgsz=detector.supports_imgsz)
+    sampler = HybridSampler(stream_fps=30 / detect_every)
+    processor = FrameProcessor(detector, sampler, scheduler=scheduler, detect_every=detect_every,
+                               roi_planner=RoiPlanner() if roi else None,
+                               ring_detector=RingDetector() if ring_cv else None)
+    exporter = _start_exporter(metrics_path, 'vision')
+    print("[InferenceProcess] Started (Hybrid Sampling Active)")
+
+    # One reusable frame buffer; the sampler copies what it keeps
+    buffer = None
+    last_seq = 0
+    processed_count = 0
+    try:
+        while not stop_event.is_set():
+            packet = ring.wait_latest(last_seq, timeout=0.5, out=buffer)
+            if packet is None:
+                continue
+            buffer = packet.frame
+            last_seq = packet.seq
+
+            try:
+                detections, detected = processor.process(packet, conf_threshold.value)
+                results.send((packet.seq, detections, processor.status()))
+            except (BrokenPipeError, EOFError):
+                break
+            except Exception as e:
+                print(f"[InferenceProcess] Vision Error: {e}")
+                continue
+
+            if detected:
+                processed_count += 1
+                if processed_count % 100 == 0:
+                    print(f"[InferenceProcess] Heartbeat: Processed {processed_count} frames | "
+                          f"{processor.status()}")
+    finally:
+        sampler.close()
+        results.close()
+        ring.close()
+        if exporter:
+            exporter.stop()
+
+
+class RemoteDroneController:
+    """
+    DroneController stand-in for the UI process when capture runs in its own
+    process. Frames are read from the shared ring; commands, course
+    recording and telemetry logging are forwarded over a queue (so course
+    files record what the capture process actually sent), and the newest
+    telemetry sample comes back through shared memory. Exposes the same
+    methods main.py uses on DroneController.
+    """
+    def __init__(self, frame_shape=FRAME_SHAPE, slots=4, rc_hz=20.0, metrics_path=None, ingest="native",
+                 decoder_threads=2):
+        """
+        :param frame_shape: Ring frame shape if the stream delivers no frame while connecting;
+                            otherwise the ring is sized to the first decoded frame.
+        :param metrics_path: If set, the capture process exports its metrics to <path>_capture.
+        :param ingest: Video ingest of the capture process's DroneController ('native' or 'djitellopy').
+        :param decoder_threads: H.264 decoder threads for the native ingest.
+        """
+        from core.drone import ingest_frame_order
+        from core.telemetry import TELEMETRY_DTYPE
+
+        self.rc_hz = rc_hz
+        self.metrics_path = metrics_path
+        self.ingest = ingest
+        self.frame_order = ingest_frame_order(ingest) # Frames pass through the ring unchanged
+        self.decoder_threads = decoder_threads
+        self._ctx = mp.get_context("spawn")
+        self.condition = self._ctx.Condition()
+        self.frame_shape = tuple(frame_shape)
+        self.slots = slots
+        self.ring = None # Created by connect(), sized to the stream
+        self._ring_specs = self._ctx.Queue()
+        self._first_shape = self._ctx.Array('i', 3) # Reported by the capture process, zeros if none
+        self._commands = self._ctx.Queue()
+        self._telemetry = self._ctx.Array('d', len(TELEMETRY_DTYPE.names)) # Newest sample, t = 0 before any
+        self._telemetry_fields = TELEMETRY_DTYPE.names
+        self.course_recorder = None # Path of the course the capture process is recording
+        self._connected = self._ctx.Value('b', 0)
+        self._ready = self._ctx.Event()
+        self._stop = self._ctx.Event()
+        self._process = None
+        self._packet = None
+
+    @property
+    def is_connected(self):
+        return bool(self._connected.value)
+
+    def connect(self, host="192.168.10.1", port=8889, timeout=30.0):
+        """
+        Starts the capture process, waits until it has tried to connect and
+        creates the frame ring at the size of the first decoded frame.
+        """
+        self._process = self._ctx.Process(
+            target=_capture_process,
+            args=(self._ring_specs, self._first_shape, self.condition, self._commands, self._connected,
+                  self._ready, self._stop, host, port, self.rc_hz, self.metrics_path,
+                  self.ingest, self.decoder_threads, self._telemetry),
+            daemon=True
+        )
+        self._process.start()
+        if not self._ready.wait(timeout + FIRST_FRAME_TIMEOUT):
+            print("[Pipeline] Capture process did not report back in time.")
+
+        shape = tuple(self._first_shape[:])
+        if not all(shape):
+            shape = self.frame_shape
+            print(f"[Pipeline] No frame yet; sizing the frame ring to {shape[1]}x{shape[0]}")
+        self.ring = SharedFrameRing(shape=shape, slots=self.slots, condition=self.condition)
+        self._ring_specs.put(self.ring.spec())
+
+    def send_rc_control(self, lr, fb, ud, yv):
+        self._commands.put(('rc', lr, fb, ud, yv))
+
+    def takeoff(self):
+        self._commands.put(('takeoff',))
+
+    def land(self):
+        self._commands.put(('land',))
+
+    def emergency(self):
+        self._commands.put(('emergency',))
+        self._connected.value = 0
+
+    def start_course_recording(self, path, session=None):
+        """Has the capture process log every flight command it sends (see core.course)."""
+        self._commands.put(('course_start', path, session))
+        self.course_recorder = path
+
+    def stop_course_recording(self):
+        if self.course_recorder:
+            self._commands.put(('course_stop',))
+            self.course_recorder = None
+
+    def start_telemetry_log(self, path, session=None):
+        """Has the capture process write every telemetry sample to a log (see core.telemetry)."""
+        self._commands.put(('telemetry_log', path, session))
+
+    def get_telemetry(self):
+        """Returns the newest telemetry sample (dict of state fields plus 't'), or None."""
+        with self._telemetry.get_lock():
+            values = self._telemetry[:]
+        return dict(zip(self._telemetry_fields, values)) if values[0] else None
+
+    def get_frame_packet(self):
+        """Returns the most recent FramePacket, copying out of the ring only when it changed."""
+        if self.ring is None:
+            return None
+        packet = self.ring.read_latest(self._packet.seq if self._packet else 0)
+        if packet is not None:
+            self._packet = packet
+        return self._packet
+
+    def get_frame(self):
+        packet = self.get_frame_packet()
+        return packet.frame if packet else None
+
+    def wait_for_frame(self, after_seq=0, timeout=None):
+        if self.ring is None:
+            return None
+        return self.ring.wait_latest(after_seq, timeout)
+
+    def cleanup(self):
+        """Stops the capture process (which lands and disconnects) and frees the ring."""
+        self._stop.set()
+        if self._process:
+            self._process.join(timeout=10.0)
+            if self._process.is_alive():
+                self._process.terminate()
+            self._process = None
+        if self.ring:
+            self.ring.close()
+            self.ring = None
+
+
+class ProcessVisionWorker:
+    """
+    Runs ObjectDetector + HybridSampler in a separate process fed by a
+    RemoteDroneController's ring. Mirrors VisionWorker's interface
+    (start/stop/join, conf_threshold, latest_detections, latest_seq, status).
+    """
+    def __init__(self, controller, model_path, backend="auto", detect_every=1,
+                 target_dps=None, max_latency=0.2, roi=False, metrics_path=None, ring_cv=False):
+        """
+        :param metrics_path: If set, the inference process exports its metrics to <path>_vision.
+        """
+        ctx = controller._ctx
+        self.latest_detections = []
+        self.latest_seq = 0
+        self.status = ""
+        self._conf = ctx.Value('d', 0.5)
+        self._stop = ctx.Event()
+        self._results, results_sender = ctx.Pipe(duplex=False)
+        self._results_sender = results_sender
+        self._process = ctx.Process(
+            target=_inference_process,
+            args=(controller.ring.spec(), controller.condition, results_sender, self._conf,
+                  self._stop, model_path, backend, max(1, detect_every), target_dps, max_latency,
+                  roi, metrics_path, ring_cv),
+            daemon=True
+        )
+        self._listener = threading.Thread(target=self._receive, daemon=True)
+
+    @property
+    def conf_threshold(self):
+        return self._conf.value
+
+    @conf_threshold.setter
+    def conf_threshold(self, value):
+        self._conf.value = value
+
+    def start(self):
+        self._process.start()
+        # Drop our copy of the sending end so the listener sees EOF when the child exits
+        self._results_sender.close()
+        self._listener.start()
+
+    def _receive(self):
+        while True:
+            try:
+                seq, detections, status = self._results.recv()
+            except (EOFError, OSError):
+                break
+            self.latest_detections = detections
+            self.latest_seq = seq
+            self.status = status
+
+    def stop(self):
+        self._stop.set()
+
+    def join(self, timeout=None):
+        self._process.join(timeout)
+        self._listener.join(timeout)
@@ -0,0 +1,186 @@
+import datetime
+import json
+import os
+import threading
+import time
+from collections import deque
+
+import cv2
+
+from core.metrics import metrics
+
+
+class FlightRecorder(threading.Thread):
+    """
+    Writes flight video on its own thread so recording never blocks the UI
+    or RC loop.
+
+    - Frames are handed over through a bounded queue with an explicit drop
+      policy ('oldest' evicts the queued frame that waited longest, 'newest'
+      rejects the incoming one), so a slow disk can't grow memory.
+    - Output is constant frame rate, but placement follows the real capture
+      timestamps: gaps are filled by repeating the previous frame and bursts
+      are thinned, so playback runs at true speed.
+    - RGB frames are converted to BGR (what cv2.VideoWriter expects) here,
+      once; BGR frames are written as they are. The sidecar records both the
+      input order and the order actually stored, so replay and
+      fix_recordings.py never have to guess.
+    - Files are split into segments; a crash only loses the open segment.
+      Each segment gets a JSON sidecar mapping video frames to capture times.
+    """
+    def __init__(self, rec_dir, fps=30.0, queue_size=60, drop_policy='oldest',
+                 segment_seconds=60.0, input_order='RGB', fourcc='mp4v'):
+        """
+        :param rec_dir: Directory for flight_<timestamp>_<part>.mp4 files.
+        :param fps: Output frame rate of the video files.
+        :param queue_size: Maximum frames waiting to be encoded.
+        :param drop_policy: 'oldest' or 'newest' (see class docstring).
+        :param segment_seconds: Length of one file in capture time.
+        :param input_order: Channel order of submitted frames (the controller's frame_order).
+        :param fourcc: FourCC code for cv2.VideoWriter.
+        """
+        super().__init__(daemon=True)
+        if drop_policy not in ('oldest', 'newest'):
+            raise ValueError(f"Unknown drop policy: {drop_policy}")
+
+        os.makedirs(rec_dir, exist_ok=True)
+        self.rec_dir = rec_dir
+        self.fps = fps
+        self.queue_size = queue_size
+        self.drop_policy = drop_policy
+        self.segment_seconds = segment_seconds
+        self.input_order = input_order.upper()
+        if self.input_order not in ('RGB', 'BGR'):
+            raise ValueError(f"Unknown channel order: {input_order}")
+        self.stored_order = None # Channel order of the pixels actually written, set by _write
+        self.fourcc = cv2.VideoWriter_fourcc(*fourcc)
+        self.session_name = f"flight_{datetime.datetime.now().strftime('%Y%m%d_%H%M%S')}"
+
+        self._queue = deque()
+        self._cond = threading.Condition()
+        self._running = True
+
+        self._writer = None
+        self._segment_index = -1
+        self._segment_start = None
+        self._segment_frames = []
+        self._next_index = 0
+        self._frame_size = None
+        self._bgr = None # Reused conversion buffer
+
+        self.stats = {'submitted': 0, 'dropped': 0, 'written': 0, 'duplicated': 0,
+                      'skipped': 0, 'segments': 0}
+
+    @property
+    def current_path(self):
+        return self._segment_path(self._segment_index, '.mp4') if self._segment_index >= 0 else None
+
+    def _segment_path(self, index, ext):
+        return os.path.join(self.rec_dir, f"{self.session_name}_{index:03d}{ext}")
+
+    def submit(self, packet):
+        """
+        Queues a frame for recording. Never blocks.
+        :param packet: FramePacket (seq, timestamp, frame); the frame must not be mutated later.
+        :return: False if a frame was dropped because the queue was full.
+        """
+        with self._cond:
+            self.stats['submitted'] += 1
+            accepted = True
+            if len(self._queue) >= self.queue_size:
+                self.stats['dropped'] += 1
+                metrics.inc('recorder_dropped')
+                if self.drop_policy == 'newest':
+                    return False
+                self._queue.popleft()
+                accepted = False
+            self._queue.append(packet)
+            self._cond.notify()
+        return accepted
+
+    def run(self):
+        while True:
+            with self._cond:
+                self._cond.wait_for(lambda: self._queue or not self._running)
+                if not self._queue:
+                    break # Stopped and drained
+                packet = self._queue.popleft()
+            try:
+                with metrics.span('recorder_write'):
+                    self._write(packet)
+            except Exception as e:
+                print(f"[Recorder] Error writing frame: {e}")
+        self._close_segment()
+
+    def _open_segment(self, timestamp):
+        self._close_segment()
+        self._segment_index += 1
+        self._segment_start = timestamp
+        self._segment_frames = []
+        self._next_index = 0
+        path = self._segment_path(self._segment_index, '.mp4')
+        self._writer = cv2.VideoWriter(path, self.fourcc, self.fps, self._frame_size)
+        if not self._writer.isOpened():
+            print(f"[Recorder] CRITICAL ERROR: Could not initialize VideoWriter at {path}")
+        else:
+            self.stats['segments'] += 1
+            print(f"[Recorder] Recording video to: {path}")
+
+    def _close_segment(self):
+        if self._writer is None:
+            return
+        self._writer.release()
+        self._writer = None
+        sidecar = {
+            'fps': self.fps,
+            'input_order': self.input_order,
+            'channel_order': self.stored_order, # As cv2 decodes the file
+            'frame_size': list(self._frame_size),
+            'start_monotonic': self._segment_start,
+            'start_wallclock': time.time() - (time.monotonic() - self._segment_start),
+            'frames': self._segment_frames, # [video frame index, frame seq, capture time]
+        }
+        with open(self._segment_path(self._segment_index, '.json'), 'w') as f:
+            json.dump(sidecar, f)
+
+    def _write(self, packet):
+        frame = packet.frame
+        height, width = frame.shape[:2]
+        if self._frame_size is None:
+            self._frame_size = (width, height)
+        if (width, height) != self._frame_size:
+            self.stats['skipped'] += 1 # e.g. djitellopy's startup placeholder
+            return
+
+        if self._writer is None or packet.timestamp - self._segment_start >= self.segment_seconds:
+            self._open_segment(packet.timestamp)
+
+        # Where this frame belongs on the constant-rate timeline
+        target_index = int(round((packet.timestamp - self._segment_start) * self.fps))
+        if target_index < self._next_index:
+            self.stats['skipped'] += 1 # Arrived faster than the output rate
+            return
+
+        if self.input_order == 'RGB':
+            self._bgr = cv2.cvtColor(frame, cv2.COLOR_RGB2BGR, dst=self._bgr)
+            frame = self._bgr
+            self.stored_order = 'BGR'
+        else:
+            self.stored_order = self.input_order
+
+        # Repeat the frame to cover the time since the previous one
+        repeats = target_index - self._next_index + 1
+        for _ in range(repeats):
+            self._writer.write(frame)
+        self.stats['written'] += 1
+        self.stats['duplicated'] += repeats - 1
+        self._segment_frames.append([target_index, packet.seq, packet.timestamp])
+        self._next_index = target_index + 1
+
+    def stop(self):
+        """Stops accepting frames, flushes the queue and closes the open segment."""
+        with self._cond:
+            self._running = False
+            self._cond.notify()
+        if self.is_alive():
+            self.join()
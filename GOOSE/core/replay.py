@@ -0,0 +1,240 @@
+import glob
+import json
+import os
+import threading
+import time
+
+import cv2
+
+from core.frame_bus import FrameBus, FramePacket
+
+IMAGE_EXTENSIONS = ('.jpg', '.jpeg', '.png', '.bmp')
+# Frame order of the reader behind recordings without a sidecar: the BGR frames of
+# djitellopy < 2.4, whose R/B-swapped files fix_recordings.py was written for
+LEGACY_INPUT_ORDER = 'BGR'
+
+
+def swap_order(order):
+    return 'BGR' if order.upper() == 'RGB' else 'RGB'
+
+
+def recorded_channel_order(video_path, legacy_input_order=LEGACY_INPUT_ORDER):
+    """
+    Channel order of the pixels stored in a recording, as cv2 decodes them,
+    derived from how the file was written:
+    - FlightRecorder segments: their JSON sidecar records the order written.
+    - fix_recordings.py outputs (*_fixed.mp4): it only swaps recordings
+      stored as RGB, so they hold BGR.
+    - Older recordings (no sidecar): main.py ran cvtColor(RGB2BGR) on every
+      frame of the reader that wrote them, so they hold the swap of that
+      reader's order. By default that's LEGACY_INPUT_ORDER.
+    :param legacy_input_order: Frame order of the reader that wrote sidecar-less
+                               recordings ('RGB' for djitellopy >= 2.4).
+    """
+    name = os.path.splitext(video_path)[0]
+    try:
+        with open(name + ".json") as f:
+            return json.load(f).get("channel_order", "BGR")
+    except (OSError, ValueError):
+        pass
+    if name.endswith("_fixed"):
+        return 'BGR'
+    return swap_order(legacy_input_order)
+
+
+def list_sources(target):
+    """
+    Expands a replay target into sources.
+    :param target: A video file, an image folder, or a folder of flight_*.mp4 recordings.
+    :return: Sorted list of paths (videos or image folders).
+    """
+    if os.path.isfile(target):
+        return [target]
+    videos = sorted(v for v in glob.glob(os.path.join(target, "*.mp4")) if ".partial" not in v)
+    if videos:
+        return videos
+    return [target] if _list_images(target) else []
+
+
+def _list_images(directory):
+    return sorted(
+        os.path.join(directory, f) for f in os.listdir(directory)
+        if f.lower().endswith(IMAGE_EXTENSIONS)
+    ) if os.path.isdir(directory) else []
+
+
+class ReplaySource:
+    """
+    Iterates over a recorded flight (video file or image folder) as
+    FramePackets, in the RGB order djitellopy delivers live.
+
+    With speed=None frames come out as fast as they decode and carry the
+    recorded timeline as timestamps; with a speed, iteration is paced to
+    the recording (1.0 = real time) and timestamps are the release times,
+    like live frames.
+    """
+    def __init__(self, path, speed=None, start=0, stop=None, fps=None, channel_order=None):
+        """
+        :param path: Video file or folder of images.
+        :param speed: Playback speed factor, or None for as fast as possible.
+        :param start: Index of the first frame to replay.
+        :param stop: Index after the last frame to replay (None = until the end).
+        :param fps: Frame rate of the recording (videos default to their own, images to 30).
+        :param channel_order: Stored channel order; detected from the recording if omitted.
+        """
+        self.path = path
+        self.speed = speed
+        self.start = start
+        self.stop = stop
+        self.is_video = os.path.isfile(path)
+        self.images = None if self.is_video else _list_images(path)
+
+        if self.is_video:
+            cap = cv2.VideoCapture(path)
+            if not cap.isOpened():
+                raise IOError(f"Cannot open recording {path}")
+            self.fps = fps or cap.get(cv2.CAP_PROP_FPS) or 30.0
+            self.frame_count = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
+            cap.release()
+            self.channel_order = (channel_order or recorded_channel_order(path)).upper()
+        else:
+            self.fps = fps or 30.0
+            self.frame_count = len(self.images)
+            # The sampler saves proper BGR JPEGs
+            self.channel_order = (channel_order or 'BGR').upper()
+
+    @property
+    def name(self):
+        return os.path.splitext(os.path.basename(os.path.normpath(self.path)))[0]
+
+    def _read_frames(self):
+        """Yields decoded frames (newly allocated, in stored order) from start to stop."""
+        if self.is_video:
+            cap = cv2.VideoCapture(self.path)
+            if self.start:
+                cap.set(cv2.CAP_PROP_POS_FRAMES, self.start)
+            try:
+                index = self.start
+                while self.stop is None or index < self.stop:
+                    ret, frame = cap.read()
+                    if not ret:
+                        break
+                    yield frame
+                    index += 1
+            finally:
+                cap.release()
+        else:
+            for image_path in self.images[self.start:self.stop]:
+                frame = cv2.imread(image_path)
+                if frame is None:
+                    print(f"[Replay] Skipping unreadable image {image_path}")
+                    continue
+                yield frame
+
+    def __iter__(self):
+        start_time = time.monotonic()
+        for offset, frame in enumerate(self._read_frames()):
+            if self.channel_order == 'BGR':
+                cv2.cvtColor(frame, cv2.COLOR_BGR2RGB, dst=frame) # Fresh buffer, safe in place
+
+            recorded = offset / self.fps
+            if self.speed:
+                delay = start_time + recorded / self.speed - time.monotonic()
+                if delay > 0:
+                    time.sleep(delay)
+                timestamp = time.monotonic()
+            else:
+                timestamp = start_time + recorded
+            yield FramePacket(offset + 1, timestamp, frame)
+
+
+class ReplayController:
+    """
+    DroneController stand-in that plays a recorded flight onto a FrameBus,
+    so the live vision stack (VisionWorker, FrameProcessor, sampler) runs
+    unchanged on old footage. Flight commands are ignored.
+
+    Like the live stream, the bus only keeps the newest frame: at speed=None
+    a consumer slower than decoding sees a subset of frames. Use
+    replay_flights.py to process every frame.
+    """
+    def __init__(self, target, speed=1.0, loop=False):
+        """
+        :param target: Video file, image folder or folder of recordings (played in order).
+        :param speed: Playback speed factor (None = as fast as decoding allows).
+        :param loop: Start over after the last source.
+        """
+        self.sources = list_sources(target)
+        self.speed = speed
+        self.loop = loop
+        self.is_connected = False
+        self.finished = False
+        self.frame_order = 'RGB' # ReplaySource converts every recording to RGB
+        self.frame_bus = FrameBus()
+        self._thread = None
+        self._running = False
+
+    def connect(self, host=None, port=None):
+        """Starts playback. host/port are accepted for interface compatibility."""
+        if not self.sources:
+            print("[Replay] No recordings or images found to replay.")
+            return
+        print(f"[Replay] Playing {len(self.sources)} source(s) at "
+              f"{f'{self.speed}x' if self.speed else 'max'} speed")
+        self.is_connected = True
+        self._running = True
+        self._thread = threading.Thread(target=self._play, daemon=True)
+        self._thread.start()
+
+    def _play(self):
+        while self._running:
+            for path in self.sources:
+                try:
+                    source = ReplaySource(path, speed=self.speed)
+                except IOError as e:
+                    print(f"[Replay] {e}")
+                    continue
+                print(f"[Replay] Source: {path} ({source.frame_count} frames, {source.channel_order})")
+                for packet in source:
+                    if not self._running:
+                        return
+                    self.frame_bus.publish(packet.frame, packet.timestamp)
+            if not self.loop:
+                break
+        # Keep the last frame on the bus so the view doesn't go blank
+        self.finished = True
+        print("[Replay] End of recording.")
+
+    def send_rc_control(self, lr, fb, ud, yv):
+        pass
+
+    def takeoff(self):
+        pass
+
+    def land(self):
+        pass
+
+    def emergency(self):
+        self.is_connected = False
+
+    def get_frame(self):
+        packet = self.frame_bus.latest()
+        return packet.frame if packet else None
+
+    def get_frame_packet(self):
+        return self.frame_bus.latest()
+
+    def wait_for_frame(self, after_seq=0, timeout=None):
+        return self.frame_bus.wait_newer(after_seq, timeout)
+
+    def get_telemetry(self):
+        return None # Replays carry no live state
+
+    def cleanup(self):
+        """Stops playback."""
+        self._running = False
+        if self._thread:
+            self._thread.join(timeout=1.0)
+            self._thread = None
+        self.frame_bus.close()
+        self.is_connected = False
@@ -0,0 +1,289 @@
+import os
+import threading
+import time
+from collections import deque
+
+import numpy as np
+
+from core.drone import DroneController
+from core.metrics import metrics
+from core.recorder import FlightRecorder
+from vision.detector import ObjectDetector
+from vision.frame_processor import FrameProcessor
+from vision.ring_detector import RingDetector
+from vision.roi import RoiPlanner
+from vision.sampler import HybridSampler
+
+# Local video ports handed out to drones that don't specify one
+FIRST_VIDEO_PORT = 11111
+
+
+def parse_drone_spec(spec, index):
+    """
+    Parses '[name=]host[:port[:video_port]]', e.g. 'left=192.168.1.21' or
+    '127.0.0.2:9889:11112'. Every drone on one machine needs its own video port.
+    :return: Dict(name, host, port, video_port)
+    """
+    name, _, address = spec.rpartition('=')
+    parts = address.split(':')
+    return {
+        'name': name or f"drone{index}",
+        'host': parts[0],
+        'port': int(parts[1]) if len(parts) > 1 and parts[1] else 8889,
+        'video_port': int(parts[2]) if len(parts) > 2 else FIRST_VIDEO_PORT + index,
+    }
+
+
+class DroneSession:
+    """
+    Everything one drone owns in a multi-drone session: its controller,
+    its own FrameProcessor (tracker, ROI state, sampler writing to its own
+    directory), an optional recorder, and its latest results. Only the
+    detector is borrowed from the shared pool.
+    """
+    LATENCY_WINDOW = 300
+
+    def __init__(self, name, host, port=8889, video_port=FIRST_VIDEO_PORT, rc_hz=20.0, decoder_threads=1,
+                 ingest_size=None):
+        self.name = name
+        self.host = host
+        self.port = port
+        self.video_port = video_port
+        self.controller = DroneController(rc_hz=rc_hz, decoder_threads=decoder_threads, ingest_size=ingest_size)
+        self.processor = None
+        self.recorder = None
+        self.latest_detections = []
+        self.latest_seq = 0
+
+        # Scheduling state, guarded by the pool's lock
+        self.pending = None # Newest frame not yet processed
+        self.queued = False # In the ready queue or being processed
+
+        self.stats = {'frames': 0, 'processed': 0, 'detected': 0, 'superseded': 0}
+        self._latency = deque(maxlen=self.LATENCY_WINDOW) # Capture to result, seconds
+
+    def latency_ms(self):
+        if not self._latency:
+            return None
+        ms = np.array(self._latency) * 1000
+        return {'p50': round(float(np.percentile(ms, 50)), 1), 'p99': round(float(np.percentile(ms, 99)), 1)}
+
+    def status(self):
+        latency = self.latency_ms()
+        latency_text = f"{latency['p50']}/{latency['p99']} ms" if latency else "-"
+        connected = "up" if self.controller.is_connected else "DOWN"
+        return (f"{self.name} ({self.host}, {connected}): {self.stats['processed']}/{self.stats['frames']} "
+                f"frames processed, {self.stats['superseded']} superseded, latency p50/p99 {latency_text}")
+
+
+class DetectorPool:
+    """
+    One pool of inference workers shared by every drone in a session.
+
+    The model is loaded once; each worker gets a share() of it (same
+    onnxruntime session, own input buffers). Scheduling is round-robin:
+    a drone holds at most one pending frame (a newer frame supersedes an
+    unprocessed one, as on the FrameBus) and sits in the ready queue at
+    most once, going to the back after each frame. A drone streaming
+    faster can't starve the others, and each drone's frames are processed
+    strictly in order, which its tracker relies on.
+    """
+    def __init__(self, detector, workers=1, conf_threshold=0.5):
+        """
+        :param detector: Loaded ObjectDetector; workers beyond the first use detector.share().
+        :param workers: Number of inference threads.
+        :param conf_threshold: Display confidence threshold passed to FrameProcessor.
+        """
+        self.conf_threshold = conf_threshold
+        self._detectors = [detector] + [detector.share() for _ in range(workers - 1)]
+        self._ready = deque()
+        self._cond = threading.Condition()
+        self._running = False
+        self._threads = []
+
+    @property
+    def workers(self):
+        return len(self._detectors)
+
+    def start(self):
+        self._running = True
+        for index, detector in enumerate(self._detectors):
+            thread = threading.Thread(target=self._run, args=(detector,), name=f"detector-{index}", daemon=True)
+            thread.start()
+            self._threads.append(thread)
+
+    def submit(self, session, packet):
+        """Hands a drone's newest frame to the pool. Never blocks."""
+        with self._cond:
+            if session.pending is not None:
+                session.stats['superseded'] += 1
+            session.pending = packet
+            if not session.queued:
+                session.queued = True
+                self._ready.append(session)
+                self._cond.notify()
+
+    def _run(self, detector):
+        while True:
+            with self._cond:
+                self._cond.wait_for(lambda: self._ready or not self._running)
+                if not self._running:
+                    return
+                session = self._ready.popleft()
+                packet, session.pending = session.pending, None
+
+            # Nobody else touches this drone's processor until it's re-queued
+            session.processor.detector = detector
+            try:
+                with metrics.span('pool_process'):
+                    detections, detected = session.processor.process(packet, self.conf_threshold)
+                session.latest_detections = detections
+                session.latest_seq = packet.seq
+                session.stats['processed'] += 1
+                session.stats['detected'] += int(detected)
+                session._latency.append(time.monotonic() - packet.timestamp)
+            except Exception as e:
+                print(f"[Session] {session.name} vision error: {e}")
+
+            with self._cond:
+                if session.pending is not None:
+                    self._ready.append(session) # Back of the queue: round-robin
+                    self._cond.notify()
+                else:
+                    session.queued = False
+
+    def stop(self):
+        with self._cond:
+            self._running = False
+            self._cond.notify_all()
+        for thread in self._threads:
+            thread.join()
+        self._threads = []
+
+
+class SessionManager:
+    """
+    Flies several drones from one process: connects N DroneControllers and
+    fans their frames into one DetectorPool sized to the machine, with
+    per-drone sampler and recorder outputs (<data_dir>/<name>,
+    <rec_dir>/<name>). Per drone, memory is the tracker, a small sampler
+    write queue and the recorder; the model and the inference threads are
+    shared, so adding drones doesn't add model copies or oversubscribe cores.
+    """
+    FRAME_TIMEOUT = 0.5
+    # One detector run per second at 30 fps; past that the trackers only extrapolate stale boxes
+    MAX_DETECT_EVERY = 30
+
+    def __init__(self, drones, model_path, backend="auto", workers=None, detect_every=1, roi=False,
+                 data_dir="./flight_data", rec_dir=None, record_fps=30.0, rc_hz=20.0, decoder_threads=1,
+                 ingest_size=None, ring_cv=False):
+        """
+        :param drones: Dicts with name, host, port, video_port (see parse_drone_spec).
+        :param model_path: Model loaded once for the whole session.
+        :param backend: Inference backend for .onnx models.
+        :param workers: Inference threads (default: one per drone, at most half the cores).
+        :param detect_every: Run the detector every N frames per drone (1..MAX_DETECT_EVERY);
+                             trackers fill the gaps, their max_age sized to match.
+        :param roi: Detect in crops around tracked targets.
+        :param data_dir: Root for the per-drone sample stores.
+        :param rec_dir: Root for per-drone recordings (None = don't record).
+        :param record_fps: Frame rate of the recordings.
+        :param rc_hz: RC control loop rate per drone.
+        :param decoder_threads: H.264 decoder threads per drone.
+        :param ingest_size: (width, height) every drone's frames are scaled to while decoding
+                            (None = stream size). Saves work per frame when nobody watches.
+        :param ring_cv: Re-measure rings between detector runs with RingDetector.
+        """
+        cpus = os.cpu_count() or 1
+        self.workers = workers or max(1, min(len(drones), cpus // 2))
+        # Split the cores between the workers instead of letting every session use all of them
+        self.threads_per_worker = max(1, cpus // self.workers)
+        self.model_path = model_path
+        self.backend = backend
+        self.detect_every = max(1, min(self.MAX_DETECT_EVERY, detect_every))
+        if self.detect_every != detect_every:
+            print(f"[Session] detect_every={detect_every} out of range, using {self.detect_every}")
+        self.roi = roi
+        self.ring_cv = ring_cv
+        self.data_dir = data_dir
+        self.rec_dir = rec_dir
+        self.record_fps = record_fps
+        self.sessions = [DroneSession(d['name'], d['host'], d.get('port', 8889),
+                                      d.get('video_port', FIRST_VIDEO_PORT + i), rc_hz, decoder_threads, ingest_size)
+                         for i, d in enumerate(drones)]
+        self.pool = None
+        self._feeders = []
+        self._running = False
+
+    def __getitem__(self, name):
+        for session in self.sessions:
+            if session.name == name:
+                return session
+        raise KeyError(name)
+
+    def connect(self):
+        """Connects all drones in parallel (each connect waits for its video stream)."""
+        threads = [threading.Thread(target=s.controller.connect, args=(s.host, s.port, s.video_port))
+                   for s in self.sessions]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        connected = sum(s.controller.is_connected for s in self.sessions)
+        print(f"[Session] {connected}/{len(self.sessions)} drone(s) connected")
+        return connected
+
+    def start(self):
+        detector = ObjectDetector(self.model_path, backend=self.backend, num_threads=self.threads_per_worker)
+        detector.load_model()
+        self.pool = DetectorPool(detector, workers=self.workers)
+
+        for session in self.sessions:
+            sampler = HybridSampler(base_dir=os.path.join(self.data_dir, session.name),
+                                    stream_fps=30 / self.detect_every, write_workers=1)
+            session.processor = FrameProcessor(detector, sampler, detect_every=self.detect_every,
+                                               roi_planner=RoiPlanner() if self.roi else None,
+                                               ring_detector=RingDetector() if self.ring_cv else None)
+            if self.rec_dir:
+                session.recorder = FlightRecorder(os.path.join(self.rec_dir, session.name), fps=self.record_fps,
+                                                  input_order=session.controller.frame_order)
+                session.recorder.start()
+
+        self.pool.start()
+        self._running = True
+        for session in self.sessions:
+            thread = threading.Thread(target=self._feed, args=(session,), daemon=True)
+            thread.start()
+            self._feeders.append(thread)
+        print(f"[Session] {len(self.sessions)} drone(s) sharing {self.pool.workers} inference worker(s) "
+              f"x {self.threads_per_worker} thread(s)")
+
+    def _feed(self, session):
+        """Moves a drone's new frames to its recorder and into the pool."""
+        last_seq = 0
+        while self._running:
+            packet = session.controller.wait_for_frame(last_seq, timeout=self.FRAME_TIMEOUT)
+            if packet is None:
+                continue
+            last_seq = packet.seq
+            session.stats['frames'] += 1
+            if session.recorder:
+                session.recorder.submit(packet)
+            self.pool.submit(session, packet)
+
+    def status(self):
+        return [session.status() for session in self.sessions]
+
+    def stop(self):
+        self._running = False
+        for thread in self._feeders:
+            thread.join()
+        self._feeders = []
+        if self.pool:
+            self.pool.stop()
+        for session in self.sessions:
+            if session.processor:
+                session.processor.sampler.close()
+            if session.recorder:
+                session.recorder.stop()
+            session.controller.cleanup()
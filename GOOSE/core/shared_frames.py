@@ -0,0 +1,136 @@
+import time
+from multiprocessing import shared_memory
+
+import numpy as np
+
+from core.frame_bus import FramePacket
+
+# Per-slot metadata: sequence number (-1 while being written) and capture time
+_SLOT_DTYPE = np.dtype([("seq", np.int64), ("timestamp", np.float64)])
+
+
+def _attach_shared_memory(name):
+    """
+    Attaches to an existing segment without taking ownership of it.
+    Processes started through multiprocessing share the owner's resource
+    tracker, so on Python < 3.13 (no track flag) a plain attach is safe.
+    """
+    try:
+        return shared_memory.SharedMemory(name=name, track=False)
+    except TypeError:
+        return shared_memory.SharedMemory(name=name)
+
+
+class SharedFrameRing:
+    """
+    Ring of fixed-shape frame slots in one multiprocessing.shared_memory block.
+
+    One writer process copies each frame into the next slot; any number of
+    reader processes copy the newest slot out. Frames never go through
+    pickling. Slots carry their own sequence number, written last, so a
+    reader can detect (and retry) when the writer lapped it mid-copy.
+
+    Layout: [latest seq int64][slot meta x slots][frame x slots]
+    """
+    def __init__(self, shape=(720, 960, 3), slots=4, name=None, create=True, condition=None):
+        """
+        :param shape: Frame shape every slot holds (HxWxC, uint8).
+        :param slots: Number of ring slots; more slots tolerate slower readers.
+        :param name: Shared memory name to attach to (required if create is False).
+        :param create: Whether this process owns (and later unlinks) the block.
+        :param condition: Optional multiprocessing.Condition notified on each write.
+        """
+        self.shape = tuple(shape)
+        self.slots = slots
+        self.condition = condition
+        self._owner = create
+
+        frame_bytes = int(np.prod(self.shape))
+        meta_offset = np.dtype(np.int64).itemsize
+        frames_offset = meta_offset + _SLOT_DTYPE.itemsize * slots
+        size = frames_offset + frame_bytes * slots
+
+        if create:
+            self.shm = shared_memory.SharedMemory(name=name, create=True, size=size)
+        else:
+            self.shm = _attach_shared_memory(name)
+        self.name = self.shm.name
+
+        buf = self.shm.buf
+        self._latest = np.ndarray((1,), dtype=np.int64, buffer=buf, offset=0)
+        self._meta = np.ndarray((slots,), dtype=_SLOT_DTYPE, buffer=buf, offset=meta_offset)
+        self._frames = np.ndarray((slots, *self.shape), dtype=np.uint8, buffer=buf, offset=frames_offset)
+
+        if create:
+            self._latest[0] = 0
+            self._meta["seq"] = -1
+
+    def spec(self):
+        """Returns the kwargs another process needs to attach to this ring."""
+        return {"shape": self.shape, "slots": self.slots, "name": self.name}
+
+    @property
+    def latest_seq(self):
+        return int(self._latest[0])
+
+    def write(self, frame, timestamp=None):
+        """
+        Copies a frame into the next slot (writer process only).
+        :return: Sequence number of the written frame.
+        """
+        seq = self.latest_seq + 1
+        slot = seq % self.slots
+
+        self._meta["seq"][slot] = -1 # Mark slot as in-flight for readers
+        np.copyto(self._frames[slot], frame)
+        self._meta["timestamp"][slot] = time.monotonic() if timestamp is None else timestamp
+        self._meta["seq"][slot] = seq
+        self._latest[0] = seq
+
+        if self.condition is not None:
+            with self.condition:
+                self.condition.notify_all()
+        return seq
+
+    def read_latest(self, after_seq=0, out=None):
+        """
+        Copies the newest frame out if it is newer than after_seq.
+        :param after_seq: Sequence number the caller already has.
+        :param out: Optional preallocated array to copy into.
+        :return: FramePacket, or None if nothing newer is available.
+        """
+        for _ in range(self.slots):
+            seq = self.latest_seq
+            if seq <= after_seq:
+                return None
+
+            slot = seq % self.slots
+            frame = np.empty(self.shape, dtype=np.uint8) if out is None else out
+            np.copyto(frame, self._frames[slot])
+            timestamp = float(self._meta["timestamp"][slot])
+
+            # Writer lapped us while copying: the slot now holds another frame
+            if int(self._meta["seq"][slot]) == seq:
+                return FramePacket(seq, timestamp, frame)
+        return None
+
+    def wait_latest(self, after_seq=0, timeout=None, out=None):
+        """
+        Blocks (on the ring's condition) until a frame newer than after_seq exists.
+        :return: FramePacket, or None on timeout.
+        """
+        if self.condition is not None and self.latest_seq <= after_seq:
+            with self.condition:
+                self.condition.wait_for(lambda: self.latest_seq > after_seq, timeout)
+        return self.read_latest(after_seq, out)
+
+    def close(self):
+        """Detaches from the block; the owner also unlinks it."""
+        # Drop the views first, otherwise SharedMemory.close() raises BufferError
+        self._latest = self._meta = self._frames = None
+        self.shm.close()
+        if self._owner:
+            try:
+                self.shm.unlink()
+            except FileNotFoundError:
+                pass
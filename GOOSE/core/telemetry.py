@@ -0,0 +1,220 @@
+import json
+import struct
+import threading
+import time
+
+import numpy as np
+
+# Tello state fields kept per sample ('t' is the time.monotonic() the state packet was seen)
+TELEMETRY_FIELDS = ('pitch', 'roll', 'yaw', 'vgx', 'vgy', 'vgz', 'templ', 'temph',
+                    'tof', 'h', 'bat', 'baro', 'time', 'agx', 'agy', 'agz')
+TELEMETRY_DTYPE = np.dtype([('t', np.float64)] + [(name, np.float32) for name in TELEMETRY_FIELDS])
+
+LOG_MAGIC = b'GTL1'
+BLOCK_HEADER = struct.Struct('<I')
+
+
+class TelemetryRing:
+    """
+    Preallocated ring of telemetry samples with fixed-dtype columns.
+
+    One writer appends; readers take snapshots, which are copies made under
+    a short lock, so they never see a half-written row and can keep the
+    result as long as they like.
+    """
+    def __init__(self, capacity=4096):
+        self.capacity = capacity
+        self.data = np.zeros(capacity, dtype=TELEMETRY_DTYPE)
+        self.count = 0 # Total samples ever appended
+        self._lock = threading.Lock()
+
+    def append(self, row):
+        """:param row: Tuple in TELEMETRY_DTYPE field order."""
+        with self._lock:
+            self.data[self.count % self.capacity] = row
+            self.count += 1
+
+    def latest(self):
+        """Returns the newest sample as a dict, or None before the first one."""
+        with self._lock:
+            if not self.count:
+                return None
+            row = self.data[(self.count - 1) % self.capacity]
+            return {name: row[name].item() for name in TELEMETRY_DTYPE.names}
+
+    def snapshot(self, n=None, since=None):
+        """
+        Copies recent samples in chronological order.
+        :param n: At most this many of the newest samples (default: all kept).
+        :param since: Only samples with t > since (monotonic seconds).
+        :return: Structured array with TELEMETRY_DTYPE
+        """
+        with self._lock:
+            kept = min(self.count, self.capacity)
+            n = kept if n is None else min(n, kept)
+            end = self.count % self.capacity
+            start = end - n
+            if start >= 0:
+                rows = self.data[start:end].copy()
+            else:
+                rows = np.concatenate((self.data[start:], self.data[:end]))
+        return rows if since is None else rows[rows['t'] > since]
+
+    def __len__(self):
+        return min(self.count, self.capacity)
+
+
+class TelemetryLog:
+    """
+    Compact columnar flight log. Samples are buffered and written in blocks;
+    each block stores every field as one contiguous little-endian column.
+    The JSON header records the dtype and the clock it runs on, so rows can
+    be aligned with FlightRecorder's per-frame capture times.
+    """
+    def __init__(self, path, block_rows=256, session=None):
+        """
+        :param path: Output file (e.g. recordings/<session>.telemetry).
+        :param block_rows: Samples per written block.
+        :param session: Name of the matching video session, stored in the header.
+        """
+        self.path = path
+        self.block_rows = block_rows
+        self._block = np.zeros(block_rows, dtype=TELEMETRY_DTYPE)
+        self._rows = 0
+        self.written = 0
+
+        header = json.dumps({
+            'fields': [[name, TELEMETRY_DTYPE[name].str] for name in TELEMETRY_DTYPE.names],
+            'clock': 'monotonic',
+            'start_monotonic': time.monotonic(),
+            'start_wallclock': time.time(),
+            'session': session,
+        }).encode()
+        self._file = open(path, 'wb')
+        self._file.write(LOG_MAGIC + struct.pack('<I', len(header)) + header)
+
+    def append(self, row):
+        self._block[self._rows] = row
+        self._rows += 1
+        if self._rows == self.block_rows:
+            self.flush()
+
+    def flush(self):
+        """Writes the buffered samples as one block."""
+        if not self._rows or self._file is None:
+            return
+        block = self._block[:self._rows]
+        self._file.write(BLOCK_HEADER.pack(self._rows))
+        for name in TELEMETRY_DTYPE.names:
+            self._file.write(np.ascontiguousarray(block[name]).tobytes())
+        self._file.flush()
+        self.written += self._rows
+        self._rows = 0
+
+    def close(self):
+        self.flush()
+        if self._file:
+            self._file.close()
+            self._file = None
+
+
+def read_telemetry_log(path):
+    """
+    Loads a TelemetryLog file.
+    :return: Tuple(header dict, structured array of all samples)
+    """
+    with open(path, 'rb') as f:
+        data = f.read()
+    if data[:4] != LOG_MAGIC:
+        raise ValueError(f"{path} is not a telemetry log")
+    header_len = struct.unpack_from('<I', data, 4)[0]
+    header = json.loads(data[8:8 + header_len])
+    dtype = np.dtype([(name, fmt) for name, fmt in header['fields']])
+
+    blocks = []
+    offset = 8 + header_len
+    while offset + BLOCK_HEADER.size <= len(data):
+        rows = BLOCK_HEADER.unpack_from(data, offset)[0]
+        offset += BLOCK_HEADER.size
+        if offset + rows * dtype.itemsize > len(data):
+            break # Truncated last block
+        block = np.empty(rows, dtype=dtype)
+        for name in dtype.names:
+            size = rows * dtype[name].itemsize
+            block[name] = np.frombuffer(data, dtype=dtype[name], count=rows, offset=offset)
+            offset += size
+        blocks.append(block)
+    return header, np.concatenate(blocks) if blocks else np.empty(0, dtype=dtype)
+
+
+class TelemetryMonitor:
+    """
+    Feeds the Tello state stream into a TelemetryRing (and optionally a
+    TelemetryLog). djitellopy parses each state packet into a new dict and
+    offers no callback, so, like the frame pump, this thread watches for a
+    new dict object and records each one once.
+    """
+    POLL_INTERVAL = 0.005
+
+    def __init__(self, state_fn, capacity=4096):
+        """
+        :param state_fn: Returns the latest parsed state dict (e.g. Tello.get_current_state).
+        :param capacity: Samples kept in the ring.
+        """
+        self.state_fn = state_fn
+        self.ring = TelemetryRing(capacity)
+        self.log = None
+        self._log_lock = threading.Lock()
+        self._thread = None
+        self._running = False
+
+    def start(self):
+        self._running = True
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def start_log(self, path, session=None):
+        """Starts writing every new sample to a columnar log file."""
+        with self._log_lock:
+            if self.log:
+                self.log.close()
+            self.log = TelemetryLog(path, session=session)
+        print(f"[Telemetry] Logging to: {path}")
+
+    @staticmethod
+    def to_row(state, timestamp):
+        return (timestamp,) + tuple(float(state.get(name, np.nan)) for name in TELEMETRY_FIELDS)
+
+    def _run(self):
+        last_state = None
+        while self._running:
+            try:
+                state = self.state_fn()
+            except Exception:
+                state = None
+            if state and state is not last_state:
+                last_state = state
+                row = self.to_row(state, time.monotonic())
+                self.ring.append(row)
+                with self._log_lock:
+                    if self.log:
+                        self.log.append(row)
+            else:
+                time.sleep(self.POLL_INTERVAL)
+
+    def latest(self):
+        return self.ring.latest()
+
+    def snapshot(self, n=None, since=None):
+        return self.ring.snapshot(n, since)
+
+    def stop(self):
+        self._running = False
+        if self._thread:
+            self._thread.join(timeout=1.0)
+            self._thread = None
+        with self._log_lock:
+            if self.log:
+                self.log.close()
+                print(f"[Telemetry] Log closed ({self.log.written} samples)")
+                self.log = None
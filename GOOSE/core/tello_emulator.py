@@ -0,0 +1,445 @@
+import heapq
+import itertools
+import random
+import socket
+import threading
+import time
+from fractions import Fraction
+
+import cv2
+import numpy as np
+
+from core.replay import ReplaySource
+
+# Ports the Tello SDK uses on the client side (djitellopy binds these locally)
+STATE_PORT = 8890
+VIDEO_PORT = 11111
+# djitellopy already binds 8889 on the client, so the emulator listens elsewhere on loopback
+COMMAND_PORT = 9889
+# Tello splits the H.264 stream into datagrams of at most this size
+VIDEO_CHUNK = 1460
+
+# Seconds without a command after which a flying Tello lands on its own
+COMMAND_TIMEOUT = 15.0
+
+
+class FaultInjector:
+    """
+    Degrades the emulated Wi-Fi link: fixed latency plus jitter on every
+    datagram, random loss, and periodic stalls during which nothing gets
+    through (command replies are held back until the stall ends).
+    """
+    def __init__(self, latency=0.0, jitter=0.0, loss=0.0, stall_every=0.0, stall_duration=0.0, seed=None):
+        """
+        :param latency: Added delay per datagram in seconds.
+        :param jitter: Extra uniformly random delay (0..jitter seconds); can reorder datagrams.
+        :param loss: Probability that a datagram is dropped.
+        :param stall_every: Seconds between stalls (0 disables stalls).
+        :param stall_duration: Length of each stall in seconds.
+        :param seed: Seed for reproducible loss/jitter patterns.
+        """
+        self.latency = latency
+        self.jitter = jitter
+        self.loss = loss
+        self.stall_every = stall_every
+        self.stall_duration = stall_duration
+        self._random = random.Random(seed)
+        self._start = time.monotonic()
+
+    def stall_remaining(self, now):
+        """Seconds until the current stall ends (0 if the link is up)."""
+        if not self.stall_every or not self.stall_duration:
+            return 0.0
+        phase = (now - self._start) % self.stall_every
+        # The stall sits at the end of each period, so the link starts up
+        if phase < self.stall_every - self.stall_duration:
+            return 0.0
+        return self.stall_every - phase
+
+    def dropped(self):
+        return self.loss > 0 and self._random.random() < self.loss
+
+    def delay(self):
+        return self.latency + (self._random.uniform(0, self.jitter) if self.jitter else 0.0)
+
+
+class DelayLine:
+    """
+    Sends datagrams from one socket after a per-datagram delay. Datagrams
+    without delay go out directly; the rest wait in a heap for a sender thread.
+    """
+    def __init__(self, sock):
+        self.sock = sock
+        self._heap = []
+        self._order = itertools.count()
+        self._cond = threading.Condition()
+        self._running = True
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def send(self, data, address, delay=0.0):
+        if delay <= 0:
+            self._sendto(data, address)
+            return
+        with self._cond:
+            heapq.heappush(self._heap, (time.monotonic() + delay, next(self._order), data, address))
+            self._cond.notify()
+
+    def _sendto(self, data, address):
+        try:
+            self.sock.sendto(data, address)
+        except OSError:
+            pass # Nobody listening yet; same as a real drone on UDP
+
+    def _run(self):
+        while True:
+            with self._cond:
+                while self._running and not self._heap:
+                    self._cond.wait()
+                if not self._running:
+                    return
+                due, _, data, address = self._heap[0]
+                remaining = due - time.monotonic()
+                if remaining > 0:
+                    self._cond.wait(remaining)
+                    continue
+                heapq.heappop(self._heap)
+            self._sendto(data, address)
+
+    def close(self):
+        with self._cond:
+            self._running = False
+            self._cond.notify()
+        self._thread.join(timeout=1.0)
+
+
+class SimulatedDrone:
+    """
+    Minimal flight model behind the emulator: RC sticks map to velocities
+    and yaw rate, integrated into height/yaw; enough for plausible state
+    packets and for the OSD to react to control input.
+    """
+    MAX_SPEED = 100.0 # cm/s at full stick
+    MAX_YAW_RATE = 100.0 # deg/s at full stick
+    TAKEOFF_HEIGHT = 80.0 # cm
+    BATTERY_DRAIN = 1 / 12.0 # % per second while flying
+
+    def __init__(self, battery=87):
+        self.flying = False
+        self.rc = (0, 0, 0, 0)
+        self.height = 0.0
+        self.yaw = 0.0
+        self.battery = float(battery)
+        self.flight_time = 0.0
+        self.start = time.monotonic()
+
+    def step(self, dt):
+        if not self.flying:
+            return
+        lr, fb, ud, yv = self.rc
+        self.height = min(3000.0, max(30.0, self.height + ud / 100.0 * self.MAX_SPEED * dt))
+        self.yaw = (self.yaw + yv / 100.0 * self.MAX_YAW_RATE * dt + 180.0) % 360.0 - 180.0
+        self.flight_time += dt
+        self.battery = max(0.0, self.battery - self.BATTERY_DRAIN * dt)
+
+    def takeoff(self):
+        self.flying = True
+        self.height = self.TAKEOFF_HEIGHT
+
+    def land(self):
+        self.flying = False
+        self.rc = (0, 0, 0, 0)
+        self.height = 0.0
+
+    def state_line(self):
+        lr, fb, ud, _ = self.rc if self.flying else (0, 0, 0, 0)
+        vgx, vgy, vgz = (int(v / 100.0 * self.MAX_SPEED / 10) for v in (fb, lr, -ud))
+        tof = int(self.height) + 10
+        elapsed = time.monotonic() - self.start
+        return (f"mid:-1;x:-100;y:-100;z:-100;mpry:0,0,0;pitch:0;roll:0;yaw:{int(self.yaw)};"
+                f"vgx:{vgx};vgy:{vgy};vgz:{vgz};templ:{60 + int(elapsed // 120)};"
+                f"temph:{63 + int(elapsed // 120)};tof:{tof};h:{int(self.height)};"
+                f"bat:{int(self.battery)};baro:{100.0 + self.height / 100.0:.2f};"
+                f"time:{int(self.flight_time)};agx:0.00;agy:0.00;agz:-1000.00;\r\n")
+
+
+def synthetic_frames(width, height):
+    """
+    Endless RGB test pattern: a gradient with an orange ring drifting on a
+    Lissajous path and a frame counter, so motion and latency are visible.
+    """
+    base = np.zeros((height, width, 3), dtype=np.uint8)
+    base[..., 0] = np.linspace(40, 90, width, dtype=np.uint8)[None, :]
+    base[..., 1] = np.linspace(60, 120, height, dtype=np.uint8)[:, None]
+    base[..., 2] = 140
+    radius = max(8, min(width, height) // 8)
+    for index in itertools.count():
+        frame = base.copy()
+        t = index / 30.0
+        center = (int(width / 2 + width / 3 * np.sin(t * 0.7)), int(height / 2 + height / 4 * np.sin(t * 1.1)))
+        cv2.circle(frame, center, radius, (255, 120, 0), max(4, radius // 5))
+        cv2.putText(frame, f"EMU {index}", (20, 40), cv2.FONT_HERSHEY_SIMPLEX, 1.0, (255, 255, 255), 2)
+        yield frame
+
+
+def recorded_frames(path, width, height):
+    """Loops a recording (video file or image folder) as RGB frames at the stream resolution."""
+    while True:
+        count = 0
+        for packet in ReplaySource(path):
+            frame = packet.frame
+            if frame.shape[1] != width or frame.shape[0] != height:
+                frame = cv2.resize(frame, (width, height), interpolation=cv2.INTER_AREA)
+            count += 1
+            yield frame
+        if not count:
+            raise ValueError(f"No frames in {path}")
+
+
+class TelloEmulator:
+    """
+    Local stand-in for a Tello on loopback. Speaks the SDK text protocol on
+    a UDP command port, sends state packets to the client's port 8890 after
+    'command', and after 'streamon' streams H.264 (PyAV/libx264) to the
+    client's video port in Tello-sized datagrams, from a recording or a
+    synthetic pattern. All outgoing traffic passes through a FaultInjector.
+
+    Point the app at it with: python main.py --ip 127.0.0.1 --port 9889
+    """
+    def __init__(self, host="127.0.0.1", port=COMMAND_PORT, source=None, width=960, height=720,
+                 fps=30, bitrate=5_000_000, gop=None, state_hz=10.0, faults=None):
+        """
+        :param host: Address to listen on.
+        :param port: Command port (not 8889, which djitellopy binds on the client).
+        :param source: Video file or image folder to stream; None for a synthetic pattern.
+        :param width: Stream width in pixels.
+        :param height: Stream height in pixels.
+        :param fps: Stream frame rate.
+        :param bitrate: Target H.264 bitrate in bits/s.
+        :param gop: Frames between keyframes (default: one per second).
+        :param state_hz: State packets per second.
+        :param faults: FaultInjector applied to every outgoing datagram.
+        """
+        self.host = host
+        self.port = port
+        self.source = source
+        self.width = width
+        self.height = height
+        self.fps = fps
+        self.bitrate = bitrate
+        self.gop = gop or int(round(fps))
+        self.state_hz = state_hz
+        self.faults = faults or FaultInjector()
+
+        self.drone = SimulatedDrone()
+        self.client = None # (ip, port) of the last command sender
+        self.video_port = VIDEO_PORT
+        self.sdk_mode = False
+        self.stats = {'commands': 0, 'rc': 0, 'state': 0, 'frames': 0, 'datagrams': 0,
+                      'dropped': 0, 'stalled': 0, 'bytes': 0}
+
+        self._lock = threading.Lock()
+        self._last_command = time.monotonic()
+        self._running = False
+        self._threads = []
+        self._video_thread = None
+        self._streaming = False
+        self._sock = None
+        self._out = None
+
+    def start(self):
+        self._sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        self._sock.bind((self.host, self.port))
+        self._sock.settimeout(0.2)
+        self._out = DelayLine(self._sock)
+        self._running = True
+        for target in (self._command_loop, self._state_loop):
+            thread = threading.Thread(target=target, daemon=True)
+            thread.start()
+            self._threads.append(thread)
+        source = self.source or "synthetic pattern"
+        print(f"[Emulator] Listening on {self.host}:{self.port} "
+              f"({self.width}x{self.height}@{self.fps} from {source})")
+        return self
+
+    def _send(self, data, address):
+        """Passes one outgoing datagram through the fault injector."""
+        if self.faults.dropped():
+            self.stats['dropped'] += 1
+            return
+        self.stats['datagrams'] += 1
+        self.stats['bytes'] += len(data)
+        delay = self.faults.delay() + self.faults.stall_remaining(time.monotonic())
+        self._out.send(data, address, delay)
+
+    def _command_loop(self):
+        while self._running:
+            try:
+                data, address = self._sock.recvfrom(1024)
+            except socket.timeout:
+                self._check_watchdog()
+                continue
+            except OSError:
+                break
+            command = data.decode('utf-8', errors='replace').strip()
+            with self._lock:
+                self.client = address
+                self._last_command = time.monotonic()
+                reply = self.handle_command(command)
+            if reply is not None:
+                self._send(reply.encode(), address)
+
+    def _check_watchdog(self):
+        with self._lock:
+            if self.drone.flying and time.monotonic() - self._last_command > COMMAND_TIMEOUT:
+                print("[Emulator] No command for 15s, landing.")
+                self.drone.land()
+
+    def handle_command(self, command):
+        """
+        Applies one SDK command to the simulated drone.
+        :return: Reply text, or None for commands Tello doesn't answer (rc).
+        """
+        parts = command.split()
+        if not parts:
+            return 'error'
+        name, args = parts[0], parts[1:]
+        self.stats['commands'] += 1
+        drone = self.drone
+
+        if name == 'rc':
+            self.stats['rc'] += 1
+            try:
+                drone.rc = tuple(max(-100, min(100, int(v))) for v in args[:4])
+            except ValueError:
+                pass
+            return None
+        if name.endswith('?'):
+            return self._query(name[:-1])
+        if name == 'command':
+            self.sdk_mode = True
+        elif not self.sdk_mode:
+            return 'error Not in SDK mode'
+        elif name == 'takeoff':
+            drone.takeoff()
+        elif name in ('land', 'emergency'):
+            drone.land()
+        elif name == 'streamon':
+            self._start_video()
+        elif name == 'streamoff':
+            self._stop_video()
+        elif name == 'port' and len(args) == 2:
+            self.video_port = int(args[1])
+        elif name in ('up', 'down', 'left', 'right', 'forward', 'back', 'cw', 'ccw') and not drone.flying:
+            return 'error Not flying'
+        return 'ok'
+
+    def _query(self, name):
+        drone = self.drone
+        replies = {
+            'battery': str(int(drone.battery)),
+            'speed': '10.0',
+            'time': f"{int(drone.flight_time)}s",
+            'height': f"{int(drone.height // 10)}dm",
+            'temp': '60~63C',
+            'attitude': f"pitch:0;roll:0;yaw:{int(drone.yaw)};",
+            'baro': f"{100.0 + drone.height / 100.0:.2f}",
+            'tof': f"{int(drone.height) * 10 + 100}mm",
+            'wifi': '90',
+            'sdk': '30',
+            'sn': '0TQZEMULATOR',
+            'active': 'ok',
+        }
+        return replies.get(name, 'error')
+
+    def _state_loop(self):
+        interval = 1.0 / self.state_hz
+        deadline = time.monotonic()
+        last = deadline
+        while self._running:
+            deadline += interval
+            time.sleep(max(0.0, deadline - time.monotonic()))
+            now = time.monotonic()
+            with self._lock:
+                self.drone.step(now - last)
+                client = self.client if self.sdk_mode else None
+                line = self.drone.state_line()
+            last = now
+            if client:
+                self.stats['state'] += 1
+                self._send(line.encode(), (client[0], STATE_PORT))
+
+    def _start_video(self):
+        if self._video_thread and self._video_thread.is_alive():
+            return
+        self._streaming = True
+        self._video_thread = threading.Thread(target=self._video_loop, daemon=True)
+        self._video_thread.start()
+
+    def _stop_video(self):
+        self._streaming = False
+        if self._video_thread and self._video_thread is not threading.current_thread():
+            self._video_thread.join(timeout=2.0)
+        self._video_thread = None
+
+    def _open_encoder(self):
+        import av
+        encoder = av.CodecContext.create('libx264', 'w')
+        encoder.width = self.width
+        encoder.height = self.height
+        encoder.pix_fmt = 'yuv420p'
+        encoder.framerate = Fraction(self.fps)
+        encoder.time_base = Fraction(1, self.fps)
+        encoder.bit_rate = self.bitrate
+        # No B-frames and no lookahead, like the drone's own encoder; SPS/PPS repeat on every keyframe
+        encoder.options = {'preset': 'ultrafast', 'tune': 'zerolatency', 'g': str(self.gop),
+                           'keyint_min': str(self.gop), 'bf': '0'}
+        return encoder
+
+    def _video_loop(self):
+        import av
+        encoder = self._open_encoder()
+        frames = recorded_frames(self.source, self.width, self.height) if self.source \
+            else synthetic_frames(self.width, self.height)
+        interval = 1.0 / self.fps
+        deadline = time.monotonic()
+        for index, rgb in enumerate(frames):
+            if not self._streaming or not self._running:
+                break
+            frame = av.VideoFrame.from_ndarray(rgb, format='rgb24').reformat(format='yuv420p')
+            frame.pts = index
+            packets = encoder.encode(frame)
+
+            now = time.monotonic()
+            client = self.client
+            if self.faults.stall_remaining(now):
+                # Frames produced during a stall never arrive; the decoder
+                # sees the gap as corruption until the next keyframe
+                self.stats['stalled'] += 1
+            elif client:
+                address = (client[0], self.video_port)
+                for packet in packets:
+                    payload = bytes(packet)
+                    for offset in range(0, len(payload), VIDEO_CHUNK):
+                        self._send(payload[offset:offset + VIDEO_CHUNK], address)
+                self.stats['frames'] += 1
+
+            deadline += interval
+            remaining = deadline - time.monotonic()
+            if remaining > 0:
+                time.sleep(remaining)
+            else:
+                deadline = time.monotonic() # Encoder fell behind; don't try to catch up in a burst
+
+    def stop(self):
+        self._running = False
+        self._stop_video()
+        for thread in self._threads:
+            thread.join(timeout=1.0)
+        self._threads = []
+        if self._out:
+            self._out.close()
+        if self._sock:
+            self._sock.close()
+            self._sock = None
+        print(f"[Emulator] Stopped. {self.stats}")
@@ -0,0 +1,111 @@
+import argparse
+import hashlib
+import threading
+import time
+import urllib.parse
+from collections import deque
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+
+class UploadStandIn:
+    """
+    Local stand-in for the image upload endpoint, so upload_uncertain_data.py
+    (--url, HttpTarget) can be exercised without Roboflow.
+
+    Accepts POST <url>?name=<file>&tag=<tag> and keeps every payload's
+    content hash. Failures are scripted:
+    - fail_next(count, status) answers the next requests with an error
+      (503/429 are retried by the uploader, other 4xx are not);
+    - accept_limit stops accepting (503) after that many stored uploads,
+      like a sync cut off half way.
+    """
+    def __init__(self, host="127.0.0.1", port=0, accept_limit=None):
+        """
+        :param host: Address to listen on.
+        :param port: Port to listen on (0 picks a free one, see url).
+        :param accept_limit: Most uploads to store before answering 503, or None.
+        """
+        self.accept_limit = accept_limit
+        self.received = [] # (name, tag, digest) per stored upload
+        self.requests = [] # (monotonic time, status) per request
+        self._faults = deque()
+        self._lock = threading.Lock()
+        self._thread = None
+
+        stand_in = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_POST(self):
+                payload = self.rfile.read(int(self.headers.get("Content-Length", 0)))
+                query = urllib.parse.parse_qs(urllib.parse.urlparse(self.path).query)
+                status = stand_in._handle(query.get("name", [""])[0], query.get("tag", [""])[0], payload)
+                self.send_response(status)
+                self.send_header("Content-Length", "0")
+                self.end_headers()
+
+            def log_message(self, format, *args):
+                pass # One line per request would drown the uploader's output
+
+        self._server = ThreadingHTTPServer((host, port), Handler)
+
+    @property
+    def url(self):
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}/upload"
+
+    @property
+    def digests(self):
+        return [digest for _, _, digest in self.received]
+
+    def fail_next(self, count, status=503):
+        """Answers the next `count` requests with `status` instead of storing them."""
+        with self._lock:
+            self._faults.extend([status] * count)
+
+    def _handle(self, name, tag, payload):
+        with self._lock:
+            if self._faults:
+                status = self._faults.popleft()
+            elif self.accept_limit is not None and len(self.received) >= self.accept_limit:
+                status = 503
+            else:
+                status = 200
+                self.received.append((name, tag, hashlib.blake2b(payload, digest_size=16).hexdigest()))
+            self.requests.append((time.monotonic(), status))
+        return status
+
+    def start(self):
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+        if self._thread:
+            self._thread.join(timeout=1.0)
+            self._thread = None
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Run a local upload endpoint. Upload with: python upload_uncertain_data.py --url <url>")
+    parser.add_argument("--host", default="127.0.0.1", help="Address to listen on")
+    parser.add_argument("--port", type=int, default=8000, help="Port to listen on")
+    parser.add_argument("--accept-limit", type=int, default=None,
+                        help="Answer 503 after this many uploads (simulates a cut-off sync)")
+    args = parser.parse_args()
+
+    server = UploadStandIn(args.host, args.port, accept_limit=args.accept_limit).start()
+    print(f"Upload with: python upload_uncertain_data.py --url {server.url}")
+    try:
+        while True:
+            time.sleep(1.0)
+    except KeyboardInterrupt:
+        pass
+    server.stop()
+    print(f"Stored {len(server.received)} upload(s), {len(set(server.digests))} unique")
+
+
+if __name__ == "__main__":
+    main()
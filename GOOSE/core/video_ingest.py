@@ -0,0 +1,247 @@
+import socket
+import threading
+import time
+from collections import deque
+
+from core.frame_bus import FrameBus
+from core.metrics import metrics
+
+# Tello sends each H.264 frame as full 1460-byte datagrams, the last one usually shorter
+TELLO_DATAGRAM = 1460
+# Seconds without a datagram after which a frame ending on a full datagram is complete
+FRAME_GAP = 0.015
+# NAL unit types that let a decoder (re)start: IDR slice, SPS
+RESYNC_NAL_TYPES = (5, 7)
+# NAL unit types that open an access unit: SEI, SPS, access unit delimiter
+ACCESS_UNIT_NAL_TYPES = (6, 7, 9)
+
+
+def nal_types(data):
+    """NAL unit types in an Annex-B H.264 buffer."""
+    types = []
+    index = data.find(b'\x00\x00\x01')
+    while index != -1 and index + 3 < len(data):
+        types.append(data[index + 3] & 0x1f)
+        index = data.find(b'\x00\x00\x01', index + 3)
+    return types
+
+
+def starts_access_unit(datagram):
+    """
+    Whether a datagram opens a new frame: it begins with an Annex-B start code
+    of an SEI, SPS or delimiter, or of a slice that starts a picture
+    (first_mb_in_slice 0, a leading 1 bit in its exp-Golomb code).
+    """
+    if datagram.startswith(b'\x00\x00\x00\x01'):
+        offset = 4
+    elif datagram.startswith(b'\x00\x00\x01'):
+        offset = 3
+    else:
+        return False
+    if len(datagram) < offset + 2:
+        return False
+    nal_type = datagram[offset] & 0x1f
+    if nal_type in (1, 5):
+        return bool(datagram[offset + 1] & 0x80)
+    return nal_type in ACCESS_UNIT_NAL_TYPES
+
+
+class VideoIngest:
+    """
+    Receives and decodes the Tello's H.264 UDP stream directly, replacing
+    djitellopy's reader.
+
+    A receiver thread reassembles frames from datagrams and stamps each
+    with its arrival time. A datagram shorter than a full one ends a frame
+    at once (no parser delay); a frame whose size is an exact multiple of
+    a datagram ends when the next one starts (Annex-B start code) or after
+    FRAME_GAP without data. A decoder thread (PyAV, configurable
+    threads, low-delay mode) always works towards the freshest frame:
+    - while catching up on a burst (more frames waiting than the next
+      one), frames are decoded (later frames reference them) but not
+      converted or published, unless nothing was published for max_lag;
+    - if the backlog exceeds max_lag, it's discarded and decoding resumes
+      at the next keyframe, as it also does after a decode error.
+    Frames are converted to RGB straight at output_size (one swscale pass),
+    so inference can get downscaled frames for free. `ready` is set as
+    soon as the first frame decodes.
+    """
+    def __init__(self, frame_bus=None, port=11111, host="0.0.0.0", threads=2, thread_type='SLICE',
+                 output_size=None, max_lag=0.25, max_queue=30):
+        """
+        :param frame_bus: FrameBus to publish on (a new one if omitted).
+        :param port: Local UDP port the drone streams to.
+        :param host: Local address to bind.
+        :param threads: Decoder threads.
+        :param thread_type: 'SLICE' (no added latency) or 'FRAME'/'AUTO' (more throughput,
+                            but each extra frame thread delays output by a frame).
+        :param output_size: (width, height) to convert frames to, or None for the stream size.
+        :param max_lag: Seconds a frame may wait before the backlog is dropped.
+        :param max_queue: Most received frames held for the decoder.
+        """
+        self.frame_bus = frame_bus or FrameBus()
+        self.port = port
+        self.host = host
+        self.threads = threads
+        self.thread_type = thread_type
+        self.output_size = output_size
+        self.max_lag = max_lag
+        self.max_queue = max_queue
+
+        self.ready = threading.Event()
+        self.stream_size = None
+        self.stats = {'datagrams': 0, 'bytes': 0, 'received': 0, 'decoded': 0, 'published': 0,
+                      'superseded': 0, 'dropped': 0, 'resyncs': 0, 'decode_errors': 0}
+
+        self._frames = deque() # (arrival time, encoded frame bytes)
+        self._cond = threading.Condition()
+        self._running = False
+        self._resync = True # Nothing decodes before the first keyframe anyway
+        self._sock = None
+        self._threads = []
+        self._started = None
+        self._last_arrival = None
+        self._last_publish = None
+
+    def start(self):
+        """Binds the port (before 'streamon', so no datagram is missed) and starts both threads."""
+        self._sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        self._sock.setsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF, 4 * 1024 * 1024)
+        self._sock.bind((self.host, self.port))
+        self._sock.settimeout(0.2)
+        self._running = True
+        self._started = time.monotonic()
+        for target in (self._receive, self._decode):
+            thread = threading.Thread(target=target, daemon=True)
+            thread.start()
+            self._threads.append(thread)
+        return self
+
+    def wait_ready(self, timeout=None):
+        """Blocks until the first frame has decoded. :return: False on timeout."""
+        return self.ready.wait(timeout)
+
+    def _receive(self):
+        buffer = bytearray(64 * 1024)
+        view = memoryview(buffer)
+        parts = []
+        arrival = None
+        while self._running:
+            try:
+                size = self._sock.recv_into(buffer)
+            except socket.timeout:
+                if parts:
+                    self._queue_frame(arrival, parts) # The stream paused after a full datagram
+                    parts = []
+                    self._sock.settimeout(0.2)
+                continue
+            except OSError:
+                break
+            self.stats['datagrams'] += 1
+            self.stats['bytes'] += size
+            datagram = bytes(view[:size])
+            if parts and starts_access_unit(datagram):
+                self._queue_frame(arrival, parts) # The previous frame ended on a full datagram
+                parts = []
+            parts.append(datagram)
+            arrival = time.monotonic()
+            if size >= TELLO_DATAGRAM:
+                self._sock.settimeout(FRAME_GAP) # More of this frame may follow
+                continue
+
+            self._queue_frame(arrival, parts)
+            parts = []
+            self._sock.settimeout(0.2)
+
+    def _queue_frame(self, arrival, parts):
+        with self._cond:
+            self.stats['received'] += 1
+            if len(self._frames) >= self.max_queue:
+                self._drop_backlog()
+            self._frames.append((arrival, b''.join(parts)))
+            self._cond.notify()
+
+    def _drop_backlog(self):
+        """Discards queued frames and restarts at the next keyframe. Call with the lock held."""
+        self.stats['dropped'] += len(self._frames)
+        self._frames.clear()
+        self._resync = True
+        self.stats['resyncs'] += 1
+
+    def _open_decoder(self):
+        import av
+        codec = av.CodecContext.create('h264', 'r')
+        codec.thread_count = self.threads
+        codec.thread_type = self.thread_type
+        codec.options = {'flags': 'low_delay'}
+        return codec
+
+    def _decode(self):
+        import av
+        codec = self._open_decoder()
+        while True:
+            with self._cond:
+                self._cond.wait_for(lambda: self._frames or not self._running)
+                if not self._running:
+                    return
+                arrival, data = self._frames.popleft()
+                if time.monotonic() - arrival > self.max_lag:
+                    self._drop_backlog() # Too far behind to catch up frame by frame
+                    continue
+                if self._resync:
+                    if not any(t in RESYNC_NAL_TYPES for t in nal_types(data)):
+                        self.stats['dropped'] += 1
+                        continue
+                    self._resync = False
+
+            try:
+                with metrics.span('ingest_decode'):
+                    frames = codec.decode(av.Packet(data))
+            except av.error.FFmpegError:
+                self.stats['decode_errors'] += 1
+                with self._cond:
+                    self._resync = True
+                    self.stats['resyncs'] += 1
+                continue
+
+            for frame in frames:
+                self.stats['decoded'] += 1
+                overdue = self._last_publish is None or time.monotonic() - self._last_publish > self.max_lag
+                if len(self._frames) > 1 and not overdue:
+                    # Catching up on a burst: this frame only serves as a reference for the next
+                    self.stats['superseded'] += 1
+                    continue
+                self._publish(frame, arrival)
+
+    def _publish(self, frame, arrival):
+        if self.stream_size is None:
+            self.stream_size = (frame.width, frame.height)
+            print(f"[Ingest] First frame {frame.width}x{frame.height} after "
+                  f"{time.monotonic() - self._started:.2f}s")
+        if self.output_size:
+            width, height = self.output_size
+            # AREA: proper downscaling at half the cost of swscale's default bicubic
+            image = frame.to_ndarray(width=width, height=height, format='rgb24', interpolation='AREA')
+        else:
+            image = frame.to_ndarray(format='rgb24')
+        self.frame_bus.publish(image, arrival)
+        self.stats['published'] += 1
+        metrics.inc('frames_arrived')
+        metrics.observe('frame_age', time.monotonic() - arrival)
+        if self._last_arrival is not None:
+            metrics.observe('frame_interval', arrival - self._last_arrival)
+        self._last_arrival = arrival
+        self._last_publish = time.monotonic()
+        self.ready.set()
+
+    def stop(self):
+        self._running = False
+        with self._cond:
+            self._cond.notify_all()
+        for thread in self._threads:
+            thread.join(timeout=1.0)
+        self._threads = []
+        if self._sock:
+            self._sock.close()
+            self._sock = None
+        print(f"[Ingest] Stopped. {self.stats}")
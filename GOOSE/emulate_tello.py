@@ -0,0 +1,48 @@
+import time
+import argparse
+
+from core.tello_emulator import TelloEmulator, FaultInjector, COMMAND_PORT
+
+def parse_args():
+    parser = argparse.ArgumentParser(
+        description="Run a local Tello stand-in. Connect with: python main.py --ip 127.0.0.1 --port 9889")
+    parser.add_argument("--host", default="127.0.0.1", help="Address to listen on")
+    parser.add_argument("--port", type=int, default=COMMAND_PORT,
+                        help="Command port (8889 is taken by djitellopy on the same machine)")
+    parser.add_argument("--source", default=None,
+                        help="Recording (video file or image folder) to stream; default: synthetic pattern")
+    parser.add_argument("--width", type=int, default=960, help="Stream width")
+    parser.add_argument("--height", type=int, default=720, help="Stream height")
+    parser.add_argument("--fps", type=int, default=30, help="Stream frame rate")
+    parser.add_argument("--bitrate", type=float, default=5.0, help="H.264 bitrate in Mbit/s")
+    parser.add_argument("--state-hz", type=float, default=10.0, help="State packets per second")
+    parser.add_argument("--latency", type=float, default=0.0, help="Added link latency in ms")
+    parser.add_argument("--jitter", type=float, default=0.0, help="Random extra latency up to this many ms")
+    parser.add_argument("--loss", type=float, default=0.0, help="Fraction of datagrams dropped (0-1)")
+    parser.add_argument("--stall-every", type=float, default=0.0, help="Seconds between link stalls (0 = never)")
+    parser.add_argument("--stall-duration", type=float, default=0.5, help="Length of each stall in seconds")
+    parser.add_argument("--seed", type=int, default=None, help="Seed for loss/jitter")
+    parser.add_argument("--duration", type=float, default=0.0, help="Stop after this many seconds (0 = run until Ctrl+C)")
+    return parser.parse_args()
+
+def main():
+    args = parse_args()
+    faults = FaultInjector(latency=args.latency / 1000, jitter=args.jitter / 1000, loss=args.loss,
+                           stall_every=args.stall_every, stall_duration=args.stall_duration, seed=args.seed)
+    emulator = TelloEmulator(host=args.host, port=args.port, source=args.source, width=args.width,
+                             height=args.height, fps=args.fps, bitrate=int(args.bitrate * 1_000_000),
+                             state_hz=args.state_hz, faults=faults).start()
+    print(f"Connect with: python main.py --ip {args.host} --port {args.port}")
+    try:
+        if args.duration:
+            time.sleep(args.duration)
+        else:
+            while True:
+                time.sleep(1.0)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        emulator.stop()
+
+if __name__ == "__main__":
+    main()
@@ -1,90 +1,232 @@
 import cv2
 import os
 import glob
-import sys
+import json
+import time
+import argparse
+import hashlib
+import multiprocessing as mp
+from concurrent.futures import ProcessPoolExecutor, FIRST_COMPLETED, wait
 
-def fix_video(input_path):
+from core.replay import LEGACY_INPUT_ORDER, recorded_channel_order
+
+MANIFEST_NAME = ".fix_manifest.json"
+PROGRESS_EVERY = 100 # Frames between progress reports from a worker
+
+# Set in each worker process by _init_worker
+_progress_queue = None
+
+def is_colour_correct(input_path, legacy_order=LEGACY_INPUT_ORDER):
+    """True if the recording already holds proper BGR (same rule ReplaySource uses)."""
+    return recorded_channel_order(input_path, legacy_order) == "BGR"
+
+def file_digest(path, chunk_size=1 << 20):
+    """Content hash of a file, so renamed or copied recordings are still recognised."""
+    digest = hashlib.blake2b(digest_size=16)
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(chunk_size), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+def load_manifest(directory):
+    try:
+        with open(os.path.join(directory, MANIFEST_NAME)) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+def save_manifest(directory, manifest):
+    """Writes the manifest atomically so an interrupted run never corrupts it."""
+    path = os.path.join(directory, MANIFEST_NAME)
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "w") as f:
+        json.dump(manifest, f, indent=1)
+    os.replace(tmp_path, path)
+
+def _report(filename, frames):
+    if _progress_queue is not None:
+        _progress_queue.put((filename, frames))
+
+def fix_video(input_path, done=None, codec='avc1', legacy_order=LEGACY_INPUT_ORDER):
+    """
+    Swaps R/B in one recording and re-encodes it as <name>_fixed<ext>.
+    :param input_path: Path to the source .mp4.
+    :param done: Manifest of content hashes already fixed ({digest: {"output": ...}}).
+    :param codec: FourCC of the output encoder.
+    :param legacy_order: Frame order of the reader that wrote sidecar-less recordings
+                         (see core.replay.recorded_channel_order).
+    :return: Dict(status, digest, frames, seconds, output)
+    """
     directory, filename = os.path.split(input_path)
     name, ext = os.path.splitext(filename)
-    
+    result = {"file": filename, "status": "skipped", "digest": None, "frames": 0, "seconds": 0.0}
+
     # Avoid re-fixing already fixed files
     if name.endswith("_fixed"):
         print(f"Skipping {filename} (appears to be already fixed)")
-        return
+        return result
+
+    # Only recordings stored as RGB need the swap
+    if is_colour_correct(input_path, legacy_order):
+        print(f"Skipping {filename} (recorded colour-correct)")
+        return result
 
     output_path = os.path.join(directory, f"{name}_fixed{ext}")
-    
+    result["digest"] = digest = file_digest(input_path)
+    previous = (done or {}).get(digest)
+    if previous and os.path.exists(os.path.join(directory, previous["output"])):
+        print(f"Skipping {filename} (same content already fixed as {previous['output']})")
+        return result
+
     cap = cv2.VideoCapture(input_path)
     if not cap.isOpened():
         print(f"Error opening {filename}")
-        return
+        result["status"] = "error"
+        return result
 
     # Get video properties
     width = int(cap.get(cv2.CAP_PROP_FRAME_WIDTH))
     height = int(cap.get(cv2.CAP_PROP_FRAME_HEIGHT))
     fps = cap.get(cv2.CAP_PROP_FPS)
-    total_frames = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
-    
+
     if fps == 0: fps = 30.0 # Fallback
 
+    # Write to a partial file first; it only replaces the output once complete
+    partial_path = os.path.join(directory, f"{name}_fixed.partial{ext}")
+
     # Define codec (avc1 is H.264, universally supported by browsers/Roboflow)
     # If this fails, try 'mp4v' again or ensure openh264 is installed.
-    fourcc = cv2.VideoWriter_fourcc(*'avc1')
-    out = cv2.VideoWriter(output_path, fourcc, fps, (width, height))
+    fourcc = cv2.VideoWriter_fourcc(*codec)
+    out = cv2.VideoWriter(partial_path, fourcc, fps, (width, height))
+    if not out.isOpened():
+        print(f"Error creating output for {filename} (is the '{codec}' encoder available?)")
+        cap.release()
+        result["status"] = "error"
+        return result
 
-    print(f"Processing {filename}...")
-    print(f"  > Output: {os.path.basename(output_path)}")
-    print(f"  > Resolution: {width}x{height}, FPS: {fps}")
+    print(f"Processing {filename} -> {os.path.basename(output_path)} ({width}x{height}, {fps} FPS)")
 
+    start = time.monotonic()
+    frame = None # Decode buffer, reused for every frame
     frame_count = 0
     while True:
-        ret, frame = cap.read()
+        ret, frame = cap.read(frame)
         if not ret:
             break
-        
+
         # --- THE FIX ---
         # The original video has Red and Blue channels swapped.
-        # Calling cvtColor with BGR2RGB swaps them back.
-        fixed_frame = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
+        # Calling cvtColor with BGR2RGB swaps them back (in place, no new allocation).
+        cv2.cvtColor(frame, cv2.COLOR_BGR2RGB, dst=frame)
+
+        out.write(frame)
 
-        out.write(fixed_frame)
-        
         frame_count += 1
-        if frame_count % 100 == 0:
-            print(f"  > Processed {frame_count}/{total_frames} frames", end='\r')
+        if frame_count % PROGRESS_EVERY == 0:
+            _report(filename, PROGRESS_EVERY)
 
-    print(f"  > Done! {frame_count} frames processed.")
-    
+    _report(filename, frame_count % PROGRESS_EVERY)
     cap.release()
     out.release()
+    os.replace(partial_path, output_path)
+
+    result.update(status="fixed", frames=frame_count, seconds=time.monotonic() - start,
+                  output=os.path.basename(output_path))
+    return result
+
+def _init_worker(progress_queue):
+    global _progress_queue
+    _progress_queue = progress_queue
+    # Workers already run in parallel; keep OpenCV from oversubscribing the cores
+    cv2.setNumThreads(1)
+
+def fix_all(videos, directory, jobs=None, force=False, codec='avc1', legacy_order=LEGACY_INPUT_ORDER):
+    """
+    Fixes many recordings in parallel, one file per worker process.
+    Finished files are recorded in a manifest keyed by content hash, so an
+    interrupted run resumes where it stopped.
+    """
+    manifest = {} if force else load_manifest(directory)
+    done = dict(manifest) # Snapshot handed to the workers
+    jobs = jobs or os.cpu_count() or 1
+
+    ctx = mp.get_context("spawn")
+    progress_queue = ctx.Queue()
+    total_frames = 0
+    completed = 0
+    start = time.monotonic()
+
+    print(f"Fixing {len(videos)} file(s) with {jobs} worker(s)...")
+    with ProcessPoolExecutor(max_workers=jobs, mp_context=ctx,
+                             initializer=_init_worker, initargs=(progress_queue,)) as pool:
+        pending = {pool.submit(fix_video, video, done, codec, legacy_order) for video in videos}
+        while pending:
+            finished, pending = wait(pending, timeout=1.0, return_when=FIRST_COMPLETED)
+
+            while not progress_queue.empty():
+                total_frames += progress_queue.get()[1]
+
+            for future in finished:
+                completed += 1
+                try:
+                    result = future.result()
+                except Exception as e:
+                    print(f"  > Worker failed: {e}")
+                    continue
+                if result["status"] == "fixed":
+                    manifest[result["digest"]] = {
+                        "source": result["file"], "output": result["output"], "frames": result["frames"]
+                    }
+                    save_manifest(directory, manifest)
+                    print(f"  > Done {result['file']}: {result['frames']} frames "
+                          f"in {result['seconds']:.1f}s")
+
+            elapsed = time.monotonic() - start
+            print(f"  > Progress: {completed}/{len(videos)} files | {total_frames} frames | "
+                  f"{total_frames / max(elapsed, 1e-6):.0f} FPS", end='\r')
+
+    print()
+    print(f"Finished {completed} file(s), {total_frames} frames in {time.monotonic() - start:.1f}s.")
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Swap R/B channels of flight recordings.")
+    parser.add_argument("target", nargs="?", help="A single .mp4 file or a directory of recordings")
+    parser.add_argument("--jobs", type=int, default=None, help="Worker processes (default: all cores)")
+    parser.add_argument("--codec", default="avc1", help="FourCC of the output encoder (e.g. mp4v)")
+    parser.add_argument("--force", action="store_true", help="Ignore the manifest and redo every file")
+    parser.add_argument("--legacy-order", choices=["RGB", "BGR"], default=LEGACY_INPUT_ORDER,
+                        help="Frame order of the djitellopy that wrote recordings without a sidecar "
+                             "(default: BGR, djitellopy < 2.4; RGB marks them colour-correct)")
+    return parser.parse_args()
 
 def main():
+    args = parse_args()
+
     # Default to the recordings directory in the GOOSE project
     recordings_dir = os.path.join(os.path.dirname(__file__), "recordings")
-    
+
     # Check if a specific file/folder was passed as an argument
-    if len(sys.argv) > 1:
-        target = sys.argv[1]
-        if os.path.isfile(target):
-            fix_video(target)
+    if args.target:
+        if os.path.isfile(args.target):
+            fix_video(args.target, codec=args.codec, legacy_order=args.legacy_order)
             return
-        elif os.path.isdir(target):
-            recordings_dir = target
+        elif os.path.isdir(args.target):
+            recordings_dir = args.target
 
     print(f"Scanning directory: {recordings_dir}")
     if not os.path.exists(recordings_dir):
         print("Directory not found.")
         return
 
-    # Find all MP4s
-    videos = glob.glob(os.path.join(recordings_dir, "*.mp4"))
-    
+    # Find all MP4s (partial outputs of interrupted runs are redone, not fixed again)
+    videos = [v for v in glob.glob(os.path.join(recordings_dir, "*.mp4")) if ".partial" not in v]
+
     if not videos:
         print("No .mp4 files found.")
         return
 
-    for video in videos:
-        fix_video(video)
+    fix_all(sorted(videos), recordings_dir, jobs=args.jobs, force=args.force, codec=args.codec,
+            legacy_order=args.legacy_order)
 
 if __name__ == "__main__":
     main()
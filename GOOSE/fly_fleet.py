@@ -0,0 +1,81 @@
+import os
+import time
+import argparse
+
+from core.metrics import MetricsExporter
+from core.session import SessionManager, parse_drone_spec
+from replay_flights import find_model
+
+def parse_args():
+    parser = argparse.ArgumentParser(
+        description="Connect several Tellos and run them through one shared detector pool.")
+    parser.add_argument("--drone", action="append", required=True, metavar="[NAME=]HOST[:PORT[:VIDEO_PORT]]",
+                        help="Drone to connect (repeatable). Video ports default to 11111, 11112, ...")
+    parser.add_argument("--model", type=str, default="auto",
+                        help="Model path, or onnx/pt/auto to pick from assets/models")
+    parser.add_argument("--backend", choices=['auto', 'onnxruntime', 'ultralytics'], default='auto',
+                        help="Inference backend for .onnx models")
+    parser.add_argument("--workers", type=int, default=None,
+                        help="Inference workers shared by all drones (default: one per drone, at most half the cores)")
+    parser.add_argument("--detect-every", type=int, default=1,
+                        help=f"Run YOLO every N frames per drone (1-{SessionManager.MAX_DETECT_EVERY})")
+    parser.add_argument("--roi", action="store_true", help="Detect in crops around tracked targets")
+    parser.add_argument("--ring-cv", action="store_true",
+                        help="Re-measure rings between YOLO runs with a colour/ellipse fit (centre, radius, tilt)")
+    parser.add_argument("--decoder-threads", type=int, default=1, help="H.264 decoder threads per drone")
+    parser.add_argument("--ingest-size", default=None, metavar="WxH",
+                        help="Scale frames to this size while decoding, e.g. 640x480 (also what gets recorded)")
+    parser.add_argument("--data-dir", default="./flight_data", help="Root of the per-drone sample stores")
+    parser.add_argument("--record", default=None, metavar="DIR", help="Record every drone's video under DIR/<name>")
+    parser.add_argument("--record-fps", type=float, default=30.0, help="Frame rate of the recordings")
+    parser.add_argument("--metrics", default=None, help="Export latency metrics to PATH.json/PATH.prom")
+    parser.add_argument("--status-every", type=float, default=5.0, help="Seconds between status reports")
+    parser.add_argument("--duration", type=float, default=0.0, help="Stop after this many seconds (0 = until Ctrl+C)")
+    args = parser.parse_args()
+    if not 1 <= args.detect_every <= SessionManager.MAX_DETECT_EVERY:
+        parser.error(f"--detect-every must be between 1 and {SessionManager.MAX_DETECT_EVERY}")
+    return args
+
+def main():
+    args = parse_args()
+    model_path = args.model if args.model not in ('onnx', 'pt', 'auto') else find_model(args.model)
+    if not model_path or not os.path.exists(model_path):
+        print("No model found. Pass --model <path> or place one in assets/models.")
+        return
+
+    drones = [parse_drone_spec(spec, i) for i, spec in enumerate(args.drone)]
+    ports = [d['video_port'] for d in drones]
+    if len(set(ports)) != len(ports):
+        print(f"Every drone needs its own video port, got {ports}")
+        return
+
+    ingest_size = None
+    if args.ingest_size:
+        ingest_size = tuple(int(v) for v in args.ingest_size.lower().split('x'))
+
+    exporter = None
+    if args.metrics:
+        exporter = MetricsExporter(args.metrics)
+        exporter.start()
+
+    manager = SessionManager(drones, model_path, backend=args.backend, workers=args.workers,
+                             detect_every=args.detect_every, roi=args.roi, data_dir=args.data_dir,
+                             rec_dir=args.record, record_fps=args.record_fps,
+                             decoder_threads=args.decoder_threads, ingest_size=ingest_size, ring_cv=args.ring_cv)
+    manager.connect()
+    manager.start()
+    start = time.monotonic()
+    try:
+        while not args.duration or time.monotonic() - start < args.duration:
+            time.sleep(min(args.status_every, args.duration or args.status_every))
+            for line in manager.status():
+                print(f"[Session] {line}")
+    except KeyboardInterrupt:
+        pass
+    finally:
+        manager.stop()
+        if exporter:
+            exporter.stop()
+
+if __name__ == "__main__":
+    main()
@@ -1,15 +1,22 @@
 import pygame
-import cv2
-import numpy as np
 import os
 import argparse
 import threading
 import time
-import datetime
 
+from core.course import CoursePlayer, load_course
+from core.display import VideoView
 from core.drone import DroneController
+from core.metrics import MetricsExporter, metrics
+from core.pipeline import RemoteDroneController, ProcessVisionWorker
+from core.recorder import FlightRecorder
+from core.replay import ReplayController
 from vision.detector import ObjectDetector
 from vision.sampler import HybridSampler
+from vision.frame_processor import FrameProcessor
+from vision.ring_detector import RingDetector
+from vision.roi import RoiPlanner
+from vision.scheduler import InferenceScheduler
 from ui import Setup 
 
 # NOTE: This Pygame window is a temporary placeholder.
@@ -20,52 +27,66 @@ SCREEN_HEIGHT = 720
 SPEED = 100
 YAW_SPEED = 60
 UD_SPEED = 60 
+UI_FPS = 60
+METRICS_OSD_INTERVAL = 0.5 # Seconds between metrics overlay refreshes
 
 class VisionWorker(threading.Thread):
-    def __init__(self, controller, detector):
+    FRAME_TIMEOUT = 0.5 # Seconds to wait for a new frame before re-checking state
+
+    def __init__(self, controller, detector, detect_every=1, scheduler=None, roi=False, ring_cv=False):
         super().__init__()
         self.controller = controller
         self.detector = detector
         self.running = True
         self.latest_detections = []
+        self.latest_seq = 0 # Frame sequence number the detections belong to
         self.conf_threshold = 0.5
-        self.sampler = HybridSampler() # Active Learning Sampler
+        self.sampler = HybridSampler(stream_fps=30 / max(1, detect_every)) # Active Learning Sampler
+        # Run YOLO every N frames (or as the scheduler decides); tracker fills the gaps
+        self.processor = FrameProcessor(detector, self.sampler, scheduler=scheduler,
+                                        detect_every=detect_every,
+                                        roi_planner=RoiPlanner() if roi else None,
+                                        ring_detector=RingDetector() if ring_cv else None)
         self.daemon = True # Kill thread if main program exits
 
+    @property
+    def status(self):
+        return self.processor.status()
+
     def run(self):
         print("Vision Worker Started (Hybrid Sampling Active)")
         processed_count = 0
+        skipped_count = 0
         none_count = 0
+        last_seq = 0
         while self.running:
-            frame = self.controller.get_frame()
-            if frame is not None:
-                none_count = 0 # Reset
-                if self.detector:
-                    try:
-                        # Run detection at 0.20 to capture uncertainty candidates (0.2-0.6)
-                        sampling_threshold = min(0.20, self.conf_threshold)
-                        _, all_detections = self.detector.detect(frame, conf_threshold=sampling_threshold, draw_center=False)
-                        
-                        # Filter for display detections
-                        self.latest_detections = [d for d in all_detections if d['conf'] >= self.conf_threshold]
-                        
-                        # Process sampling (Context + Uncertainty)
-                        self.sampler.process_frame(frame, all_detections)
-                        
-                        processed_count += 1
-                        if processed_count % 100 == 0:
-                            print(f"[VisionWorker] Heartbeat: Processed {processed_count} frames...")
-                            
-                    except Exception as e:
-                        print(f"Vision Error: {e}")
-            else:
+            # Blocks until a newer frame is published; stale frames are skipped
+            packet = self.controller.wait_for_frame(last_seq, timeout=self.FRAME_TIMEOUT)
+            if packet is None:
                 none_count += 1
-                if none_count % 300 == 0: # Every ~3 seconds
+                if none_count % 6 == 0: # Every ~3 seconds
                     print("[VisionWorker] WARNING: No frames received from drone stream.")
-            
-            # Prevent CPU pinning
-            time.sleep(0.01)
-        
+                continue
+
+            none_count = 0 # Reset
+            if last_seq:
+                skipped_count += packet.seq - last_seq - 1
+            last_seq = packet.seq
+
+            if self.detector:
+                try:
+                    self.latest_detections, detected = self.processor.process(packet, self.conf_threshold)
+                    self.latest_seq = packet.seq
+
+                    if detected:
+                        processed_count += 1
+                        if processed_count % 100 == 0:
+                            print(f"[VisionWorker] Heartbeat: Processed {processed_count} frames "
+                                  f"(skipped {skipped_count} stale) | {self.status}")
+
+                except Exception as e:
+                    print(f"Vision Error: {e}")
+
         self.sampler.close()
 
     def stop(self):
@@ -114,45 +135,81 @@ def get_keyboard_input(controller, current_threshold):
     # 'C' key handled in main event loop for single-press toggle
     return [lr, fb, ud, yv], new_threshold
 
-def draw_detections(frame, detections):
-    """
-    Draws boxes and centers on the frame manually.
-    """
-    for d in detections:
-        box = d['box']
-        x1, y1, x2, y2 = box
-        
-        # Draw Box (Green)
-        cv2.rectangle(frame, (x1, y1), (x2, y2), (0, 255, 0), 2)
-        
-        # Draw Center
-        cx, cy = d['center']
-        cv2.circle(frame, (cx, cy), 5, (0, 0, 255), -1) # Red center dot
-        
-        # Label
-        track_id = d.get('track_id')
-        id_text = f"ID: {track_id} " if track_id is not None else ""
-        label = f"{id_text}{d['name']} {d['conf']:.2f}"
-        
-        cv2.putText(frame, label, (x1, y1 - 10), cv2.FONT_HERSHEY_SIMPLEX, 0.5, (0, 255, 0), 2)
-    return frame
+def telemetry_text(sample):
+    speed = (sample['vgx'] ** 2 + sample['vgy'] ** 2 + sample['vgz'] ** 2) ** 0.5
+    return (f"Bat: {sample['bat']:.0f}% | Height: {sample['h']:.0f} cm | Speed: {speed:.0f} | "
+            f"Pitch/Roll/Yaw: {sample['pitch']:.0f}/{sample['roll']:.0f}/{sample['yaw']:.0f}")
 
 def parse_args():
     parser = argparse.ArgumentParser(description='Tello Drone Control with YOLO')
     parser.add_argument('--model', type=str, choices=['onnx', 'pt', 'auto'], default='auto',
                         help='Force model type: onnx or pt')
+    parser.add_argument('--backend', type=str, choices=['auto', 'onnxruntime', 'ultralytics'], default='auto',
+                        help='Inference backend for .onnx models (auto prefers native onnxruntime)')
     # Connection parameters (Issue #18)
     parser.add_argument('--ip', type=str, default='192.168.10.1', help='Tello IP address')
     parser.add_argument('--port', type=int, default=8889, help='Tello UDP port')
-    return parser.parse_args()
+    parser.add_argument('--detect-every', type=int, default=1,
+                        help='Run YOLO every N frames and track boxes in between')
+    parser.add_argument('--target-dps', type=float, default=None,
+                        help='Enable the adaptive scheduler and hold this many detections/sec')
+    parser.add_argument('--max-latency', type=float, default=0.2,
+                        help='Adaptive scheduler: max seconds from frame capture to detection')
+    parser.add_argument('--roi', action='store_true',
+                        help='Detect in crops around tracked targets, with periodic full-frame scans')
+    parser.add_argument('--ring-cv', action='store_true',
+                        help='Re-measure rings between YOLO runs with a colour/ellipse fit (centre, radius, tilt)')
+    parser.add_argument('--record-fps', type=float, default=30.0,
+                        help='Frame rate of the recorded video files')
+    parser.add_argument('--multiprocess', action='store_true',
+                        help='Run capture/decode and inference in separate processes (shared-memory frames)')
+    parser.add_argument('--ingest', type=str, choices=['native', 'djitellopy'], default='native',
+                        help="Video ingest: own low-latency decoder that drops stale frames, or djitellopy's reader")
+    parser.add_argument('--decoder-threads', type=int, default=2,
+                        help='H.264 decoder threads for the native ingest')
+    parser.add_argument('--rc-hz', type=float, default=20.0,
+                        help='Rate of the RC control loop (independent of the UI frame rate)')
+    parser.add_argument('--play-course', type=str, default=None,
+                        help='Fly a recorded .course file (R toggles course recording, ,/. seek 5s)')
+    parser.add_argument('--course-speed', type=float, default=1.0,
+                        help='Speed factor for --play-course (> 0)')
+    parser.add_argument('--replay', type=str, default=None,
+                        help='Play a recording, image folder or recordings directory instead of the drone')
+    parser.add_argument('--replay-speed', type=float, default=1.0,
+                        help='Replay speed factor (0 = as fast as decoding allows)')
+    parser.add_argument('--metrics', type=str, default=None,
+                        help='Export per-stage latency metrics to PATH.json/PATH.prom periodically')
+    parser.add_argument('--metrics-interval', type=float, default=5.0,
+                        help='Seconds between metrics exports')
+    parser.add_argument('--metrics-osd', action='store_true',
+                        help='Show per-stage latencies on screen at start (M toggles)')
+    args = parser.parse_args()
+    if args.course_speed <= 0:
+        parser.error("--course-speed must be positive")
+    if args.replay and args.multiprocess:
+        parser.error("--replay runs in-process; use replay_flights.py for multi-process replay")
+    return args
 
 def main():
     args = parse_args()
     
-    controller = DroneController()
+    # Stages record spans all the time; the exporter only decides whether they're written out
+    exporter = None
+    if args.metrics:
+        exporter = MetricsExporter(args.metrics, interval=args.metrics_interval)
+        exporter.start()
+
+    if args.replay:
+        controller = ReplayController(args.replay, speed=args.replay_speed or None)
+    elif args.multiprocess:
+        controller = RemoteDroneController(rc_hz=args.rc_hz, metrics_path=args.metrics, ingest=args.ingest,
+                                           decoder_threads=args.decoder_threads)
+    else:
+        controller = DroneController(rc_hz=args.rc_hz, ingest=args.ingest, decoder_threads=args.decoder_threads)
     
     # Attempt connection with specified parameters (Issue #18)
-    print(f"Attempting to connect to drone at {args.ip}:{args.port}...")
+    if not args.replay:
+        print(f"Attempting to connect to drone at {args.ip}:{args.port}...")
     controller.connect(host=args.ip, port=args.port)
 
     # Model Loading
@@ -174,37 +231,61 @@ def main():
     detector = None
     vision_thread = None
 
-    if selected_path:
+    if selected_path and args.multiprocess:
+        print(f"Loading Model in inference process: {selected_path}")
+        vision_thread = ProcessVisionWorker(controller, selected_path, backend=args.backend,
+                                            detect_every=args.detect_every,
+                                            target_dps=args.target_dps, max_latency=args.max_latency,
+                                            roi=args.roi, ring_cv=args.ring_cv, metrics_path=args.metrics)
+        vision_thread.start()
+        print("Inference process started.")
+    elif selected_path:
         print(f"Loading Model: {selected_path}")
-        detector = ObjectDetector(selected_path)
+        detector = ObjectDetector(selected_path, backend=args.backend)
         detector.load_model()
+        scheduler = None
+        if args.target_dps:
+            scheduler = InferenceScheduler(args.target_dps, args.max_latency,
+                                           allow_imgsz=detector.supports_imgsz)
         # Start Vision Thread
-        vision_thread = VisionWorker(controller, detector)
+        vision_thread = VisionWorker(controller, detector, detect_every=args.detect_every,
+                                     scheduler=scheduler, roi=args.roi, ring_cv=args.ring_cv)
         vision_thread.start()
         print("VisionWorker thread started.")
     else:
         print("Warning: Vision disabled (No model found at specified paths).")
 
-    # Setup Video Recording
-    rec_dir = "GOOSE/recordings"
-    if not os.path.exists("GOOSE"): rec_dir = "recordings" # Run from root
-    if not os.path.exists(rec_dir): os.makedirs(rec_dir)
-
-    timestamp = datetime.datetime.now().strftime("%Y%m%d_%H%M%S")
-    video_filename = os.path.join(rec_dir, f"flight_{timestamp}.mp4")
-    
-    fourcc = cv2.VideoWriter_fourcc(*'mp4v')
-    out_writer = cv2.VideoWriter(video_filename, fourcc, 30.0, (960, 720))
-    
-    if not out_writer.isOpened():
-        print(f"CRITICAL ERROR: Could not initialize VideoWriter at {video_filename}")
-    else:
-        print(f"Recording video to: {video_filename}")
+    # Setup Video Recording (encoding runs on the recorder's own thread)
+    # Replayed footage is already on disk, so it isn't recorded again
+    recorder = None
+    if not args.replay:
+        rec_dir = "GOOSE/recordings"
+        if not os.path.exists("GOOSE"): rec_dir = "recordings" # Run from root
+        recorder = FlightRecorder(rec_dir, fps=args.record_fps, input_order=controller.frame_order)
+        recorder.start()
+
+        # Telemetry log next to the video segments, on the same monotonic clock
+        controller.start_telemetry_log(os.path.join(rec_dir, f"{recorder.session_name}.telemetry"),
+                                       session=recorder.session_name)
+
+    # Course replay: re-issues recorded commands with their original timing
+    course_player = None
+    if args.play_course:
+        header, events = load_course(args.play_course)
+        course_player = CoursePlayer(controller, events, speed=args.course_speed)
+        course_player.start()
 
     win = init_window()
     font = pygame.font.SysFont(None, 24)
+    view = VideoView(win, font)
+    clock = pygame.time.Clock()
     conf_threshold = 0.5
     swap_rb = False 
+    last_recorded_seq = 0
+    last_shown_seq = 0
+    show_metrics = args.metrics_osd
+    metrics_lines = []
+    metrics_refreshed = 0.0
 
     run = True
     while run:
@@ -213,52 +294,64 @@ def main():
                 run = False
             elif event.type == pygame.KEYDOWN:
                 if event.key == pygame.K_c:
-                    swap_rb = not swap_rb
+                    swap_rb = view.toggle_swap_rb()
                     print(f"Swapped R/B channels. Now: {'BGR->RGB' if swap_rb else 'Raw'}")
+                elif event.key == pygame.K_m:
+                    show_metrics = not show_metrics
+                elif event.key == pygame.K_r and recorder: # Not while replaying
+                    if controller.course_recorder:
+                        controller.stop_course_recording()
+                    else:
+                        course_path = os.path.join(rec_dir, f"{recorder.session_name}_{int(time.time())}.course")
+                        controller.start_course_recording(course_path, session=recorder.session_name)
+                elif event.key in (pygame.K_COMMA, pygame.K_PERIOD) and course_player:
+                    step = 5.0 if event.key == pygame.K_PERIOD else -5.0
+                    course_player.seek(course_player.course_time + step)
 
         # 1. Update Threshold in Vision Thread
         if vision_thread:
             vision_thread.conf_threshold = conf_threshold
 
-        # 2. Controls
+        # 2. Controls (only updates the RC target; the controller's RC loop sends it)
         rc_vals, conf_threshold = get_keyboard_input(controller, conf_threshold)
-        controller.send_rc_control(*rc_vals)
+        if not (course_player and course_player.playing): # Sticks are ignored while a course flies
+            controller.send_rc_control(*rc_vals)
 
         # 3. Video Display & Recording
-        frame = controller.get_frame()
-        if frame is not None:
-            # RECORD RAW FRAME
-            try:
-                frame_bgr = cv2.cvtColor(frame, cv2.COLOR_RGB2BGR)
-                out_writer.write(frame_bgr)
-            except Exception as e:
-                pass
+        render_start = time.monotonic()
+        packet = controller.get_frame_packet()
+        if packet is not None:
+            frame = packet.frame
+
+            # RECORD RAW FRAME (once per new frame, not once per UI tick)
+            if recorder and packet.seq != last_recorded_seq:
+                last_recorded_seq = packet.seq
+                recorder.submit(packet)
 
             # Get latest detections from thread
             detections = vision_thread.latest_detections if vision_thread else []
-            
-            # Prepare for Display
-            display_frame = frame.copy() 
-            display_frame = draw_detections(display_frame, detections)
-            
-            if swap_rb:
-                display_frame = cv2.cvtColor(display_frame, cv2.COLOR_BGR2RGB)
-            
-            # Rotation/Flip for Pygame
-            display_frame = np.rot90(display_frame)
-            display_frame = np.flipud(display_frame)
-
-            surf = pygame.surfarray.make_surface(display_frame)
-            if (surf.get_width() != SCREEN_WIDTH) or (surf.get_height() != SCREEN_HEIGHT):
-                surf = pygame.transform.scale(surf, (SCREEN_WIDTH, SCREEN_HEIGHT))
-            
-            win.blit(surf, (0, 0))
+
+            # Frame upload happens only when the packet is new; overlays go on the window
+            view.draw(packet, detections)
 
             # OSD
             status_text = "CONNECTED" if controller.is_connected else "DISCONNECTED"
             label = f"Status: {status_text} | IP: {args.ip}:{args.port} | Conf: {conf_threshold:.2f} | ESC for Kill Switch"
-            text_surf = font.render(label, True, (255, 0, 0))
-            win.blit(text_surf, (10, 10))
+            win.blit(view.text(label, (255, 0, 0)), (10, 10))
+            if vision_thread:
+                win.blit(view.text(vision_thread.status, (255, 0, 0)), (10, 34))
+            telemetry = controller.get_telemetry()
+            if telemetry:
+                win.blit(view.text(telemetry_text(telemetry), (255, 0, 0)), (10, 58))
+
+            # Per-stage latencies (p50/p99), refreshed a few times a second
+            if show_metrics:
+                if render_start - metrics_refreshed >= METRICS_OSD_INTERVAL:
+                    metrics_lines = metrics.osd_lines()
+                    metrics_refreshed = render_start
+                for i, line in enumerate(metrics_lines):
+                    y = SCREEN_HEIGHT - 24 * (len(metrics_lines) - i)
+                    win.blit(view.text(line, (255, 255, 0)), (10, y))
 
         else:
             win.fill((0, 0, 0))
@@ -266,18 +359,28 @@ def main():
             win.blit(text, (SCREEN_WIDTH//2 - 100, SCREEN_HEIGHT//2))
 
         pygame.display.update()
-        pygame.time.delay(16) 
+        if packet is not None and packet.seq != last_shown_seq:
+            # Capture (frame arrival) to the frame being on screen
+            last_shown_seq = packet.seq
+            metrics.observe('frame_to_screen', time.monotonic() - packet.timestamp)
+        metrics.observe('render', time.monotonic() - render_start)
+        clock.tick(UI_FPS)
 
     # Cleanup
+    if course_player:
+        course_player.stop()
+
     if vision_thread:
         vision_thread.stop()
         vision_thread.join()
     
-    if out_writer:
-        out_writer.release()
-        print("Video Saved.")
+    if recorder:
+        recorder.stop()
+        print(f"Video Saved. Recorder stats: {recorder.stats}")
 
     controller.cleanup()
+    if exporter:
+        exporter.stop()
     pygame.quit()
 
 if __name__ == "__main__":
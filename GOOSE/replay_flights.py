@@ -0,0 +1,235 @@
+import os
+import json
+import time
+import queue
+import argparse
+import threading
+import multiprocessing as mp
+from concurrent.futures import ProcessPoolExecutor, FIRST_COMPLETED, wait
+
+import cv2
+
+from core.replay import ReplaySource, list_sources
+from vision.detector import ObjectDetector
+from vision.frame_processor import FrameProcessor
+from vision.ring_detector import RingDetector
+from vision.roi import RoiPlanner
+from vision.sampler import HybridSampler
+
+PROGRESS_EVERY = 100 # Frames between progress reports from a worker
+CHUNK_FRAMES = 1800 # One minute of 30 FPS footage per job
+
+# Set in each worker process by _init_worker
+_detector = None
+_progress_queue = None
+
+def _init_worker(model_path, backend, threads, progress_queue):
+    global _detector, _progress_queue
+    _progress_queue = progress_queue
+    # Parallelism comes from the process pool; keep OpenCV in each worker single-threaded
+    cv2.setNumThreads(1)
+    _detector = ObjectDetector(model_path, backend=backend, num_threads=threads)
+    _detector.load_model()
+
+def _report(frames):
+    if _progress_queue is not None:
+        _progress_queue.put(frames)
+
+def _decode(source, frames, stop_event, stats):
+    """Decoder thread: fills the prefetch queue so decoding overlaps inference."""
+    try:
+        for packet in source:
+            if stop_event.is_set():
+                break
+            if source.speed:
+                # Paced like a live stream: a busy consumer loses frames instead of lagging
+                try:
+                    frames.put_nowait(packet)
+                except queue.Full:
+                    stats['dropped'] += 1
+            else:
+                frames.put(packet)
+    finally:
+        frames.put(None)
+
+def replay_job(job, out_dir, conf_threshold=0.5, detect_every=1, roi=False, speed=None,
+               prefetch=8, save_detections=False, ring_cv=False):
+    """
+    Runs the vision stack (detector, tracker, sampler) over one slice of a recording.
+    :param job: Tuple(path, start, stop, name) from plan_jobs().
+    :param out_dir: Root directory for sampled data; each job writes to its own subfolder.
+    :param conf_threshold: Confidence threshold for the saved detections.
+    :param detect_every: Run the detector every N frames and track in between.
+    :param roi: Detect in crops around tracked targets between full scans.
+    :param speed: Playback speed factor, or None for as fast as possible.
+    :param prefetch: Decoded frames buffered ahead of inference.
+    :param save_detections: Write <name>.detections.jsonl next to the sampled frames.
+    :param ring_cv: Re-measure rings between detector runs with RingDetector.
+    :return: Dict of per-job stats
+    """
+    path, start, stop, name = job
+    source = ReplaySource(path, speed=speed, start=start, stop=stop)
+    job_dir = os.path.join(out_dir, name)
+    # Offline, a full write queue should slow the replay down rather than lose samples
+    sampler = HybridSampler(base_dir=job_dir, stream_fps=source.fps / max(1, detect_every),
+                            drop_policy='block')
+    processor = FrameProcessor(_detector, sampler, detect_every=detect_every,
+                               roi_planner=RoiPlanner() if roi else None,
+                               ring_detector=RingDetector() if ring_cv else None)
+
+    stats = {'job': name, 'frames': 0, 'detected': 0, 'detections': 0, 'dropped': 0, 'seconds': 0.0}
+    frames = queue.Queue(maxsize=prefetch)
+    stop_event = threading.Event()
+    decoder = threading.Thread(target=_decode, args=(source, frames, stop_event, stats), daemon=True)
+
+    log = open(os.path.join(job_dir, f"{name}.detections.jsonl"), "w") if save_detections else None
+    started = time.monotonic()
+    decoder.start()
+    try:
+        while True:
+            packet = frames.get()
+            if packet is None:
+                break
+            detections, detected = processor.process(packet, conf_threshold)
+            stats['frames'] += 1
+            if detected:
+                stats['detected'] += 1
+                stats['detections'] += len(detections)
+                if log:
+                    log.write(json.dumps({'frame': start + packet.seq - 1, 'detections': detections}) + "\n")
+            if stats['frames'] % PROGRESS_EVERY == 0:
+                _report(PROGRESS_EVERY)
+    finally:
+        stop_event.set()
+        # Unblock the decoder if it is waiting on a full queue
+        while decoder.is_alive():
+            try:
+                frames.get(timeout=0.1)
+            except queue.Empty:
+                pass
+        sampler.close(timeout=None)
+        if log:
+            log.close()
+
+    _report(stats['frames'] % PROGRESS_EVERY)
+    stats['seconds'] = time.monotonic() - started
+    return stats
+
+def plan_jobs(sources, chunk_frames=CHUNK_FRAMES):
+    """
+    Splits sources into independent jobs so one long recording still uses every core.
+    The tracker restarts at each chunk boundary.
+    :return: List of (path, start, stop, name)
+    """
+    jobs = []
+    for path in sources:
+        source = ReplaySource(path)
+        count = source.frame_count
+        if not chunk_frames or count <= chunk_frames:
+            jobs.append((path, 0, None, source.name))
+            continue
+        for start in range(0, count, chunk_frames):
+            stop = start + chunk_frames if start + chunk_frames < count else None
+            jobs.append((path, start, stop, f"{source.name}_{start:07d}"))
+    return jobs
+
+def replay_all(jobs, model_path, out_dir, backend='auto', workers=None, threads=1, **job_args):
+    """
+    Replays many jobs on a process pool. Each worker loads the model once and
+    overlaps decoding (thread), inference and sample writes (sampler pool).
+    """
+    workers = workers or os.cpu_count() or 1
+    ctx = mp.get_context("spawn")
+    progress_queue = ctx.Queue()
+    total_frames = 0
+    completed = 0
+    totals = {'detected': 0, 'detections': 0, 'dropped': 0}
+    start = time.monotonic()
+
+    print(f"Replaying {len(jobs)} job(s) on {workers} worker(s)...")
+    with ProcessPoolExecutor(max_workers=workers, mp_context=ctx, initializer=_init_worker,
+                             initargs=(model_path, backend, threads, progress_queue)) as pool:
+        pending = {pool.submit(replay_job, job, out_dir, **job_args) for job in jobs}
+        while pending:
+            finished, pending = wait(pending, timeout=1.0, return_when=FIRST_COMPLETED)
+
+            while not progress_queue.empty():
+                total_frames += progress_queue.get()
+
+            for future in finished:
+                completed += 1
+                try:
+                    stats = future.result()
+                except Exception as e:
+                    print(f"  > Worker failed: {e}")
+                    continue
+                for key in totals:
+                    totals[key] += stats[key]
+                print(f"  > Done {stats['job']}: {stats['frames']} frames, "
+                      f"{stats['detections']} detections in {stats['seconds']:.1f}s")
+
+            elapsed = time.monotonic() - start
+            print(f"  > Progress: {completed}/{len(jobs)} jobs | {total_frames} frames | "
+                  f"{total_frames / max(elapsed, 1e-6):.0f} FPS", end='\r')
+
+    print()
+    elapsed = time.monotonic() - start
+    print(f"Finished {total_frames} frames in {elapsed:.1f}s "
+          f"({total_frames / max(elapsed, 1e-6):.0f} FPS) | {totals}")
+    return totals
+
+def find_model(model_type='auto'):
+    model_dir = os.path.join(os.path.dirname(__file__), "assets", "models")
+    candidates = {'onnx': ["targetModel.onnx"], 'pt': ["targetModel.pt"],
+                  'auto': ["targetModel.onnx", "targetModel.pt"]}[model_type]
+    for filename in candidates:
+        path = os.path.join(model_dir, filename)
+        if os.path.exists(path):
+            return path
+    return None
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Run the vision stack over recorded flights.")
+    parser.add_argument("target", nargs="?", help="A recording, an image folder or a directory of recordings")
+    parser.add_argument("--model", type=str, default="auto",
+                        help="Model path, or onnx/pt/auto to pick from assets/models")
+    parser.add_argument("--backend", choices=['auto', 'onnxruntime', 'ultralytics'], default='auto',
+                        help="Inference backend for .onnx models")
+    parser.add_argument("--out", default=None, help="Output directory (default: flight_data/replay)")
+    parser.add_argument("--workers", type=int, default=None, help="Worker processes (default: all cores)")
+    parser.add_argument("--threads", type=int, default=1, help="Inference threads per worker")
+    parser.add_argument("--speed", type=float, default=None,
+                        help="Pace playback (1.0 = recorded speed); default is as fast as possible")
+    parser.add_argument("--chunk-frames", type=int, default=CHUNK_FRAMES,
+                        help="Split recordings into jobs of this many frames (0 = whole files)")
+    parser.add_argument("--conf", type=float, default=0.5, help="Confidence threshold for saved detections")
+    parser.add_argument("--detect-every", type=int, default=1, help="Run YOLO every N frames")
+    parser.add_argument("--roi", action="store_true", help="Detect in crops around tracked targets")
+    parser.add_argument("--ring-cv", action="store_true",
+                        help="Re-measure rings between YOLO runs with a colour/ellipse fit (centre, radius, tilt)")
+    parser.add_argument("--save-detections", action="store_true",
+                        help="Write a detections .jsonl per job")
+    return parser.parse_args()
+
+def main():
+    args = parse_args()
+
+    target = args.target or os.path.join(os.path.dirname(__file__), "recordings")
+    sources = list_sources(target) if os.path.exists(target) else []
+    if not sources:
+        print(f"No recordings or images found at {target}")
+        return
+
+    model_path = args.model if args.model not in ('onnx', 'pt', 'auto') else find_model(args.model)
+    if not model_path or not os.path.exists(model_path):
+        print("No model found. Pass --model <path> or place one in assets/models.")
+        return
+
+    out_dir = args.out or os.path.join("flight_data", "replay")
+    jobs = plan_jobs(sources, args.chunk_frames)
+    replay_all(jobs, model_path, out_dir, backend=args.backend, workers=args.workers,
+               threads=args.threads, conf_threshold=args.conf, detect_every=args.detect_every,
+               roi=args.roi, speed=args.speed, save_detections=args.save_detections, ring_cv=args.ring_cv)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,31 @@
+import os
+
+import numpy as np
+import pygame
+import pytest
+
+from core.display import VideoView
+from core.frame_bus import FramePacket
+
+YELLOW = (255, 255, 0)
+
+
+@pytest.fixture
+def window():
+    os.environ.setdefault('SDL_VIDEODRIVER', 'dummy')
+    pygame.init()
+    yield pygame.display.set_mode((320, 240))
+    pygame.quit()
+
+
+def test_ring_outline_is_drawn_scaled(window):
+    view = VideoView(window, pygame.font.Font(None, 16))
+    frame = np.zeros((480, 640, 3), dtype=np.uint8) # Shown at half size
+    ring = {'box': [220, 140, 420, 340], 'center': (320, 240), 'conf': 0.9, 'name': 'Target',
+            'radius': 100, 'tilt': 0, 'angle': 0}
+    view.draw(FramePacket(1, 0.0, frame), [ring])
+
+    # Head-on ring: outline 50 px from the scaled centre (160, 120), nothing in the middle
+    assert window.get_at((210, 120))[:3] == YELLOW
+    assert window.get_at((160, 70))[:3] == YELLOW
+    assert window.get_at((160, 120))[:3] != YELLOW
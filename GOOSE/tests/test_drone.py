@@ -0,0 +1,19 @@
+import importlib.metadata
+
+import pytest
+
+from core.drone import ingest_frame_order
+
+
+@pytest.mark.parametrize("version, order", [("2.5.0", 'RGB'), ("2.4.0", 'RGB'), ("2.3.1", 'BGR')])
+def test_djitellopy_frame_order_follows_version(monkeypatch, version, order):
+    monkeypatch.setattr(importlib.metadata, "version", lambda name: version)
+    assert ingest_frame_order("djitellopy") == order
+    assert ingest_frame_order("native") == 'RGB'
+
+
+def test_unknown_djitellopy_version_counts_as_current(monkeypatch):
+    def missing(name):
+        raise importlib.metadata.PackageNotFoundError(name)
+    monkeypatch.setattr(importlib.metadata, "version", missing)
+    assert ingest_frame_order("djitellopy") == 'RGB'
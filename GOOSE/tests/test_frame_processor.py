@@ -0,0 +1,37 @@
+import numpy as np
+
+from core.frame_bus import FramePacket
+from vision.frame_processor import FrameProcessor
+from vision.scheduler import InferenceScheduler
+from vision.tracker import IoUTracker
+
+
+class StillTarget:
+    """Detector stand-in that always sees the same box."""
+    supports_imgsz = False
+
+    def predict(self, frame, conf_threshold=0.5, imgsz=None):
+        return [{'box': [100, 100, 150, 150], 'conf': 0.9, 'class': 0, 'name': 'ring'}]
+
+
+class NullSampler:
+    def __getattr__(self, name):
+        return lambda *args, **kwargs: None
+
+
+def test_tracks_survive_a_long_detect_stride():
+    processor = FrameProcessor(StillTarget(), NullSampler(), detect_every=20)
+    frame = np.zeros((480, 640, 3), dtype=np.uint8)
+    ids = set()
+    for seq in range(1, 200):
+        detections, _ = processor.process(FramePacket(seq, seq / 30.0, frame), 0.5)
+        assert detections, f"target lost on frame {seq}"
+        ids.update(d['track_id'] for d in detections)
+    assert ids == {1}
+
+
+def test_tracker_age_covers_the_scheduler_max_stride():
+    tracker = IoUTracker(max_age=5)
+    scheduler = InferenceScheduler(max_stride=12, allow_roi=False)
+    FrameProcessor(StillTarget(), NullSampler(), tracker=tracker, scheduler=scheduler)
+    assert tracker.max_age >= FrameProcessor.MISSED_RUNS * 12
@@ -0,0 +1,77 @@
+import glob
+import os
+import time
+
+import cv2
+import numpy as np
+import pytest
+
+from core.frame_bus import FramePacket
+from core.recorder import FlightRecorder
+from core.replay import ReplaySource, recorded_channel_order
+from fix_recordings import fix_video, is_colour_correct
+
+ORANGE = (255, 120, 0) # RGB, as the ingest delivers frames
+TOLERANCE = 12 # mp4v is lossy, even on a flat colour
+
+
+def known_frame(order='RGB'):
+    frame = np.zeros((96, 128, 3), dtype=np.uint8)
+    frame[:] = ORANGE if order == 'RGB' else ORANGE[::-1]
+    return frame
+
+
+def replayed_pixel(path):
+    packets = list(ReplaySource(path))
+    assert packets
+    return packets[len(packets) // 2].frame[48, 64].astype(int)
+
+
+@pytest.mark.parametrize("input_order", ['RGB', 'BGR'])
+def test_recorder_round_trip(tmp_path, input_order):
+    recorder = FlightRecorder(str(tmp_path), input_order=input_order)
+    recorder.start()
+    frame = known_frame(input_order)
+    start = time.monotonic()
+    for index in range(15):
+        recorder.submit(FramePacket(index + 1, start + index / 30.0, frame))
+    recorder.stop()
+
+    path, = glob.glob(os.path.join(str(tmp_path), "*.mp4"))
+    assert recorded_channel_order(path) == 'BGR'
+    assert is_colour_correct(path)
+    assert np.abs(replayed_pixel(path) - ORANGE).max() <= TOLERANCE
+
+
+def write_legacy(path, reader_order):
+    """What main.py wrote before FlightRecorder: RGB2BGR on every reader frame, no sidecar."""
+    writer = cv2.VideoWriter(path, cv2.VideoWriter_fourcc(*'mp4v'), 30.0, (128, 96))
+    for _ in range(15):
+        writer.write(cv2.cvtColor(known_frame(reader_order), cv2.COLOR_RGB2BGR))
+    writer.release()
+
+
+def test_legacy_recording_default_is_fixed(tmp_path):
+    # By default a sidecar-less file came from djitellopy < 2.4 (BGR frames), so it's R/B swapped
+    path = os.path.join(str(tmp_path), "flight_legacy.mp4")
+    write_legacy(path, 'BGR')
+
+    assert recorded_channel_order(path) == 'RGB'
+    assert not is_colour_correct(path)
+    assert np.abs(replayed_pixel(path) - ORANGE).max() <= TOLERANCE
+
+    result = fix_video(path, codec='mp4v')
+    assert result['status'] == 'fixed'
+    fixed = os.path.join(str(tmp_path), result['output'])
+    assert recorded_channel_order(fixed) == 'BGR'
+    assert np.abs(replayed_pixel(fixed) - ORANGE).max() <= TOLERANCE
+
+
+def test_legacy_recording_round_trip(tmp_path):
+    path = os.path.join(str(tmp_path), "flight_legacy.mp4")
+    write_legacy(path, 'RGB')
+
+    assert recorded_channel_order(path, legacy_input_order='RGB') == 'BGR'
+    assert recorded_channel_order(path, legacy_input_order='BGR') == 'RGB'
+    source = ReplaySource(path, channel_order=recorded_channel_order(path, legacy_input_order='RGB'))
+    assert np.abs(list(source)[7].frame[48, 64].astype(int) - ORANGE).max() <= TOLERANCE
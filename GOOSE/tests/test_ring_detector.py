@@ -0,0 +1,96 @@
+import math
+
+import cv2
+import numpy as np
+
+from vision.ring_detector import RingDetector, ellipse_box, ring_outline
+
+ORANGE = (255, 120, 0) # RGB
+
+
+def thickness(radius):
+    return max(4, int(radius // 6))
+
+
+def scene(center, radius, tilt, angle):
+    """Grey-blue background with one orange ring (centre line radius) seen at the given tilt."""
+    frame = np.full((480, 640, 3), (60, 90, 140), dtype=np.uint8)
+    if radius:
+        minor = radius * math.cos(math.radians(tilt))
+        cv2.ellipse(frame, (int(center[0]), int(center[1])), (int(radius), int(minor)), angle, 0, 360,
+                    ORANGE, thickness(radius))
+    return frame
+
+
+def outer_edge(radius, tilt):
+    """Radius and tilt the detector should report: those of the ring's outer edge."""
+    half = thickness(radius) / 2
+    outer = radius + half
+    return outer, math.degrees(math.acos((radius * math.cos(math.radians(tilt)) + half) / outer))
+
+
+def detection(center, radius, tilt, angle):
+    """What the detector and tracker would report for the ring."""
+    minor = radius * math.cos(math.radians(tilt))
+    return {'box': ellipse_box(center, radius, minor, angle), 'center': (int(center[0]), int(center[1])),
+            'conf': 0.8, 'class': 0, 'name': 'Target', 'track_id': 1}
+
+
+def angle_error(a, b):
+    return abs((a - b + 90) % 180 - 90)
+
+
+def test_seed_measures_the_ring():
+    rings = RingDetector()
+    d, = rings.seed(scene((320, 240), 100, 40, 30), [detection((320, 240), 100, 40, 30)], seq=1)
+
+    radius, tilt = outer_edge(100, 40)
+    assert rings.stats['seeded'] == 1
+    assert abs(d['radius'] - radius) <= 4
+    assert abs(d['tilt'] - tilt) <= 4
+    assert angle_error(d['angle'], 30) <= 5
+
+
+def test_track_follows_the_ring_between_detector_runs():
+    rings = RingDetector()
+    rings.seed(scene((300, 240), 90, 30, 20), [detection((300, 240), 90, 30, 20)], seq=1)
+
+    # Moved, grown a little and turned further; the tracker's box is stale
+    center = (315, 230)
+    stale = dict(detection((300, 240), 90, 30, 20), box=[0, 0, 1, 1])
+    estimate, = rings.track(scene(center, 95, 45, 20), 2, [stale])
+
+    assert rings.stats['tracked'] == 1
+    assert math.dist(estimate['center'], center) <= 4
+    radius, tilt = outer_edge(95, 45)
+    assert abs(estimate['radius'] - radius) <= 4
+    assert abs(estimate['tilt'] - tilt) <= 4
+    assert angle_error(estimate['angle'], 20) <= 5
+
+
+def test_track_loses_the_ring_when_its_hue_is_gone():
+    rings = RingDetector()
+    rings.seed(scene((320, 240), 100, 0, 0), [detection((320, 240), 100, 0, 0)], seq=1)
+
+    prediction = detection((320, 240), 100, 0, 0)
+    result, = rings.track(scene((320, 240), 0, 0, 0), 2, [prediction])
+
+    assert result is prediction # Falls back to the tracker's extrapolation
+    assert 'radius' not in result
+    assert rings.stats['lost'] == 1
+
+
+def test_filled_blob_is_not_seeded():
+    frame = np.full((480, 640, 3), (60, 90, 140), dtype=np.uint8)
+    cv2.circle(frame, (320, 240), 80, ORANGE, -1)
+    rings = RingDetector()
+    rings.seed(frame, [detection((320, 240), 80, 0, 0)], seq=1)
+    assert rings.stats == dict(rings.stats, seeded=0, rejected=1)
+    assert not rings.seeds
+
+
+def test_outline_matches_the_estimate():
+    outline = ring_outline({'center': (100, 50), 'radius': 40, 'tilt': 60, 'angle': 90})
+    # Turned 90 degrees: the full radius runs vertically, the foreshortened one horizontally
+    assert np.allclose(outline[:, 1].max() - 50, 40, atol=0.5)
+    assert np.allclose(outline[:, 0].max() - 100, 20, atol=0.5)
@@ -0,0 +1,20 @@
+import itertools
+
+from vision.roi import RoiPlanner
+
+
+def overlaps(a, b):
+    return a[0] < b[2] and b[0] < a[2] and a[1] < b[3] and b[1] < a[3]
+
+
+def test_merge_leaves_no_overlapping_crops():
+    # The bridge grows the first crop into the second after they were compared
+    regions = [(0, 0, 10, 10), (0, 20, 10, 30), (5, 5, 15, 25), (40, 0, 50, 10)]
+    merged = RoiPlanner._merge(regions)
+    assert sorted(merged) == [(0, 0, 15, 30), (40, 0, 50, 10)]
+    assert not any(overlaps(a, b) for a, b in itertools.combinations(merged, 2))
+
+
+def test_merge_keeps_separate_crops():
+    regions = [(0, 0, 10, 10), (20, 20, 30, 30)]
+    assert sorted(RoiPlanner._merge(regions)) == regions
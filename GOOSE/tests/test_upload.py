@@ -0,0 +1,137 @@
+import json
+import os
+
+import pytest
+
+pytest.importorskip("dotenv") # upload_uncertain_data loads .env on import
+
+from core.upload_server import UploadStandIn
+from upload_uncertain_data import MANIFEST_NAME, HttpTarget, load_manifest, upload_all
+
+BACKOFF = 0.05
+
+
+@pytest.fixture
+def server():
+    stand_in = UploadStandIn().start()
+    yield stand_in
+    stand_in.stop()
+
+
+def make_images(folder, count, duplicates=0):
+    """Writes `count` distinct fake JPEGs plus `duplicates` copies of the first under new names."""
+    for index in range(count):
+        with open(os.path.join(folder, f"img_{index:03d}.jpg"), "wb") as f:
+            f.write(b"\xff\xd8" + bytes([index]) * 64)
+    for index in range(duplicates):
+        with open(os.path.join(folder, f"copy_{index:03d}.jpg"), "wb") as f:
+            f.write(b"\xff\xd8" + bytes([0]) * 64)
+
+
+def test_transient_errors_are_retried_with_backoff(tmp_path, server):
+    make_images(str(tmp_path), 1)
+    server.fail_next(2, status=503)
+    server.fail_next(1, status=429)
+
+    stats = upload_all(str(tmp_path), HttpTarget(server.url, "to-label"), workers=1, backoff=BACKOFF)
+
+    assert stats == {"uploaded": 1, "skipped": 0, "failed": 0, "retries": 3}
+    assert [status for _, status in server.requests] == [503, 503, 429, 200]
+    times = [t for t, _ in server.requests]
+    gaps = [b - a for a, b in zip(times, times[1:])]
+    # Jitter is +-50%, so each doubling still outgrows the previous-but-one delay
+    assert gaps[0] >= BACKOFF * 0.5
+    assert gaps[2] > gaps[0]
+
+
+def test_client_errors_fail_fast(tmp_path, server):
+    make_images(str(tmp_path), 1)
+    server.fail_next(1, status=400)
+
+    stats = upload_all(str(tmp_path), HttpTarget(server.url, "to-label"), workers=1, backoff=BACKOFF)
+
+    assert stats["failed"] == 1
+    assert len(server.requests) == 1
+    assert not load_manifest(str(tmp_path))
+
+
+def test_interrupted_sync_resumes_from_manifest(tmp_path, server):
+    folder = str(tmp_path)
+    make_images(folder, 6)
+    target = HttpTarget(server.url, "to-label")
+
+    server.accept_limit = 2
+    first = upload_all(folder, target, workers=1, retries=0)
+    assert first["uploaded"] == 2 and first["failed"] == 4
+    # A crash mid-write leaves a torn last line, which must not break the resume
+    with open(os.path.join(folder, MANIFEST_NAME), "a") as f:
+        f.write('{"target": "http:')
+
+    server.accept_limit = None
+    second = upload_all(folder, target, workers=2, retries=0)
+    assert second["uploaded"] == 4 and second["skipped"] == 2
+    assert len(server.digests) == len(set(server.digests)) == 6
+    assert len(load_manifest(folder)) == 6
+
+
+def test_duplicates_are_uploaded_once(tmp_path, server):
+    folder = str(tmp_path)
+    make_images(folder, 3, duplicates=2)
+    target = HttpTarget(server.url, "to-label")
+
+    stats = upload_all(folder, target, workers=2)
+    assert stats["uploaded"] == 3 and stats["skipped"] == 2
+    assert sorted(set(server.digests)) == sorted(server.digests)
+
+    again = upload_all(folder, target, workers=2)
+    assert again["uploaded"] == 0 and again["skipped"] == 5
+    assert len(server.received) == 3
+    with open(os.path.join(folder, MANIFEST_NAME)) as f:
+        assert all(json.loads(line)["target"] == target.name for line in f)
+
+
+class FailingProject:
+    """Roboflow project stand-in whose upload raises the given error."""
+    def __init__(self, error):
+        self.error = error
+
+    def upload(self, path, tag=None):
+        raise self.error
+
+
+def roboflow_upload(error):
+    from upload_uncertain_data import RoboflowTarget
+    target = RoboflowTarget("key", "workspace", "project", "to-label")
+    target._local.project = FailingProject(error)
+    target.upload("img.jpg", b"\xff\xd8")
+
+
+def http_error(status):
+    requests = pytest.importorskip("requests")
+    response = requests.Response()
+    response.status_code = status
+    return requests.HTTPError(f"HTTP {status}", response=response)
+
+
+@pytest.mark.parametrize("make_error", [
+    lambda: pytest.importorskip("requests").ConnectionError("connection reset"),
+    lambda: pytest.importorskip("requests").Timeout("read timed out"),
+    lambda: http_error(429),
+    lambda: http_error(502),
+])
+def test_roboflow_retries_transient_errors(make_error):
+    from upload_uncertain_data import RetryableError
+    with pytest.raises(RetryableError):
+        roboflow_upload(make_error())
+
+
+@pytest.mark.parametrize("make_error", [
+    lambda: http_error(401),
+    lambda: ValueError("Image format not supported"),
+])
+def test_roboflow_fails_fast_on_other_errors(make_error):
+    from upload_uncertain_data import RetryableError
+    error = make_error()
+    with pytest.raises(type(error)) as raised:
+        roboflow_upload(error)
+    assert not isinstance(raised.value, RetryableError)
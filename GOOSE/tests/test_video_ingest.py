@@ -0,0 +1,79 @@
+import socket
+import time
+from fractions import Fraction
+
+import numpy as np
+import pytest
+
+from core.video_ingest import TELLO_DATAGRAM, VideoIngest, starts_access_unit
+
+av = pytest.importorskip("av")
+
+WIDTH, HEIGHT, FRAMES = 320, 240, 12
+
+
+def encoded_frames():
+    encoder = av.CodecContext.create('libx264', 'w')
+    encoder.width = WIDTH
+    encoder.height = HEIGHT
+    encoder.pix_fmt = 'yuv420p'
+    encoder.time_base = Fraction(1, 30)
+    encoder.options = {'preset': 'ultrafast', 'tune': 'zerolatency', 'bf': '0'}
+    payloads = []
+    for index in range(FRAMES):
+        rgb = np.full((HEIGHT, WIDTH, 3), (index * 20) % 256, dtype=np.uint8)
+        frame = av.VideoFrame.from_ndarray(rgb, format='rgb24').reformat(format='yuv420p')
+        frame.pts = index
+        payloads.extend(bytes(packet) for packet in encoder.encode(frame))
+    payloads.extend(bytes(packet) for packet in encoder.encode(None))
+    return payloads
+
+
+def full_datagrams(payload):
+    """Splits a frame into datagrams that are all full size (trailing zeros are valid H.264)."""
+    payload += b'\x00' * (-len(payload) % TELLO_DATAGRAM)
+    return [payload[offset:offset + TELLO_DATAGRAM] for offset in range(0, len(payload), TELLO_DATAGRAM)]
+
+
+def stream(ingest, payloads, interval):
+    sender = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+    address = ('127.0.0.1', ingest._sock.getsockname()[1])
+    try:
+        for payload in payloads:
+            for datagram in full_datagrams(payload):
+                sender.sendto(datagram, address)
+            time.sleep(interval)
+    finally:
+        sender.close()
+
+
+def wait_for(condition, timeout=5.0):
+    deadline = time.monotonic() + timeout
+    while not condition() and time.monotonic() < deadline:
+        time.sleep(0.01)
+    return condition()
+
+
+@pytest.mark.parametrize("interval", [0.04, 0.0])
+def test_frames_of_full_datagrams_are_split(interval):
+    # Paced, a frame ends after the gap; in a burst, where the next one starts
+    payloads = encoded_frames()
+    ingest = VideoIngest(port=0, host='127.0.0.1', max_lag=5.0).start()
+    try:
+        stream(ingest, payloads, interval)
+        assert wait_for(lambda: ingest.stats['received'] == len(payloads))
+        assert wait_for(lambda: ingest.stats['decoded'] == FRAMES)
+    finally:
+        ingest.stop()
+    assert ingest.stats['decode_errors'] == 0
+    assert ingest.stats['resyncs'] == 0
+    assert ingest.stream_size == (WIDTH, HEIGHT)
+
+
+def test_starts_access_unit():
+    assert starts_access_unit(b'\x00\x00\x00\x01\x67\x42') # SPS
+    assert starts_access_unit(b'\x00\x00\x01\x09\xf0') # Access unit delimiter
+    assert starts_access_unit(b'\x00\x00\x00\x01\x65\x88') # IDR slice, first_mb_in_slice 0
+    assert not starts_access_unit(b'\x00\x00\x00\x01\x41\x20') # Second slice of a picture
+    assert not starts_access_unit(b'\x00\x00\x00\x01\x68\xce') # PPS follows its SPS
+    assert not starts_access_unit(b'\x12\x00\x00\x01\x67\x42') # Middle of a frame
@@ -1,14 +1,246 @@
 import os
+import json
+import time
+import random
+import hashlib
 import argparse
-from roboflow import Roboflow
+import tempfile
+import threading
+import urllib.error
+import urllib.parse
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
 from dotenv import load_dotenv
 
+from core.dataset_store import DatasetReader
+
 # Load environment variables from .env file
 load_dotenv()
 
-def upload_to_roboflow(folder="./flight_data/uncertain/", api_key=None):
+MANIFEST_NAME = ".upload_manifest.jsonl"
+IMAGE_EXTENSIONS = ('.jpg', '.jpeg', '.png')
+
+class RetryableError(Exception):
+    """Upload failure worth retrying (network error, rate limit, server error)."""
+
+def is_retryable_status(code):
+    """Rate limits and server errors pass; any other HTTP error won't change on retry."""
+    return code == 429 or code >= 500
+
+class RoboflowTarget:
+    """Uploads through the Roboflow SDK; one project handle per worker thread."""
+    def __init__(self, api_key, workspace_id, project_id, tag):
+        self.api_key = api_key
+        self.workspace_id = workspace_id
+        self.project_id = project_id
+        self.tag = tag
+        self.name = f"roboflow:{workspace_id}/{project_id}"
+        self._local = threading.local()
+
+    def _project(self):
+        if not hasattr(self._local, "project"):
+            from roboflow import Roboflow
+            rf = Roboflow(api_key=self.api_key)
+            self._local.project = rf.workspace(self.workspace_id).project(self.project_id)
+        return self._local.project
+
+    def upload(self, img_name, payload):
+        # The SDK only uploads from a path
+        fd, path = tempfile.mkstemp(suffix=os.path.splitext(img_name)[1] or ".jpg")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                f.write(payload)
+            self._project().upload(path, tag=self.tag)
+        except Exception as e:
+            if self.is_transient(e):
+                raise RetryableError(str(e)) from e
+            raise
+        finally:
+            os.remove(path)
+
+    @staticmethod
+    def is_transient(error):
+        """
+        True for network errors, timeouts and 429/5xx responses anywhere in
+        the exception chain (the SDK wraps requests' errors); anything else,
+        e.g. a bad API key or a rejected image, fails fast.
+        """
+        import requests # Installed with the roboflow SDK
+        network_errors = (requests.ConnectionError, requests.Timeout, ConnectionError, TimeoutError)
+        while error is not None:
+            if isinstance(error, network_errors):
+                return True
+            status = getattr(getattr(error, "response", None), "status_code", None)
+            if status is not None:
+                return is_retryable_status(status)
+            error = error.__cause__ or error.__context__
+        return False
+
+class HttpTarget:
+    """
+    Uploads by POSTing the raw image to <url>?name=<file>&tag=<tag>. Used
+    with a local stand-in server to test the uploader without Roboflow.
+    """
+    def __init__(self, url, tag, timeout=30.0):
+        self.url = url
+        self.tag = tag
+        self.timeout = timeout
+        self.name = f"http:{url}"
+
+    def upload(self, img_name, payload):
+        query = urllib.parse.urlencode({"name": img_name, "tag": self.tag})
+        request = urllib.request.Request(f"{self.url}?{query}", data=payload, method="POST",
+                                         headers={"Content-Type": "image/jpeg"})
+        try:
+            with urllib.request.urlopen(request, timeout=self.timeout) as response:
+                response.read()
+        except urllib.error.HTTPError as e:
+            if is_retryable_status(e.code):
+                raise RetryableError(f"HTTP {e.code}") from e
+            raise
+        except (urllib.error.URLError, OSError) as e:
+            raise RetryableError(str(e)) from e
+
+class RateLimiter:
+    """Token bucket shared by all workers: at most `rate` uploads/sec, bursts up to `burst`."""
+    def __init__(self, rate, burst=1):
+        self.rate = rate
+        self.burst = max(1, burst)
+        self._tokens = float(self.burst)
+        self._last = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        if not self.rate:
+            return
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._tokens = min(self.burst, self._tokens + (now - self._last) * self.rate)
+                self._last = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                delay = (1 - self._tokens) / self.rate
+            time.sleep(delay)
+
+def load_manifest(folder):
+    """Reads the upload journal: {(target, digest): entry}. A torn last line is ignored."""
+    done = {}
+    try:
+        with open(os.path.join(folder, MANIFEST_NAME)) as f:
+            for line in f:
+                try:
+                    entry = json.loads(line)
+                except ValueError:
+                    continue
+                done[(entry["target"], entry["digest"])] = entry
+    except OSError:
+        pass
+    return done
+
+def open_manifest(folder):
+    """Opens the upload journal for appending, ending a torn last line so it can't swallow the next entry."""
+    manifest = open(os.path.join(folder, MANIFEST_NAME), "a+b")
+    if manifest.tell():
+        manifest.seek(-1, os.SEEK_END)
+        if manifest.read(1) != b"\n":
+            manifest.write(b"\n")
+    manifest.close()
+    return open(os.path.join(folder, MANIFEST_NAME), "a")
+
+def iter_images(folder):
+    """
+    Yields (name, payload bytes) for every uncertain image: records of a
+    packed sample store (HybridSampler) or loose image files.
+    """
+    reader = DatasetReader(folder)
+    if reader.entries:
+        for entry, payload in reader.iter_records(reason='uncertain'):
+            yield f"{entry['id']}.jpg", payload
+    else:
+        for img_name in sorted(os.listdir(folder)):
+            if img_name.lower().endswith(IMAGE_EXTENSIONS):
+                with open(os.path.join(folder, img_name), "rb") as f:
+                    yield img_name, f.read()
+    reader.close()
+
+def upload_with_retry(target, limiter, img_name, payload, retries=5, backoff=1.0):
+    """
+    Uploads one image, retrying transient failures with exponential backoff and jitter.
+    :return: Number of attempts used
+    """
+    for attempt in range(1, retries + 2):
+        limiter.acquire()
+        try:
+            target.upload(img_name, payload)
+            return attempt
+        except RetryableError as e:
+            if attempt > retries:
+                raise
+            delay = backoff * 2 ** (attempt - 1) * random.uniform(0.5, 1.5)
+            print(f"  > Retry {attempt}/{retries} for {img_name} in {delay:.1f}s ({e})")
+            time.sleep(delay)
+
+def upload_all(folder, target, workers=8, rate=None, retries=5, backoff=1.0):
+    """
+    Uploads every uncertain image not uploaded to this target before.
+    Images are deduplicated by content hash, both against the manifest and
+    within the run; each success is appended to the manifest immediately,
+    so an interrupted sync resumes where it stopped.
+    :return: Dict of counters
     """
-    Uploads images from the uncertainty folder to Roboflow with the 'to-label' tag.
+    done = load_manifest(folder)
+    limiter = RateLimiter(rate, burst=workers)
+    stats = {"uploaded": 0, "skipped": 0, "failed": 0, "retries": 0}
+    seen = set()
+    start = time.monotonic()
+
+    print(f"Starting upload to {target.name} with {workers} worker(s)...")
+    with open_manifest(folder) as manifest, \
+            ThreadPoolExecutor(max_workers=workers) as pool:
+        pending = {}
+
+        def collect():
+            finished, _ = wait(pending, return_when=FIRST_COMPLETED)
+            for future in finished:
+                img_name, digest = pending.pop(future)
+                try:
+                    stats["retries"] += future.result() - 1
+                except Exception as e:
+                    stats["failed"] += 1
+                    print(f"Failed to upload {img_name}: {e}")
+                    continue
+                stats["uploaded"] += 1
+                manifest.write(json.dumps({"target": target.name, "digest": digest,
+                                           "name": img_name, "time": time.time()}) + "\n")
+                manifest.flush()
+                if stats["uploaded"] % 50 == 0:
+                    elapsed = time.monotonic() - start
+                    print(f"  > Uploaded {stats['uploaded']} ({stats['uploaded'] / elapsed:.1f}/s)")
+
+        for img_name, payload in iter_images(folder):
+            digest = hashlib.blake2b(payload, digest_size=16).hexdigest()
+            if (target.name, digest) in done or digest in seen:
+                stats["skipped"] += 1
+                continue
+            seen.add(digest)
+            # Keep a bounded number of images in flight instead of reading everything up front
+            while len(pending) >= workers * 2:
+                collect()
+            future = pool.submit(upload_with_retry, target, limiter, img_name, payload, retries, backoff)
+            pending[future] = (img_name, digest)
+        while pending:
+            collect()
+
+    elapsed = time.monotonic() - start
+    print(f"Upload complete in {elapsed:.1f}s: {stats}")
+    return stats
+
+def upload_to_roboflow(folder="./flight_data", api_key=None, workers=8, rate=None, url=None):
+    """
+    Uploads uncertain images (from the sample store or a folder of images)
+    to Roboflow with the 'to-label' tag, or to a plain HTTP endpoint.
     """
     # Load from environment variables with fallbacks
     api_key = api_key or os.getenv("ROBOFLOW_API_KEY")
@@ -16,41 +248,30 @@ def upload_to_roboflow(folder="./flight_data/uncertain/", api_key=None):
     project_id = os.getenv("PROJECT_ID", "targetpractice")
     tag = os.getenv("TAG", "to-label")
 
-    if not api_key:
-        print("Error: Roboflow API Key not found. Set ROBOFLOW_API_KEY in .env or use --key.")
-        return
-
     if not os.path.exists(folder):
         print(f"Error: Folder {folder} does not exist.")
         return
 
-    # Initialize Roboflow
-    rf = Roboflow(api_key=api_key)
-    project = rf.workspace(workspace_id).project(project_id)
-
-    # Get all images
-    images = [f for f in os.listdir(folder) if f.lower().endswith(('.jpg', '.jpeg', '.png'))]
-    
-    if not images:
-        print("No uncertain images found to upload.")
+    if url:
+        target = HttpTarget(url, tag)
+    elif not api_key:
+        print("Error: Roboflow API Key not found. Set ROBOFLOW_API_KEY in .env or use --key.")
         return
+    else:
+        target = RoboflowTarget(api_key, workspace_id, project_id, tag)
 
-    print(f"Starting upload of {len(images)} images to {workspace_id}/{project_id}...")
-
-    for img_name in images:
-        path = os.path.join(folder, img_name)
-        try:
-            print(f"Uploading {img_name}...")
-            project.upload(path, tag=tag)
-        except Exception as e:
-            print(f"Failed to upload {img_name}: {e}")
-
-    print("Upload complete.")
+    return upload_all(folder, target, workers=workers, rate=rate)
 
 if __name__ == "__main__":
     parser = argparse.ArgumentParser(description="Upload uncertainty-sampled images to Roboflow.")
-    parser.add_argument("--folder", default="./flight_data/uncertain/", help="Path to uncertainty images")
+    parser.add_argument("--folder", default="./flight_data",
+                        help="Sample store directory, or a folder of loose uncertainty images")
     parser.add_argument("--key", help="Roboflow API Key (overrides .env)")
+    parser.add_argument("--workers", type=int, default=8, help="Concurrent uploads")
+    parser.add_argument("--rate", type=float, default=None, help="Max uploads per second (default: unlimited)")
+    parser.add_argument("--url", default=None,
+                        help="POST images to this HTTP endpoint instead of Roboflow (e.g. a local test server)")
     args = parser.parse_args()
 
-    upload_to_roboflow(folder=args.folder, api_key=args.key)
+    upload_to_roboflow(folder=args.folder, api_key=args.key, workers=args.workers,
+                       rate=args.rate, url=args.url)
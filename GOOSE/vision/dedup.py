@@ -0,0 +1,70 @@
+import cv2
+import numpy as np
+
+
+def dhash(thumb):
+    """64-bit difference hash of a 9x8 grayscale thumbnail."""
+    bits = (thumb[:, 1:] > thumb[:, :-1]).ravel()
+    return np.packbits(bits).view('>u8')[0]
+
+
+class FrameHashIndex:
+    """
+    Remembers the last few saved frames and tells whether a new frame is a
+    near-duplicate of one of them.
+
+    Each entry keeps a 64-bit dHash and a small grayscale thumbnail. A frame
+    counts as a duplicate only if both agree: the hash is within
+    max_hamming bits and the mean absolute thumbnail difference is below
+    max_diff. Entries expire after max_age seconds, so a long hover still
+    yields an occasional sample. All comparisons are vectorized over the
+    whole index.
+    """
+    THUMB_SIZE = (16, 12)
+
+    def __init__(self, capacity=64, max_hamming=6, max_diff=4.0, max_age=30.0):
+        """
+        :param capacity: Number of recent saves to compare against.
+        :param max_hamming: Hash distance (bits out of 64) still considered similar.
+        :param max_diff: Mean absolute thumbnail difference (0-255) still considered similar.
+        :param max_age: Seconds after which a saved frame no longer suppresses new ones.
+        """
+        self.capacity = capacity
+        self.max_hamming = max_hamming
+        self.max_diff = max_diff
+        self.max_age = max_age
+
+        self.hashes = np.zeros(capacity, dtype=np.uint64)
+        self.thumbs = np.zeros((capacity, self.THUMB_SIZE[1], self.THUMB_SIZE[0]), dtype=np.float32)
+        self.times = np.full(capacity, -np.inf)
+        self._next = 0
+
+    def signature(self, frame):
+        """
+        Computes (hash, thumbnail) for a frame. Downscales once to the thumbnail
+        and derives the hash from it, so the full frame is read only once.
+        """
+        small = cv2.resize(frame, self.THUMB_SIZE, interpolation=cv2.INTER_AREA)
+        thumb = cv2.cvtColor(small, cv2.COLOR_RGB2GRAY) if small.ndim == 3 else small
+        hash_thumb = cv2.resize(thumb, (9, 8), interpolation=cv2.INTER_AREA)
+        return dhash(hash_thumb), thumb.astype(np.float32)
+
+    def is_duplicate(self, signature, now):
+        """Whether the signature matches a saved frame that hasn't expired yet."""
+        frame_hash, thumb = signature
+        live = (now - self.times) < self.max_age
+        if not live.any():
+            return False
+        xor = np.bitwise_xor(self.hashes[live], frame_hash)
+        distance = np.unpackbits(xor.view(np.uint8).reshape(-1, 8), axis=1).sum(axis=1)
+        close = distance <= self.max_hamming
+        if not close.any():
+            return False
+        diff = np.abs(self.thumbs[live][close] - thumb).mean(axis=(1, 2))
+        return bool((diff < self.max_diff).any())
+
+    def add(self, signature, now):
+        """Records a saved frame, replacing the oldest entry."""
+        self.hashes[self._next], self.thumbs[self._next] = signature
+        self.times[self._next] = now
+        self._next = (self._next + 1) % self.capacity
@@ -1,78 +1,263 @@
 import cv2
 import numpy as np
 
+from core.metrics import metrics
+from vision.ring_detector import ring_outline
+
 class ObjectDetector:
-    def __init__(self, model_path):
+    def __init__(self, model_path, backend="auto", num_threads=0):
         """
         Initialize the Object Detector.
         Supports both .pt (PyTorch) and .onnx (ONNX) models via Ultralytics API.
-        
+        .onnx models can instead run on a native onnxruntime backend that skips
+        Ultralytics' per-call overhead entirely.
+
         :param model_path: Path to the .pt or .onnx model file.
+        :param backend: 'auto', 'onnxruntime' or 'ultralytics'. 'auto' uses
+                        onnxruntime for .onnx files when available.
+        :param num_threads: Inference threads for the onnxruntime backend (0 = library default).
         """
         self.model_path = model_path
         self.model = None
         self.is_onnx = model_path.lower().endswith('.onnx')
+        self.backend = backend
+        self.names = {}
+        self.num_threads = num_threads
 
     def load_model(self):
         """
-        Loads the model. 
+        Loads the model.
         """
         print(f"Loading model from {self.model_path}...")
+        if self.is_onnx and self.backend in ('auto', 'onnxruntime'):
+            try:
+                from vision.onnx_backend import OnnxRuntimeModel
+                self.model = OnnxRuntimeModel(self.model_path, num_threads=self.num_threads)
+                self.names = self.model.names
+                self.backend = 'onnxruntime'
+                print("Model loaded successfully (onnxruntime backend).")
+                return
+            except ImportError:
+                print("Error: 'onnxruntime' library not found. Please install requirements.")
+            except Exception as e:
+                print(f"Failed to load model with onnxruntime: {e}")
+            if self.backend == 'onnxruntime':
+                return
+            print("Falling back to Ultralytics backend...")
+
         try:
             from ultralytics import YOLO
             self.model = YOLO(self.model_path, task='detect')
+            self.names = self.model.names
+            self.backend = 'ultralytics'
             print("Model loaded successfully.")
         except ImportError:
             print("Error: 'ultralytics' library not found. Please install requirements.")
         except Exception as e:
             print(f"Failed to load model: {e}")
 
-    def detect(self, frame, conf_threshold=0.5, draw_center=True):
+    def share(self):
+        """
+        Returns a detector for another worker thread. With the onnxruntime
+        backend it reuses this detector's session, so the model is in memory
+        once; Ultralytics predictors keep per-call state, so that backend
+        loads its own copy.
+        """
+        clone = ObjectDetector(self.model_path, backend=self.backend, num_threads=self.num_threads)
+        if self.backend == 'onnxruntime' and self.model is not None:
+            clone.model = self.model.share()
+            clone.names = self.names
+        else:
+            clone.load_model()
+        return clone
+
+    def _build_detections(self, boxes, confs, classes):
+        """
+        Converts raw (N x 4 xyxy, N, N) arrays into detection dicts.
+        All numeric work is vectorized; Python only touches the final lists.
+        """
+        boxes = np.asarray(boxes, dtype=np.float32)
+        centers = ((boxes[:, :2] + boxes[:, 2:]) / 2).astype(np.int32).tolist()
+        int_boxes = boxes.astype(np.int32).tolist()
+        confs = np.asarray(confs, dtype=np.float32).tolist()
+        classes = np.asarray(classes).astype(np.int64).tolist()
+
+        # track_id is assigned afterwards by vision.tracker.IoUTracker
+        return [
+            {
+                'box': box,
+                'center': tuple(center),
+                'conf': conf,
+                'class': cls,
+                'name': self.names.get(cls, str(cls)),
+                'track_id': None
+            }
+            for box, center, conf, cls in zip(int_boxes, centers, confs, classes)
+        ]
+
+    @property
+    def supports_imgsz(self):
+        """Whether predict() can honour a custom input size (fixed-shape ONNX exports can't)."""
+        if self.backend == 'onnxruntime':
+            return self.model is not None and self.model.dynamic
+        return not self.is_onnx
+
+    def predict(self, frame, conf_threshold=0.5, imgsz=None):
+        """
+        Detect-only inference on a single frame. Allocates no annotated copy.
+        :param frame: The video frame (numpy array).
+        :param conf_threshold: Confidence threshold for detections.
+        :param imgsz: Optional square network input size (see supports_imgsz).
+        :return: List of Detections
+        """
+        if self.model is None:
+            return []
+        if not self.supports_imgsz:
+            imgsz = None
+
+        with metrics.span('detect'):
+            if self.backend == 'onnxruntime':
+                return self._build_detections(*self.model.predict(frame, conf_threshold, imgsz))
+
+            # Use .predict instead of .track to avoid 'lap' dependency
+            kwargs = {'imgsz': imgsz} if imgsz else {}
+            results = self.model.predict(frame, conf=conf_threshold, verbose=False, **kwargs)
+            detections = []
+            for result in results:
+                boxes = result.boxes
+                detections.extend(self._build_detections(
+                    boxes.xyxy.cpu().numpy(), boxes.conf.cpu().numpy(), boxes.cls.cpu().numpy()
+                ))
+            return detections
+
+    def detect_batch(self, frames, conf_threshold=0.5, imgsz=None, max_batch=8):
+        """
+        Detect-only inference on several frames or crops, amortizing the
+        per-call overhead over up to max_batch images per model call.
+        :param frames: List of frames/crops (sizes may differ), or an NxHxWx3 stack.
+        :param conf_threshold: Confidence threshold for detections.
+        :param imgsz: Optional square network input size (see supports_imgsz).
+        :param max_batch: Most images per inference call.
+        :return: List of detection lists, one per input image
+        """
+        frames = list(frames)
+        if self.model is None:
+            return [[] for _ in frames]
+        if not self.supports_imgsz:
+            imgsz = None
+
+        metrics.inc('detect_batch_images', len(frames))
+        with metrics.span('detect_batch'):
+            return self._detect_batch(frames, conf_threshold, imgsz, max_batch)
+
+    def _detect_batch(self, frames, conf_threshold, imgsz, max_batch):
+        if self.backend == 'onnxruntime':
+            return [
+                self._build_detections(*result)
+                for result in self.model.predict_batch(frames, conf_threshold, imgsz, max_batch)
+            ]
+
+        # Ultralytics can't tell a fixed-batch ONNX export apart, so feed those one by one
+        chunk = 1 if self.is_onnx else max(1, max_batch)
+        kwargs = {'imgsz': imgsz} if imgsz else {}
+        detections = []
+        for start in range(0, len(frames), chunk):
+            results = self.model.predict(frames[start:start + chunk], conf=conf_threshold,
+                                         verbose=False, **kwargs)
+            detections.extend(
+                self._build_detections(
+                    r.boxes.xyxy.cpu().numpy(), r.boxes.conf.cpu().numpy(), r.boxes.cls.cpu().numpy()
+                )
+                for r in results
+            )
+        return detections
+
+    def predict_region(self, frame, region, conf_threshold=0.5, imgsz=None):
+        """
+        Runs predict() on a crop of the frame and maps results back to frame coordinates.
+        :param frame: The full video frame (numpy array).
+        :param region: (x1, y1, x2, y2) crop in frame pixels.
+        :param conf_threshold: Confidence threshold for detections.
+        :param imgsz: Optional square network input size for the crop.
+        :return: List of Detections in full-frame coordinates
+        """
+        x1, y1, x2, y2 = region
+        detections = self.predict(frame[y1:y2, x1:x2], conf_threshold, imgsz)
+        for d in detections:
+            d['box'] = [d['box'][0] + x1, d['box'][1] + y1, d['box'][2] + x1, d['box'][3] + y1]
+            d['center'] = (d['center'][0] + x1, d['center'][1] + y1)
+        return detections
+
+    def predict_regions(self, frame, regions, conf_threshold=0.5, imgsz=None):
+        """
+        Like predict_region() for several crops of one frame, run as a single batch.
+        :return: List of Detections in full-frame coordinates (all regions combined)
+        """
+        crops = [frame[y1:y2, x1:x2] for x1, y1, x2, y2 in regions]
+        detections = []
+        for (x1, y1, _, _), found in zip(regions, self.detect_batch(crops, conf_threshold, imgsz)):
+            for d in found:
+                d['box'] = [d['box'][0] + x1, d['box'][1] + y1, d['box'][2] + x1, d['box'][3] + y1]
+                d['center'] = (d['center'][0] + x1, d['center'][1] + y1)
+            detections.extend(found)
+        return detections
+
+    def render(self, frame, detections, draw_center=True):
+        """
+        Draws detections onto a copy of the frame. Only call this when a
+        consumer actually needs an annotated image.
+        :param frame: The video frame (numpy array).
+        :param detections: List of detection dicts, e.g. from predict().
+        :param draw_center: Whether to label the center point of each box.
+        :return: Annotated copy of the frame
+        """
+        annotated_frame = draw_detections(frame.copy(), detections)
+        if draw_center:
+            for d in detections:
+                cx, cy = d['center']
+                cv2.putText(annotated_frame, f"{cx},{cy}", (cx + 10, cy),
+                            cv2.FONT_HERSHEY_SIMPLEX, 0.5, (0, 255, 0), 1)
+        return annotated_frame
+
+    def detect(self, frame, conf_threshold=0.5, draw_center=True, annotate=True):
         """
         Performs inference on a single frame.
         :param frame: The video frame (numpy array).
         :param conf_threshold: Confidence threshold for detections.
         :param draw_center: Whether to draw the center point of the bounding box.
+        :param annotate: If False, skips rendering and returns the input frame untouched.
         :return: Tuple(Annotated Frame, List of Detections)
         """
-        if self.model is None:
-            return frame, []
+        detections = self.predict(frame, conf_threshold)
+        if not annotate or self.model is None:
+            return frame, detections
+        return self.render(frame, detections, draw_center), detections
 
-        # Use .predict instead of .track to avoid 'lap' dependency
-        results = self.model.predict(frame, conf=conf_threshold, verbose=False)
-        
-        detections = []
-        # plot() returns the image in BGR
-        annotated_frame = results[0].plot() 
-
-        for result in results:
-            for box in result.boxes:
-                x1, y1, x2, y2 = box.xyxy[0].tolist()
-                conf = float(box.conf[0])
-                cls = int(box.cls[0])
-                name = self.model.names[cls]
-                
-                # track_id is not available in .predict mode
-                track_id = None
-
-                # Calculate center
-                cx = int((x1 + x2) / 2)
-                cy = int((y1 + y2) / 2)
-
-                if draw_center:
-                    # Draw a bright green circle at the center
-                    cv2.circle(annotated_frame, (cx, cy), 5, (0, 255, 0), -1)
-                    # Optional: Draw coordinates text
-                    cv2.putText(annotated_frame, f"{cx},{cy}", (cx + 10, cy), 
-                                cv2.FONT_HERSHEY_SIMPLEX, 0.5, (0, 255, 0), 1)
-
-                detections.append({
-                    'box': [int(x1), int(y1), int(x2), int(y2)],
-                    'center': (cx, cy),
-                    'conf': conf,
-                    'class': cls,
-                    'name': name,
-                    'track_id': track_id
-                })
-
-        return annotated_frame, detections
+
+def draw_detections(frame, detections):
+    """
+    Draws boxes and centers on the frame in place.
+    """
+    for d in detections:
+        box = d['box']
+        x1, y1, x2, y2 = box
+
+        # Draw Box (Green)
+        cv2.rectangle(frame, (x1, y1), (x2, y2), (0, 255, 0), 2)
+
+        # Fitted ring outline (RingDetector estimates)
+        if 'radius' in d:
+            outline = np.round(ring_outline(d)).astype(np.int32)
+            cv2.polylines(frame, [outline], True, (255, 255, 0), 2)
+
+        # Draw Center
+        cx, cy = d['center']
+        cv2.circle(frame, (cx, cy), 5, (0, 0, 255), -1) # Red center dot
+
+        # Label
+        track_id = d.get('track_id')
+        id_text = f"ID: {track_id} " if track_id is not None else ""
+        label = f"{id_text}{d['name']} {d['conf']:.2f}"
+
+        cv2.putText(frame, label, (x1, y1 - 10), cv2.FONT_HERSHEY_SIMPLEX, 0.5, (0, 255, 0), 2)
+    return frame
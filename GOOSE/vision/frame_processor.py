@@ -0,0 +1,132 @@
+import time
+
+from vision.roi import RoiPlanner
+from vision.tracker import IoUTracker
+
+
+class FrameProcessor:
+    """
+    One step of the vision loop, shared by VisionWorker (thread) and the
+    inference process: decides whether the detector runs on a frame, keeps
+    the tracker up to date and feeds the sampler. With a scheduler attached,
+    stride, input size and ROI-only passes follow the scheduler's plan;
+    ROI passes run crops around tracked targets (see RoiPlanner). With a
+    ring detector, rings are re-measured on the frames YOLO skips instead
+    of only being extrapolated (see RingDetector).
+    """
+    # Detector runs a track (and a ring seed) must survive unmatched, so a
+    # target only drops out after this many misses at any stride
+    MISSED_RUNS = 3
+
+    def __init__(self, detector, sampler, tracker=None, scheduler=None, detect_every=1,
+                 roi_planner=None, ring_detector=None):
+        """
+        :param detector: Loaded ObjectDetector.
+        :param sampler: HybridSampler fed with every detector result.
+        :param tracker: IoUTracker (one is created if omitted). Its max_age is raised
+                        to cover MISSED_RUNS detector runs at the largest stride.
+        :param scheduler: Optional InferenceScheduler; overrides detect_every and
+                          switches ROI passes on and off.
+        :param detect_every: Fixed stride used without a scheduler.
+        :param roi_planner: Optional RoiPlanner; without a scheduler, passing one
+                            keeps ROI mode always on.
+        :param ring_detector: Optional RingDetector, seeded on every detector run.
+        """
+        self.detector = detector
+        self.sampler = sampler
+        self.tracker = tracker if tracker is not None else IoUTracker() # Empty trackers are falsy
+        self.scheduler = scheduler
+        self.detect_every = max(1, detect_every)
+        self.roi_planner = roi_planner
+        self.ring_detector = ring_detector
+
+        # Ages count frames, so they have to grow with the gap between detector runs
+        max_stride = scheduler.max_stride if scheduler else self.detect_every
+        min_age = self.MISSED_RUNS * max_stride
+        self.tracker.max_age = max(self.tracker.max_age, min_age)
+        if ring_detector:
+            ring_detector.max_age = max(ring_detector.max_age, min_age)
+        if scheduler and scheduler.allow_roi and roi_planner is None:
+            self.roi_planner = RoiPlanner()
+        self.last_detect_seq = 0
+        self.last_regions = None
+
+    def status(self):
+        """Human-readable summary of the current inference plan."""
+        if self.scheduler:
+            text = self.scheduler.describe()
+        else:
+            text = f"Detect every {self.detect_every} frame(s)"
+        if self.roi_planner and self._roi_active():
+            text += f" | ROI crops: {len(self.last_regions) if self.last_regions else 'full scan'}"
+        return text
+
+    def _roi_active(self):
+        if self.roi_planner is None:
+            return False
+        return self.scheduler.roi if self.scheduler else True
+
+    def _should_detect(self, seq):
+        if self.scheduler:
+            return self.scheduler.should_detect(seq, self.last_detect_seq)
+        return not self.last_detect_seq or seq - self.last_detect_seq >= self.detect_every
+
+    def _detect(self, frame, seq, conf_threshold):
+        imgsz = self.scheduler.imgsz if self.scheduler else None
+        regions = None
+        if self._roi_active():
+            regions = self.roi_planner.plan(self.tracker.predict(seq), frame.shape)
+
+        if regions is None:
+            detections = self.detector.predict(frame, conf_threshold=conf_threshold, imgsz=imgsz)
+        else:
+            roi_imgsz = min(imgsz, self.roi_planner.imgsz) if imgsz else self.roi_planner.imgsz
+            # All crops go through the detector in one batch
+            detections = self.detector.predict_regions(
+                frame, regions, conf_threshold=conf_threshold, imgsz=roi_imgsz
+            )
+
+        if self._roi_active():
+            self.roi_planner.observe(detections, regions)
+        self.last_regions = regions
+        return detections
+
+    def process(self, packet, conf_threshold):
+        """
+        Processes one new frame.
+        :param packet: FramePacket (seq, timestamp, frame).
+        :param conf_threshold: Display confidence threshold.
+        :return: Tuple(display detections, whether the detector ran)
+        """
+        if self.scheduler:
+            self.scheduler.observe_frame(packet.timestamp)
+
+        if not self._should_detect(packet.seq):
+            # In-between frame: extrapolate tracks instead of running YOLO
+            predicted = self.tracker.predict(packet.seq)
+            if self.ring_detector:
+                predicted = self.ring_detector.track(packet.frame, packet.seq, predicted)
+            return [d for d in predicted if d['conf'] >= conf_threshold], False
+
+        self.last_detect_seq = packet.seq
+        # Run detection at 0.20 to capture uncertainty candidates (0.2-0.6)
+        sampling_threshold = min(0.20, conf_threshold)
+
+        start = time.monotonic()
+        all_detections = self._detect(packet.frame, packet.seq, sampling_threshold)
+        inferred = time.monotonic()
+        self.tracker.update(all_detections, packet.seq)
+        if self.ring_detector:
+            self.ring_detector.seed(packet.frame, all_detections, packet.seq)
+        tracked = time.monotonic()
+
+        # Process sampling (Context + Uncertainty)
+        self.sampler.process_frame(packet.frame, all_detections, now=packet.timestamp)
+
+        if self.scheduler:
+            self.scheduler.record('inference', inferred - start)
+            self.scheduler.record('tracking', tracked - inferred)
+            self.scheduler.record('sampling', time.monotonic() - tracked)
+            self.scheduler.on_detection(tracked, packet.timestamp)
+
+        return [d for d in all_detections if d['conf'] >= conf_threshold], True
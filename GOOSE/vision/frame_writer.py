@@ -0,0 +1,167 @@
+import threading
+import time
+from collections import deque
+
+import numpy as np
+
+DROP_POLICIES = ('oldest', 'newest', 'context-first', 'block')
+
+
+class FrameWriteQueue:
+    """
+    Bounded background writer for sampled frames.
+
+    - At most queue_size frames wait to be written. When full, the drop
+      policy decides what goes: 'oldest' evicts the frame queued longest,
+      'newest' rejects the incoming one, 'context-first' evicts the oldest
+      queued context frame (uncertain frames are worth more) and only then
+      falls back to 'oldest'. 'block' makes submit() wait for room instead;
+      it is meant for offline replay, where losing samples is worse than
+      slowing down.
+    - Frames are copied into buffers from a fixed pool (queue_size +
+      workers per frame shape) instead of a fresh copy per save, so memory
+      is bounded no matter how slow the disk is.
+    - Counters for queued, dropped and written frames plus write latency
+      are kept in stats.
+    """
+    def __init__(self, write_fn, workers=2, queue_size=16, drop_policy='context-first'):
+        """
+        :param write_fn: Callable(target, frame) doing the actual write; returns False on failure.
+        :param workers: Writer threads.
+        :param queue_size: Maximum frames waiting to be written.
+        :param drop_policy: 'oldest', 'newest', 'context-first' or 'block' (see class docstring).
+        """
+        if drop_policy not in DROP_POLICIES:
+            raise ValueError(f"Unknown drop policy: {drop_policy}")
+        self.write_fn = write_fn
+        self.queue_size = queue_size
+        self.drop_policy = drop_policy
+        self.pool_size = queue_size + workers
+
+        self._queue = deque() # (kind, target, buffer, enqueue time)
+        self._free = {} # (shape, dtype) -> free buffers
+        self._allocated = {} # (shape, dtype) -> buffers created so far
+        self._cond = threading.Condition()
+        self._running = True
+
+        self.stats = {'queued': 0, 'written': 0, 'failed': 0, 'dropped': 0,
+                      'dropped_context': 0, 'dropped_uncertain': 0, 'max_depth': 0,
+                      'write_ms_avg': 0.0, 'write_ms_max': 0.0, 'latency_ms_max': 0.0}
+        self._write_ms_total = 0.0
+
+        self._threads = [threading.Thread(target=self._run, daemon=True) for _ in range(workers)]
+        for thread in self._threads:
+            thread.start()
+
+    @property
+    def depth(self):
+        return len(self._queue)
+
+    def _acquire(self, frame):
+        key = (frame.shape, frame.dtype)
+        free = self._free.setdefault(key, [])
+        if free:
+            return free.pop()
+        if self._allocated.get(key, 0) < self.pool_size:
+            self._allocated[key] = self._allocated.get(key, 0) + 1
+            return np.empty_like(frame)
+        return None
+
+    def _release(self, buffer):
+        self._free.setdefault((buffer.shape, buffer.dtype), []).append(buffer)
+
+    def _drop(self, kind):
+        self.stats['dropped'] += 1
+        self.stats[f'dropped_{kind}'] = self.stats.get(f'dropped_{kind}', 0) + 1
+
+    def _evict(self, kind):
+        """Makes room for an incoming frame of the given kind. Returns False to reject it."""
+        if not self._queue or self.drop_policy in ('newest', 'block'):
+            return False
+        index = 0
+        if self.drop_policy == 'context-first':
+            index = next((i for i, item in enumerate(self._queue) if item[0] == 'context'), None)
+            if index is None:
+                if kind == 'context':
+                    return False # Never push out an uncertain frame for a context one
+                index = 0
+        evicted = self._queue[index]
+        del self._queue[index]
+        self._release(evicted[2])
+        self._drop(evicted[0])
+        return True
+
+    def submit(self, kind, target, frame):
+        """
+        Queues a copy of the frame for writing. Never blocks on the disk
+        (unless the policy is 'block').
+        :param kind: 'context' or 'uncertain'.
+        :param target: Destination or record passed to write_fn.
+        :param frame: Frame to save; copied into a pooled buffer.
+        :return: False if the frame was rejected.
+        """
+        with self._cond:
+            if not self._running:
+                return False
+            if self.drop_policy == 'block':
+                self._cond.wait_for(lambda: len(self._queue) < self.queue_size or not self._running)
+                if not self._running:
+                    return False
+            buffer = None
+            if len(self._queue) < self.queue_size:
+                buffer = self._acquire(frame)
+            while buffer is None:
+                if not self._evict(kind):
+                    self._drop(kind)
+                    return False
+                buffer = self._acquire(frame)
+
+            np.copyto(buffer, frame)
+            self._queue.append((kind, target, buffer, time.monotonic()))
+            self.stats['queued'] += 1
+            self.stats['max_depth'] = max(self.stats['max_depth'], len(self._queue))
+            self._cond.notify()
+        return True
+
+    def _run(self):
+        while True:
+            with self._cond:
+                self._cond.wait_for(lambda: self._queue or not self._running)
+                if not self._queue:
+                    return # Stopped and drained
+                kind, target, buffer, queued_at = self._queue.popleft()
+
+            start = time.monotonic()
+            try:
+                ok = self.write_fn(target, buffer) is not False
+            except Exception as e:
+                print(f"[Sampler] Error saving image: {e}")
+                ok = False
+            done = time.monotonic()
+
+            with self._cond:
+                self._release(buffer)
+                self.stats['written' if ok else 'failed'] += 1
+                write_ms = (done - start) * 1000
+                self._write_ms_total += write_ms
+                finished = self.stats['written'] + self.stats['failed']
+                self.stats['write_ms_avg'] = self._write_ms_total / finished
+                self.stats['write_ms_max'] = max(self.stats['write_ms_max'], write_ms)
+                self.stats['latency_ms_max'] = max(self.stats['latency_ms_max'], (done - queued_at) * 1000)
+                self._cond.notify_all()
+
+    def close(self, timeout=5.0):
+        """
+        Stops accepting frames and flushes the queue. Frames still queued after
+        timeout seconds are dropped, so shutdown time stays bounded.
+        """
+        with self._cond:
+            self._running = False
+            self._cond.notify_all()
+            self._cond.wait_for(lambda: not self._queue, timeout)
+            while self._queue:
+                kind, _, buffer, _ = self._queue.popleft()
+                self._release(buffer)
+                self._drop(kind)
+        for thread in self._threads:
+            thread.join()
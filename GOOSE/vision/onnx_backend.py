@@ -0,0 +1,221 @@
+import ast
+import copy
+import json
+import os
+
+import cv2
+import numpy as np
+
+# Ultralytics pads letterboxed images with this grey value
+LETTERBOX_FILL = 114
+
+
+def _load_artifact_names(model_path):
+    """Reads class names from model_artifacts.json next to the model, if present."""
+    artifacts = os.path.join(os.path.dirname(model_path), "model_artifacts.json")
+    try:
+        with open(artifacts) as f:
+            names = json.load(f).get("names", [])
+        return {i: n for i, n in enumerate(names)}
+    except (OSError, ValueError):
+        return {}
+
+
+class LetterboxBuffer:
+    """
+    Preallocated letterbox canvas and NCHW input tensor for one input size.
+    Pre-processing mirrors Ultralytics' LetterBox so results line up with the
+    `ultralytics.YOLO` path.
+    """
+    def __init__(self, imgsz):
+        """
+        :param imgsz: (height, width) of the network input.
+        """
+        self.imgsz = imgsz
+        self.canvas = np.full((*imgsz, 3), LETTERBOX_FILL, dtype=np.uint8)
+        self.input = np.empty((1, 3, *imgsz), dtype=np.float32)
+        self._geometry_key = None
+        self._geometry = None
+
+    def geometry(self, frame_shape):
+        """Returns (gain, (new_w, new_h), (left, top)) for a source shape, cached."""
+        if frame_shape != self._geometry_key:
+            src_h, src_w = frame_shape
+            dst_h, dst_w = self.imgsz
+            gain = min(dst_h / src_h, dst_w / src_w)
+            new_w, new_h = int(round(src_w * gain)), int(round(src_h * gain))
+            left = int(round((dst_w - new_w) / 2 - 0.1))
+            top = int(round((dst_h - new_h) / 2 - 0.1))
+
+            # Borders change with the geometry, so repaint the whole canvas once
+            self.canvas.fill(LETTERBOX_FILL)
+            self._geometry_key = frame_shape
+            self._geometry = (gain, (new_w, new_h), (left, top))
+        return self._geometry
+
+    def load(self, frame, out=None):
+        """
+        Letterboxes a frame into the canvas and normalizes it into the input tensor.
+        :param out: (3, H, W) float32 destination, e.g. one slot of a batch tensor
+                    (defaults to this buffer's own input).
+        :return: Tuple(gain, left, top) needed to map boxes back to the frame.
+        """
+        gain, (new_w, new_h), (left, top) = self.geometry(frame.shape[:2])
+        region = self.canvas[top:top + new_h, left:left + new_w]
+        if (new_w, new_h) == (frame.shape[1], frame.shape[0]):
+            region[...] = frame
+        else:
+            cv2.resize(frame, (new_w, new_h), dst=region, interpolation=cv2.INTER_LINEAR)
+
+        # HWC (BGR, like Ultralytics assumes) -> CHW RGB float in [0, 1], in one pass
+        np.multiply(
+            self.canvas[..., ::-1].transpose(2, 0, 1), np.float32(1 / 255),
+            out=self.input[0] if out is None else out
+        )
+        return gain, left, top
+
+
+def decode_end2end(preds, conf_threshold, gain, left, top, frame_shape):
+    """
+    Decodes one image's end2end rows into frame coordinates.
+    :param preds: (max_det, 6) array of [x1, y1, x2, y2, score, class] in input pixels.
+    :return: Tuple(boxes Nx4 float32 xyxy in frame pixels, scores N, class ids N)
+    """
+    preds = preds[preds[:, 4] > conf_threshold]
+    boxes = preds[:, :4].copy()
+    xs, ys = boxes[:, 0::2], boxes[:, 1::2]  # views onto x1,x2 / y1,y2
+    xs -= left
+    ys -= top
+    boxes /= gain
+    np.clip(xs, 0, frame_shape[1], out=xs)
+    np.clip(ys, 0, frame_shape[0], out=ys)
+    return boxes, preds[:, 4], preds[:, 5].astype(np.int64)
+
+
+class OnnxRuntimeModel:
+    """
+    Runs an end2end (NMS-free) YOLO ONNX export directly on onnxruntime.
+
+    The end2end head emits (batch, max_det, 6) rows of
+    [x1, y1, x2, y2, score, class] in letterboxed input coordinates, so
+    decoding is a confidence mask plus an affine rescale — no NMS needed.
+    """
+    def __init__(self, model_path, providers=None, num_threads=0):
+        """
+        :param model_path: Path to the .onnx model file.
+        :param providers: onnxruntime execution providers (defaults to CPU).
+        :param num_threads: intra-op threads for onnxruntime (0 = library default).
+        """
+        import onnxruntime as ort
+
+        options = ort.SessionOptions()
+        options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        if num_threads:
+            options.intra_op_num_threads = num_threads
+
+        self.session = ort.InferenceSession(
+            model_path, sess_options=options,
+            providers=providers or ["CPUExecutionProvider"]
+        )
+        model_input = self.session.get_inputs()[0]
+        model_output = self.session.get_outputs()[0]
+        self.input_name = model_input.name
+        self.output_name = model_output.name
+
+        if isinstance(model_output.shape[-1], int) and model_output.shape[-1] != 6:
+            raise ValueError(
+                f"Expected an end2end output of shape (N, max_det, 6), got {model_output.shape}"
+            )
+
+        metadata = self.session.get_modelmeta().custom_metadata_map
+        self.names = self._parse_names(metadata) or _load_artifact_names(model_path)
+
+        height, width = model_input.shape[2], model_input.shape[3]
+        # Dynamic exports accept any input size (multiple of the model stride)
+        self.dynamic = not (isinstance(height, int) and isinstance(width, int))
+        if self.dynamic:
+            # Default to the training image size
+            imgsz = ast.literal_eval(metadata.get("imgsz", "[640, 640]"))
+            height, width = imgsz if isinstance(imgsz, (list, tuple)) else (imgsz, imgsz)
+        self.imgsz = (int(height), int(width))
+
+        # Fixed-batch exports must always be fed exactly that many images
+        batch = model_input.shape[0]
+        self.fixed_batch = batch if isinstance(batch, int) else None
+
+        # Preallocated buffers per input size, reused for every frame
+        self._buffers = {}
+        self._batch_inputs = {}
+
+    def share(self):
+        """
+        Returns a copy for use on another thread: the InferenceSession (and
+        so the weights) is shared, since run() may be called concurrently;
+        only the preallocated input buffers are per-copy.
+        """
+        clone = copy.copy(self)
+        clone._buffers = {}
+        clone._batch_inputs = {}
+        return clone
+
+    @staticmethod
+    def _parse_names(metadata):
+        names = metadata.get("names")
+        if not names:
+            return {}
+        try:
+            return {int(k): v for k, v in ast.literal_eval(names).items()}
+        except (ValueError, SyntaxError, AttributeError):
+            return {}
+
+    def _buffer(self, imgsz=None):
+        size = (imgsz, imgsz) if imgsz and self.dynamic else self.imgsz
+        buffer = self._buffers.get(size)
+        if buffer is None:
+            buffer = self._buffers[size] = LetterboxBuffer(size)
+        return buffer
+
+    def _batch_input(self, size, n):
+        key = (size, n)
+        tensor = self._batch_inputs.get(key)
+        if tensor is None:
+            tensor = self._batch_inputs[key] = np.zeros((n, 3, *size), dtype=np.float32)
+        return tensor
+
+    def predict(self, frame, conf_threshold=0.5, imgsz=None):
+        """
+        Runs inference on a single frame.
+        :param frame: The video frame (HxWx3 uint8 numpy array).
+        :param conf_threshold: Minimum score for a row to be kept.
+        :param imgsz: Square input size to use; ignored by fixed-shape exports.
+        :return: Tuple(boxes Nx4 float32 xyxy in frame pixels, scores N, class ids N)
+        """
+        buffer = self._buffer(imgsz)
+        gain, left, top = buffer.load(frame)
+        preds = self.session.run([self.output_name], {self.input_name: buffer.input})[0][0]
+        return decode_end2end(preds, conf_threshold, gain, left, top, frame.shape)
+
+    def predict_batch(self, frames, conf_threshold=0.5, imgsz=None, max_batch=8):
+        """
+        Runs inference on several frames (or crops of any size) with one
+        session call per chunk of max_batch images.
+        :param frames: List of HxWx3 uint8 arrays, or an NxHxWx3 stack.
+        :param conf_threshold: Minimum score for a row to be kept.
+        :param imgsz: Square input size to use; ignored by fixed-shape exports.
+        :param max_batch: Most images per session call (fixed-batch exports use their own).
+        :return: List of (boxes, scores, class ids) tuples, one per frame
+        """
+        buffer = self._buffer(imgsz)
+        chunk = self.fixed_batch or max(1, max_batch)
+        results = []
+        for start in range(0, len(frames), chunk):
+            part = frames[start:start + chunk]
+            # Fixed-batch exports get the unused tail slots as padding
+            tensor = self._batch_input(buffer.imgsz, self.fixed_batch or len(part))
+            geometry = [buffer.load(frame, out=tensor[i]) for i, frame in enumerate(part)]
+            preds = self.session.run([self.output_name], {self.input_name: tensor})[0]
+            results.extend(
+                decode_end2end(preds[i], conf_threshold, gain, left, top, frame.shape)
+                for i, (frame, (gain, left, top)) in enumerate(zip(part, geometry))
+            )
+        return results
@@ -0,0 +1,320 @@
+import math
+
+import cv2
+import numpy as np
+
+from core.metrics import metrics
+from vision.tracker import iou_matrix
+
+# Points sampled along a fitted ellipse to measure how much of it the colour mask backs
+OUTLINE_SAMPLES = 48
+_OUTLINE_ANGLES = np.linspace(0, 2 * np.pi, OUTLINE_SAMPLES, endpoint=False)
+_HUES = np.arange(180)
+_KERNEL = np.ones((3, 3), np.uint8)
+
+
+def ellipse_box(center, radius, minor, angle):
+    """Axis-aligned [x1, y1, x2, y2] box around a rotated ellipse (angle in degrees)."""
+    theta = math.radians(angle)
+    half_x = math.hypot(radius * math.cos(theta), minor * math.sin(theta))
+    half_y = math.hypot(radius * math.sin(theta), minor * math.cos(theta))
+    cx, cy = center
+    return [int(cx - half_x), int(cy - half_y), int(cx + half_x), int(cy + half_y)]
+
+
+def ring_outline(detection, samples=OUTLINE_SAMPLES):
+    """
+    Points along a ring estimate's outer edge (from radius, tilt and angle),
+    for drawing; the one routine both the cv2 and the pygame overlay use.
+    :return: (samples, 2) float array in frame pixels
+    """
+    radius = detection['radius']
+    minor = radius * math.cos(math.radians(detection['tilt']))
+    theta = math.radians(detection['angle'])
+    angles = np.linspace(0, 2 * np.pi, samples, endpoint=False)
+    ex, ey = radius * np.cos(angles), minor * np.sin(angles)
+    cx, cy = detection['center']
+    return np.stack([cx + ex * math.cos(theta) - ey * math.sin(theta),
+                     cy + ex * math.sin(theta) + ey * math.cos(theta)], axis=1)
+
+
+class RingDetector:
+    """
+    Classical-CV fast path for ring obstacles between detector runs.
+
+    Every detector run seeds it: for each tracked ring, candidate hues are
+    taken from the box outline (a ring is coloured around its edge and
+    empty in the middle), and a seed is only accepted for a hue whose
+    fitted ellipse matches the detector's box. On the frames in between,
+    each seeded ring is found again by masking its hue in a small search
+    window around its last position (downscaled to at most work_size px),
+    fitting ellipses to the outer contours and keeping the one the mask
+    backs best that has an empty middle and a plausible size. That costs
+    about a millisecond per ring, so ring estimates keep up with the
+    camera while YOLO runs every few frames.
+
+    Estimates are detection dicts (same keys as ObjectDetector.predict()
+    and the tracker) with three extras:
+    - radius: half the major axis of the outer edge in pixels; a tilted
+      circle keeps its full width along one axis, so this stays the
+      ring's true radius;
+    - tilt: degrees the ring is turned away from facing the camera, from
+      the axis ratio (0 = head-on; the sign is ambiguous);
+    - angle: direction of the major axis in degrees (0-180), i.e. the
+      axis the ring is turned about.
+    Seeds expire when the detector hasn't confirmed them for max_age frames.
+    """
+    def __init__(self, target_names=('Target',), work_size=192, search_margin=0.6, hue_margin=10,
+                 min_sat=80, min_val=60, min_support=0.6, max_hole=0.25, min_iou=0.5,
+                 max_radius_change=0.3, max_age=30, min_radius=6):
+        """
+        :param target_names: Class names that are rings.
+        :param work_size: Longest side search windows are downscaled to.
+        :param search_margin: Search window around the last estimate, as a fraction of the radius.
+        :param hue_margin: Accepted hue distance from the learned ring hue (OpenCV hue, 0-180).
+        :param min_sat: Minimum saturation of ring pixels.
+        :param min_val: Minimum brightness of ring pixels.
+        :param min_support: Fraction of the fitted outline the colour mask must cover.
+        :param max_hole: Largest ring-colour coverage of the inner half (rejects filled blobs).
+        :param min_iou: Overlap a seeding fit needs with the detector's box.
+        :param max_radius_change: Largest relative radius change accepted between frames.
+        :param max_age: Frames a seed stays usable without a detector confirmation.
+        :param min_radius: Smallest ring radius in pixels worth fitting.
+        """
+        self.target_names = set(target_names)
+        self.work_size = work_size
+        self.search_margin = search_margin
+        self.hue_margin = hue_margin
+        self.min_sat = min_sat
+        self.min_val = min_val
+        self.min_support = min_support
+        self.max_hole = max_hole
+        self.min_iou = min_iou
+        self.max_radius_change = max_radius_change
+        self.max_age = max_age
+        self.min_radius = min_radius
+
+        self.seeds = {} # track_id -> seed state (hue, last ellipse, velocity, ...)
+        self.stats = {'seeded': 0, 'rejected': 0, 'tracked': 0, 'lost': 0}
+
+    def _window(self, frame, center, half):
+        """
+        Cuts a square window around center and downscales it to at most work_size.
+        :return: Tuple(HSV window, (left, top) offset, scale), or None if it's empty.
+        """
+        height, width = frame.shape[:2]
+        cx, cy = center
+        left, top = max(0, int(cx - half)), max(0, int(cy - half))
+        right, bottom = min(width, int(cx + half)), min(height, int(cy + half))
+        if right - left < 8 or bottom - top < 8:
+            return None
+        crop = frame[top:bottom, left:right]
+        # Integer factors keep INTER_AREA on OpenCV's fast block-averaging path
+        factor = math.ceil(max(crop.shape[:2]) / self.work_size)
+        if factor > 1:
+            crop = cv2.resize(crop, None, fx=1 / factor, fy=1 / factor, interpolation=cv2.INTER_AREA)
+        return cv2.cvtColor(crop, cv2.COLOR_RGB2HSV), (left, top), crop.shape[1] / (right - left)
+
+    def _mask(self, hsv, hue):
+        """Pixels within hue_margin of hue (wrapping around red) that are saturated and bright."""
+        low, high = hue - self.hue_margin, hue + self.hue_margin
+        mask = cv2.inRange(hsv, (max(low, 0), self.min_sat, self.min_val), (min(high, 179), 255, 255))
+        if low < 0:
+            mask |= cv2.inRange(hsv, (low + 180, self.min_sat, self.min_val), (179, 255, 255))
+        elif high > 179:
+            mask |= cv2.inRange(hsv, (0, self.min_sat, self.min_val), (high - 180, 255, 255))
+        return cv2.morphologyEx(mask, cv2.MORPH_CLOSE, _KERNEL)
+
+    def _candidate_hues(self, hsv, box, offset, scale, count=3):
+        """
+        Strongest hues on the ring band of a detector box: saturated, bright
+        pixels between 60% and 105% of the box's half-size from its centre.
+        Background can outweigh a thin ring there, so the top few peaks
+        (more than hue_margin apart) are returned for the fit to decide.
+        """
+        left, top = offset
+        x1, x2 = (box[0] - left) * scale, (box[2] - left) * scale
+        y1, y2 = (box[1] - top) * scale, (box[3] - top) * scale
+        rows, cols = np.ogrid[:hsv.shape[0], :hsv.shape[1]]
+        rx, ry = max((x2 - x1) / 2, 1), max((y2 - y1) / 2, 1)
+        r = np.sqrt(((cols - (x1 + x2) / 2) / rx) ** 2 + ((rows - (y1 + y2) / 2) / ry) ** 2)
+        band = (r >= 0.6) & (r <= 1.05)
+        coloured = band & (hsv[..., 1] >= self.min_sat) & (hsv[..., 2] >= self.min_val)
+        if coloured.sum() < 0.05 * band.sum():
+            return []
+
+        counts = np.bincount(hsv[..., 0][coloured], minlength=180)[:180].astype(np.float32)
+        # Light circular smoothing against compression noise
+        smoothed = np.convolve(np.concatenate([counts[-2:], counts, counts[:2]]), np.ones(5, np.float32), 'valid')
+        hues = []
+        for _ in range(count):
+            hue = int(np.argmax(smoothed))
+            if not smoothed[hue]:
+                break
+            hues.append(hue)
+            smoothed[np.abs((_HUES - hue + 90) % 180 - 90) <= self.hue_margin] = 0
+        return hues
+
+    def _fits(self, hsv, hue, offset, scale, center, reach):
+        """
+        Fits ellipses to the biggest outer contours of a hue's mask within
+        reach of center, and keeps those shaped like a ring: enough of the
+        outline backed by the mask, an empty middle, a usable size.
+        :return: List of (center, radius, minor radius, angle, support) in frame pixels.
+        """
+        left, top = offset
+        mask = self._mask(hsv, hue)
+        # Ignore the window's corners, which can't hold the expected ring
+        prior = np.zeros_like(mask)
+        cv2.circle(prior, (int((center[0] - left) * scale), int((center[1] - top) * scale)),
+                   int(reach * scale) + 2, 255, -1)
+        mask &= prior
+
+        contours, _ = cv2.findContours(mask, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_NONE)
+        if not contours:
+            return []
+        contours = sorted(contours, key=cv2.contourArea, reverse=True)[:3]
+        largest = cv2.contourArea(contours[0])
+        # The biggest pieces on their own, and together: a partly hidden ring breaks into arcs
+        candidates = list(contours)
+        big = [c for c in contours if cv2.contourArea(c) >= 0.2 * largest]
+        if len(big) > 1:
+            candidates.append(np.vstack(big))
+
+        dilated = cv2.dilate(mask, _KERNEL)
+        fits = []
+        for points in candidates:
+            if len(points) < 5:
+                continue
+            (cx, cy), (w, h), angle = cv2.fitEllipse(points)
+            if not (w > 0 and h > 0):
+                continue
+            if h > w:
+                w, h, angle = h, w, angle + 90
+
+            theta = np.deg2rad(angle)
+            ex, ey = w / 2 * np.cos(_OUTLINE_ANGLES), h / 2 * np.sin(_OUTLINE_ANGLES)
+            xs = np.round(cx + ex * np.cos(theta) - ey * np.sin(theta)).astype(np.int64)
+            ys = np.round(cy + ex * np.sin(theta) + ey * np.cos(theta)).astype(np.int64)
+            inside = (xs >= 0) & (xs < mask.shape[1]) & (ys >= 0) & (ys < mask.shape[0])
+            support = float((dilated[ys[inside], xs[inside]] > 0).sum()) / OUTLINE_SAMPLES
+
+            core = np.zeros_like(mask)
+            cv2.ellipse(core, ((cx, cy), (w / 2, h / 2), angle), 255, -1)
+            hole = float(mask[core > 0].mean()) / 255 if core.any() else 0.0
+
+            radius = w / 2 / scale
+            if support >= self.min_support and hole <= self.max_hole and radius >= self.min_radius:
+                fits.append(((cx / scale + left, cy / scale + top), radius, h / 2 / scale, angle % 180, support))
+        return fits
+
+    def _estimate(self, seed, fit):
+        """Builds a detection dict from a fit."""
+        center, radius, minor, angle, _ = fit
+        return {
+            'box': ellipse_box(center, radius, minor, angle),
+            'center': (int(center[0]), int(center[1])),
+            'conf': seed['conf'],
+            'class': seed['class'],
+            'name': seed['name'],
+            'track_id': seed['track_id'],
+            'radius': round(radius, 1),
+            'tilt': round(math.degrees(math.acos(min(1.0, minor / radius))), 1),
+            'angle': round(angle, 1)
+        }
+
+    def seed(self, frame, detections, seq):
+        """
+        Learns or refreshes rings from a detector run. Accepted detections get
+        radius, tilt and angle filled in.
+        :param frame: The RGB frame the detections came from.
+        :param detections: Tracked detection dicts (with track_id).
+        :param seq: Sequence number of the frame.
+        :return: The same detection dicts.
+        """
+        with metrics.span('ring_seed'):
+            for d in detections:
+                if d['name'] not in self.target_names or d.get('track_id') is None:
+                    continue
+                if self._seed_one(frame, d, seq):
+                    self.stats['seeded'] += 1
+                else:
+                    self.seeds.pop(d['track_id'], None)
+                    self.stats['rejected'] += 1
+        self._expire(seq)
+        return detections
+
+    def _seed_one(self, frame, detection, seq):
+        x1, y1, x2, y2 = detection['box']
+        half = max(x2 - x1, y2 - y1) / 2
+        window = self._window(frame, detection['center'], half * 1.15)
+        if half < self.min_radius or window is None:
+            return False
+
+        # The colour fit has to describe the same ring the detector saw
+        hsv, offset, scale = window
+        box = np.array([detection['box']], dtype=np.float32)
+        best = None
+        for hue in self._candidate_hues(hsv, detection['box'], offset, scale):
+            for fit in self._fits(hsv, hue, offset, scale, detection['center'], half * 1.5):
+                iou = iou_matrix(np.array([ellipse_box(*fit[:4])], dtype=np.float32), box)[0, 0]
+                if iou >= self.min_iou and (best is None or fit[4] > best[1][4]):
+                    best = (hue, fit)
+        if best is None:
+            return False
+
+        hue, fit = best
+        seed = {'track_id': detection['track_id'], 'class': detection['class'], 'name': detection['name'],
+                'conf': detection['conf'], 'hue': hue, 'center': fit[0], 'radius': fit[1],
+                'velocity': (0.0, 0.0), 'seq': seq, 'confirmed': seq}
+        self.seeds[detection['track_id']] = seed
+        estimate = self._estimate(seed, fit)
+        detection.update(radius=estimate['radius'], tilt=estimate['tilt'], angle=estimate['angle'])
+        return True
+
+    def track(self, frame, seq, predicted):
+        """
+        Re-finds seeded rings in a frame the detector skipped.
+        :param frame: The RGB frame.
+        :param seq: Its sequence number.
+        :param predicted: Tracker predictions for the frame (detection dicts).
+        :return: predicted, with seeded rings replaced by fresh estimates where the fit holds.
+        """
+        self._expire(seq)
+        if not self.seeds:
+            return predicted
+        with metrics.span('ring_track'):
+            return [self._track_one(frame, seq, d) if d.get('track_id') in self.seeds else d
+                    for d in predicted]
+
+    def _track_one(self, frame, seq, prediction):
+        seed = self.seeds[prediction['track_id']]
+        steps = max(seq - seed['seq'], 1)
+        radius = seed['radius']
+        center = (seed['center'][0] + seed['velocity'][0] * steps,
+                  seed['center'][1] + seed['velocity'][1] * steps)
+        window = self._window(frame, center, radius * (1 + self.search_margin) + 4)
+        best = None
+        if window:
+            hsv, offset, scale = window
+            for fit in self._fits(hsv, seed['hue'], offset, scale, center,
+                                  radius * (1 + self.max_radius_change) * 1.1):
+                if (abs(fit[1] - radius) <= self.max_radius_change * radius
+                        and math.dist(fit[0], center) <= 0.5 * radius
+                        and (best is None or fit[4] > best[4])):
+                    best = fit
+        if best is None:
+            self.stats['lost'] += 1
+            return prediction
+
+        seed['velocity'] = ((best[0][0] - seed['center'][0]) / steps, (best[0][1] - seed['center'][1]) / steps)
+        seed['center'], seed['radius'], seed['seq'] = best[0], best[1], seq
+        self.stats['tracked'] += 1
+        return self._estimate(seed, best)
+
+    def _expire(self, seq):
+        for track_id in [t for t, s in self.seeds.items() if seq - s['confirmed'] > self.max_age]:
+            del self.seeds[track_id]
+
+    def reset(self):
+        self.seeds = {}
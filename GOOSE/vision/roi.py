@@ -0,0 +1,106 @@
+class RoiPlanner:
+    """
+    Plans region-of-interest passes for the navigation loop.
+
+    Between full-frame scans, only small crops around the predicted
+    positions of tracked targets are run through the detector at a small
+    input size. The planner falls back to a full-frame scan periodically,
+    when a target was missed by its crop, or when target confidence drops.
+
+    Note: the speed-up needs a detector that honours a smaller input size
+    (.pt models or dynamic ONNX exports); fixed-shape exports letterbox
+    every crop back up to their native size.
+    """
+    def __init__(self, target_names=('Target',), imgsz=320, margin=0.6, min_crop=160,
+                 full_scan_every=10, min_conf=0.4, max_misses=1):
+        """
+        :param target_names: Class names worth following with crops.
+        :param imgsz: Network input size for crops.
+        :param margin: Extra context around a box on each side, as a fraction of its size.
+        :param min_crop: Minimum crop side in pixels.
+        :param full_scan_every: Force a full-frame scan every N detector runs.
+        :param min_conf: Below this target confidence, rescan the full frame.
+        :param max_misses: Consecutive ROI passes that may lose a target before rescanning.
+        """
+        self.target_names = set(target_names)
+        self.imgsz = imgsz
+        self.margin = margin
+        self.min_crop = min_crop
+        self.full_scan_every = full_scan_every
+        self.min_conf = min_conf
+        self.max_misses = max_misses
+
+        self.runs_since_full = 0
+        self.misses = 0
+        self.force_full = True
+
+    def _crop_around(self, box, frame_shape):
+        height, width = frame_shape[:2]
+        x1, y1, x2, y2 = box
+        side = max(x2 - x1, y2 - y1) * (1 + 2 * self.margin)
+        side = int(min(max(side, self.min_crop), width, height))
+        cx, cy = (x1 + x2) // 2, (y1 + y2) // 2
+        left = min(max(0, cx - side // 2), width - side)
+        top = min(max(0, cy - side // 2), height - side)
+        return [left, top, left + side, top + side]
+
+    @staticmethod
+    def _merge(regions):
+        """
+        Merges overlapping crops so no object is detected twice. A grown crop
+        can reach crops it was already compared with, so passes repeat until
+        nothing changes.
+        """
+        merged = [list(r) for r in regions]
+        changed = True
+        while changed:
+            changed = False
+            result = []
+            for region in sorted(merged):
+                for other in result:
+                    if (region[0] < other[2] and other[0] < region[2]
+                            and region[1] < other[3] and other[1] < region[3]):
+                        other[0], other[1] = min(other[0], region[0]), min(other[1], region[1])
+                        other[2], other[3] = max(other[2], region[2]), max(other[3], region[3])
+                        changed = True
+                        break
+                else:
+                    result.append(region)
+            merged = result
+        return [tuple(r) for r in merged]
+
+    def plan(self, predicted, frame_shape):
+        """
+        Decides the next detector pass.
+        :param predicted: Tracker predictions (detection dicts) for the current frame.
+        :param frame_shape: Shape of the frame to be processed.
+        :return: List of (x1, y1, x2, y2) crops, or None for a full-frame scan.
+        """
+        targets = [d for d in predicted if d['name'] in self.target_names]
+        if (self.force_full or not targets
+                or self.runs_since_full >= self.full_scan_every):
+            return None
+        return self._merge(self._crop_around(d['box'], frame_shape) for d in targets)
+
+    def observe(self, detections, regions):
+        """
+        Feeds back the result of the pass planned by plan().
+        :param detections: Detections found in that pass (full-frame coordinates).
+        :param regions: What plan() returned (None = full scan).
+        """
+        targets = [d for d in detections if d['name'] in self.target_names]
+        if regions is None:
+            self.runs_since_full = 0
+            self.misses = 0
+            self.force_full = not targets
+            return
+
+        self.runs_since_full += 1
+        # Every crop was placed around a target, so an empty crop means a lost target
+        found = sum(
+            any(r[0] <= d['center'][0] < r[2] and r[1] <= d['center'][1] < r[3] for d in targets)
+            for r in regions
+        )
+        self.misses = self.misses + 1 if found < len(regions) else 0
+        low_conf = bool(targets) and max(d['conf'] for d in targets) < self.min_conf
+        self.force_full = self.misses > self.max_misses or low_conf
@@ -1,72 +1,171 @@
 import cv2
 import os
 import time
-from concurrent.futures import ThreadPoolExecutor
+
+from core.dataset_store import DatasetWriter, wallclock
+from core.metrics import metrics
+from vision.dedup import FrameHashIndex
+from vision.frame_writer import FrameWriteQueue
 
 class HybridSampler:
     """
     Implements Hybrid Sampling for Active Learning.
     - Context Collection: Saves frames at a fixed interval (e.g., 5 FPS).
     - Uncertainty Collection: Saves frames where model confidence is between 0.20 and 0.60.
+    - Near-duplicates of recently saved frames are skipped (see FrameHashIndex), and
+      uncertainty saves are rate-limited per track, so hovering doesn't flood the disk.
+    - Writes go through a bounded FrameWriteQueue with pooled buffers, so a slow
+      disk costs dropped samples, never memory growth or a long shutdown.
+    - Samples are packed into a DatasetWriter store (JPEG + capture time, reason
+      and detections per record) instead of millions of loose files.
     """
-    def __init__(self, base_dir="./flight_data", context_fps=5, stream_fps=30):
+    def __init__(self, base_dir="./flight_data", context_fps=5, stream_fps=30,
+                 dedup=True, uncertain_interval=1.0, write_queue_size=16,
+                 drop_policy='context-first', write_workers=2, jpeg_quality=95):
+        """
+        :param base_dir: Directory of the packed sample store.
+        :param context_fps: Target rate of context saves.
+        :param stream_fps: Rate at which process_frame() is called.
+        :param dedup: Skip frames too similar to recently saved ones.
+        :param uncertain_interval: Minimum seconds between uncertainty saves of the same
+                                   track (or class, for untracked detections).
+        :param write_queue_size: Maximum frames waiting for the disk.
+        :param drop_policy: What to drop when that queue is full: 'oldest', 'newest'
+                            or 'context-first'.
+        :param write_workers: Writer threads (JPEG encoding runs on them).
+        :param jpeg_quality: JPEG quality of stored frames.
+        """
         # Use absolute path to avoid confusion about where files are being saved
         self.base_dir = os.path.abspath(base_dir)
-        self.context_dir = os.path.join(self.base_dir, "context")
-        self.uncertain_dir = os.path.join(self.base_dir, "uncertain")
-        
-        os.makedirs(self.context_dir, exist_ok=True)
-        os.makedirs(self.uncertain_dir, exist_ok=True)
-        
+        self.store = DatasetWriter(self.base_dir)
+        self.encode_params = [cv2.IMWRITE_JPEG_QUALITY, jpeg_quality]
+
         print(f"[Sampler] Initialized. Saving to: {self.base_dir}")
         
         # Calculate frame interval to achieve desired context FPS
         self.context_interval = max(1, int(stream_fps / context_fps))
         self.frame_count = 0
+
+        # Separate indexes, so a context save never suppresses a more informative uncertain one
+        self.context_index = FrameHashIndex() if dedup else None
+        self.uncertain_index = FrameHashIndex() if dedup else None
+        self.uncertain_interval = uncertain_interval
+        self._last_uncertain = {} # track key -> time of its last uncertainty save
+        self.stats = {'context_saved': 0, 'uncertain_saved': 0, 'duplicates_skipped': 0,
+                      'rate_limited': 0}
         
-        # Use a ThreadPoolExecutor for lightweight, non-blocking disk writes
-        self.executor = ThreadPoolExecutor(max_workers=2)
+        # Bounded, non-blocking disk writes
+        self.writer = FrameWriteQueue(self._save_image, workers=write_workers,
+                                      queue_size=write_queue_size, drop_policy=drop_policy)
 
-    def _save_image(self, path, frame_rgb):
-        """Helper to save image in background. Converts RGB to BGR for OpenCV."""
-        try:
+    def _save_image(self, record, frame_rgb):
+        """
+        Helper to encode and store a sample in background. Converts RGB to BGR for OpenCV.
+        frame_rgb is a pooled buffer owned by the writer, so it is converted in place.
+        """
+        with metrics.span('sampler_write'):
             # Tello frames from djitellopy are RGB
-            frame_bgr = cv2.cvtColor(frame_rgb, cv2.COLOR_RGB2BGR)
-            success = cv2.imwrite(path, frame_bgr)
+            frame_bgr = cv2.cvtColor(frame_rgb, cv2.COLOR_RGB2BGR, dst=frame_rgb)
+            success, encoded = cv2.imencode('.jpg', frame_bgr, self.encode_params)
             if not success:
-                print(f"[Sampler] Failed to write image to {path}")
-            # Success is silent to avoid flooding the console, 
+                print(f"[Sampler] Failed to encode {record['reason']} frame {record['frame']}")
+                return False
+            # Success is silent to avoid flooding the console,
             # but you can add a print here if you want to see every save.
-        except Exception as e:
-            print(f"[Sampler] Error saving image: {e}")
+            self.store.append(encoded.tobytes(), record)
+        return True
+
+    def _record(self, reason, now, detections):
+        return {
+            'reason': reason,
+            'frame': self.frame_count,
+            'time': now,
+            'wallclock': wallclock(now),
+            'detections': [{k: d[k] for k in ('box', 'conf', 'class', 'name', 'track_id') if k in d}
+                           for d in detections],
+        }
+
+    @property
+    def write_stats(self):
+        """Counters of the write queue (queued, dropped, written, latency)."""
+        return dict(self.writer.stats, depth=self.writer.depth)
 
-    def process_frame(self, frame, detections):
+    @staticmethod
+    def _track_key(detection):
+        track_id = detection.get('track_id')
+        return ('track', track_id) if track_id is not None else ('class', detection.get('name'))
+
+    def _is_new(self, index, frame, now, signature=None):
+        """Checks a frame against a dedup index; returns (is_new, signature)."""
+        if index is None:
+            return True, None
+        signature = signature or index.signature(frame)
+        if index.is_duplicate(signature, now):
+            self.stats['duplicates_skipped'] += 1
+            return False, signature
+        return True, signature
+
+    def process_frame(self, frame, detections, now=None):
         """
         Main entry point for sampling logic. Call this within your inference loop.
         :param frame: The raw video frame (numpy array).
         :param detections: List of detection dicts.
+        :param now: Capture time in seconds (e.g. FramePacket.timestamp); defaults to
+                    time.monotonic(). Drives dedup expiry and the per-track rate limit.
         """
+        with metrics.span('sampler_enqueue'):
+            self._process_frame(frame, detections, now)
+        metrics.set('sampler_queue_depth', self.writer.depth)
+
+    def _process_frame(self, frame, detections, now):
         self.frame_count += 1
-        timestamp = int(time.time())
+        if now is None:
+            now = time.monotonic()
+        signature = None
         
         # 1. Context Collection (Fixed FPS)
         if self.frame_count % self.context_interval == 0:
-            context_path = os.path.join(self.context_dir, f"context_{timestamp}_{self.frame_count}.jpg")
-            self.executor.submit(self._save_image, context_path, frame.copy())
+            is_new, signature = self._is_new(self.context_index, frame, now)
+            if is_new:
+                if self.context_index:
+                    self.context_index.add(signature, now)
+                self.writer.submit('context', self._record('context', now, detections), frame)
+                self.stats['context_saved'] += 1
 
         # 2. Uncertainty Collection (Confidence between 0.20 and 0.60)
         uncertain_detections = [d for d in detections if 0.20 <= d.get('conf', 0) <= 0.60]
-        
+
+        # Only tracks that haven't triggered a save recently count
         if uncertain_detections:
+            due = [d for d in uncertain_detections
+                   if now - self._last_uncertain.get(self._track_key(d), -float('inf'))
+                   >= self.uncertain_interval]
+            if not due:
+                self.stats['rate_limited'] += 1
+            uncertain_detections = due
+
+        if uncertain_detections:
+            is_new, signature = self._is_new(self.uncertain_index, frame, now, signature)
+            if not is_new:
+                uncertain_detections = []
+
+        if uncertain_detections:
+            for d in uncertain_detections:
+                self._last_uncertain[self._track_key(d)] = now
+            if len(self._last_uncertain) > 256: # Forget tracks that are long gone
+                self._last_uncertain = {k: t for k, t in self._last_uncertain.items()
+                                        if now - t < self.uncertain_interval}
+            if self.uncertain_index:
+                self.uncertain_index.add(signature, now)
+            self.stats['uncertain_saved'] += 1
+
             best_conf = uncertain_detections[0]['conf']
-            uncertain_path = os.path.join(
-                self.uncertain_dir, 
-                f"uncertain_{best_conf:.2f}_{timestamp}.jpg"
-            )
             print(f"[Sampler] Uncertainty Trigger! Conf: {best_conf:.2f}. Saving frame...")
-            self.executor.submit(self._save_image, uncertain_path, frame.copy())
+            self.writer.submit('uncertain', self._record('uncertain', now, detections), frame)
 
-    def close(self):
-        """Shut down the background executor."""
-        print("[Sampler] Shutting down...")
-        self.executor.shutdown(wait=True) # Wait for final writes on exit
\ No newline at end of file
+    def close(self, timeout=5.0):
+        """Flushes pending writes (for at most timeout seconds) and stops the writer."""
+        print(f"[Sampler] Shutting down... {self.stats}")
+        self.writer.close(timeout)
+        self.store.close()
+        print(f"[Sampler] Writes: {self.write_stats}")
\ No newline at end of file
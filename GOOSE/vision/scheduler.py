@@ -0,0 +1,118 @@
+class InferenceScheduler:
+    """
+    Adapts how the vision loop spends its time to hold a target detection
+    rate and a maximum frame-to-detection latency.
+
+    Knobs, from cheapest to most accurate:
+    - stride: run the detector every N frames (tracker fills the gaps)
+    - roi: detect only around tracked targets instead of the full frame
+    - imgsz: network input size (only if the detector supports it)
+
+    Per-stage latencies are tracked as exponential moving averages in seconds.
+    """
+    def __init__(self, target_dps=10.0, max_latency=0.2, imgsz_levels=(640, 512, 416, 320),
+                 allow_imgsz=True, allow_roi=True, max_stride=6, adapt_every=10, smoothing=0.2):
+        """
+        :param target_dps: Detector runs per second to aim for.
+        :param max_latency: Maximum seconds from frame capture to detection result.
+        :param imgsz_levels: Input sizes to step through, largest first.
+        :param allow_imgsz: Whether the detector can change its input size.
+        :param allow_roi: Whether ROI-only passes may be used.
+        :param max_stride: Upper bound for the frame-skip stride.
+        :param adapt_every: Detector runs between two adaptation steps (hysteresis).
+        :param smoothing: EMA weight of the newest measurement.
+        """
+        self.target_dps = target_dps
+        self.max_latency = max_latency
+        self.imgsz_levels = tuple(imgsz_levels) if allow_imgsz else (None,)
+        self.allow_roi = allow_roi
+        self.max_stride = max_stride
+        self.adapt_every = adapt_every
+        self.smoothing = smoothing
+
+        self.level = 0
+        self.roi = False
+        self.stride = 1
+        self.stages = {}
+        self.frame_interval = None
+        self.detect_rate = 0.0
+        self._last_frame_time = None
+        self._last_detect_time = None
+        self._runs_since_adapt = 0
+
+    @property
+    def imgsz(self):
+        return self.imgsz_levels[self.level]
+
+    def _ema(self, old, new):
+        return new if old is None else old + self.smoothing * (new - old)
+
+    def record(self, stage, seconds):
+        """Records one latency measurement for a named stage."""
+        self.stages[stage] = self._ema(self.stages.get(stage), seconds)
+
+    def observe_frame(self, timestamp):
+        """Call once per new frame with its capture timestamp to track the stream rate."""
+        if self._last_frame_time is not None and timestamp > self._last_frame_time:
+            self.frame_interval = self._ema(self.frame_interval, timestamp - self._last_frame_time)
+        self._last_frame_time = timestamp
+
+    def should_detect(self, seq, last_detect_seq):
+        """Whether the detector should run on frame seq."""
+        return not last_detect_seq or seq - last_detect_seq >= self.stride
+
+    def on_detection(self, now, frame_timestamp):
+        """
+        Call after each detector run.
+        :param now: time.monotonic() when the result became available.
+        :param frame_timestamp: Capture timestamp of the frame that was processed.
+        """
+        self.record('latency', now - frame_timestamp)
+        if self._last_detect_time is not None and now > self._last_detect_time:
+            self.detect_rate = self._ema(self.detect_rate or None, 1.0 / (now - self._last_detect_time))
+        self._last_detect_time = now
+
+        self._runs_since_adapt += 1
+        if self._runs_since_adapt >= self.adapt_every:
+            self._runs_since_adapt = 0
+            self._adapt()
+
+    def _adapt(self):
+        budget = 1.0 / self.target_dps
+        inference = self.stages.get('inference', 0.0)
+        latency = self.stages.get('latency', 0.0)
+
+        if inference > budget or latency > self.max_latency:
+            # Overloaded: shrink the work per run
+            if self.allow_roi and not self.roi:
+                self.roi = True
+            elif self.level < len(self.imgsz_levels) - 1:
+                self.level += 1
+        elif inference < 0.5 * budget and latency < 0.5 * self.max_latency:
+            # Plenty of headroom: buy accuracy back, largest gain first
+            if self.level > 0:
+                self.level -= 1
+            elif self.roi:
+                self.roi = False
+
+        # Don't run the detector more often than the target rate needs
+        if self.frame_interval:
+            stream_fps = 1.0 / self.frame_interval
+            self.stride = max(1, min(self.max_stride, int(stream_fps / self.target_dps)))
+
+    def status(self):
+        """Snapshot of what the scheduler is currently doing (for OSD/logging)."""
+        return {
+            'imgsz': self.imgsz,
+            'stride': self.stride,
+            'roi': self.roi,
+            'detect_rate': round(self.detect_rate, 1),
+            'stages_ms': {k: round(v * 1000, 1) for k, v in self.stages.items()},
+        }
+
+    def describe(self):
+        """One-line summary of status(), e.g. for the pygame OSD."""
+        size = f"{self.imgsz}px" if self.imgsz else "native"
+        mode = "ROI" if self.roi else "full"
+        latency = self.stages.get('latency', 0.0) * 1000
+        return f"Sched: {size} {mode} stride {self.stride} | {self.detect_rate:.1f} det/s | {latency:.0f} ms"
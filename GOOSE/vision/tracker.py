@@ -0,0 +1,157 @@
+import numpy as np
+
+
+def iou_matrix(boxes_a, boxes_b):
+    """
+    Pairwise IoU between two sets of xyxy boxes.
+    :return: (len(boxes_a), len(boxes_b)) float array
+    """
+    top_left = np.maximum(boxes_a[:, None, :2], boxes_b[None, :, :2])
+    bottom_right = np.minimum(boxes_a[:, None, 2:], boxes_b[None, :, 2:])
+    inter = np.prod(np.clip(bottom_right - top_left, 0, None), axis=2)
+    area_a = np.prod(boxes_a[:, 2:] - boxes_a[:, :2], axis=1)
+    area_b = np.prod(boxes_b[:, 2:] - boxes_b[:, :2], axis=1)
+    return inter / (area_a[:, None] + area_b[None, :] - inter + 1e-9)
+
+
+class IoUTracker:
+    """
+    Lightweight multi-object tracker (no 'lap' dependency).
+
+    Detections are associated to existing tracks by greedy IoU matching
+    against each track's constant-velocity prediction. Velocities are in
+    pixels per frame (frame = FrameBus sequence number), so tracks can be
+    extrapolated to any later frame between detector runs.
+    """
+    def __init__(self, iou_threshold=0.3, max_age=15, velocity_smoothing=0.5):
+        """
+        :param iou_threshold: Minimum IoU for a detection to continue a track.
+        :param max_age: Frames a track survives without a matching detection.
+        :param velocity_smoothing: Weight of the newest velocity measurement (0-1).
+        """
+        self.iou_threshold = iou_threshold
+        self.max_age = max_age
+        self.velocity_smoothing = velocity_smoothing
+        self.next_id = 1
+
+        # Track state as parallel arrays
+        self.boxes = np.empty((0, 4), dtype=np.float32)
+        self.velocities = np.empty((0, 4), dtype=np.float32)
+        self.ids = np.empty(0, dtype=np.int64)
+        self.classes = np.empty(0, dtype=np.int64)
+        self.confs = np.empty(0, dtype=np.float32)
+        self.last_seen = np.empty(0, dtype=np.int64)
+        self.names = []
+
+    def __len__(self):
+        return len(self.ids)
+
+    def _predicted_boxes(self, seq):
+        steps = (seq - self.last_seen).astype(np.float32)[:, None]
+        return self.boxes + self.velocities * steps
+
+    def update(self, detections, seq):
+        """
+        Associates a fresh set of detections with the tracks and assigns IDs.
+        :param detections: List of detection dicts from ObjectDetector.predict().
+        :param seq: Sequence number of the frame the detections came from.
+        :return: The same detection dicts with 'track_id' filled in.
+        """
+        if detections:
+            det_boxes = np.array([d['box'] for d in detections], dtype=np.float32)
+            det_classes = np.array([d['class'] for d in detections], dtype=np.int64)
+        else:
+            det_boxes = np.empty((0, 4), dtype=np.float32)
+            det_classes = np.empty(0, dtype=np.int64)
+
+        matched_tracks = np.full(len(detections), -1, dtype=np.int64)
+        if len(self) and len(detections):
+            iou = iou_matrix(self._predicted_boxes(seq), det_boxes)
+            iou[self.classes[:, None] != det_classes[None, :]] = 0
+
+            # Greedy assignment, best pairs first
+            order = np.argsort(-iou, axis=None)
+            track_idx, det_idx = np.unravel_index(order, iou.shape)
+            valid = iou[track_idx, det_idx] >= self.iou_threshold
+            used_tracks = set()
+            for t, d in zip(track_idx[valid].tolist(), det_idx[valid].tolist()):
+                if t in used_tracks or matched_tracks[d] >= 0:
+                    continue
+                used_tracks.add(t)
+                matched_tracks[d] = t
+
+        # Continue matched tracks
+        has_track = matched_tracks >= 0
+        if has_track.any():
+            t = matched_tracks[has_track]
+            steps = np.maximum(seq - self.last_seen[t], 1).astype(np.float32)[:, None]
+            measured = (det_boxes[has_track] - self.boxes[t]) / steps
+            a = self.velocity_smoothing
+            self.velocities[t] = a * measured + (1 - a) * self.velocities[t]
+            self.boxes[t] = det_boxes[has_track]
+            self.confs[t] = [d['conf'] for d, m in zip(detections, has_track) if m]
+            self.last_seen[t] = seq
+
+        # Start new tracks for unmatched detections
+        new = np.flatnonzero(~has_track)
+        if len(new):
+            new_ids = np.arange(self.next_id, self.next_id + len(new))
+            self.next_id += len(new)
+            matched_tracks[new] = np.arange(len(self), len(self) + len(new))
+            self.boxes = np.vstack([self.boxes, det_boxes[new]])
+            self.velocities = np.vstack([self.velocities, np.zeros((len(new), 4), np.float32)])
+            self.ids = np.concatenate([self.ids, new_ids])
+            self.classes = np.concatenate([self.classes, det_classes[new]])
+            self.confs = np.concatenate([self.confs, [detections[i]['conf'] for i in new]]).astype(np.float32)
+            self.last_seen = np.concatenate([self.last_seen, np.full(len(new), seq, np.int64)])
+            self.names.extend(detections[i]['name'] for i in new)
+
+        for d, t in zip(detections, matched_tracks.tolist()):
+            d['track_id'] = int(self.ids[t])
+
+        self._prune(seq)
+        return detections
+
+    def _prune(self, seq):
+        alive = (seq - self.last_seen) <= self.max_age
+        if alive.all():
+            return
+        self.boxes = self.boxes[alive]
+        self.velocities = self.velocities[alive]
+        self.ids = self.ids[alive]
+        self.classes = self.classes[alive]
+        self.confs = self.confs[alive]
+        self.last_seen = self.last_seen[alive]
+        self.names = [n for n, keep in zip(self.names, alive.tolist()) if keep]
+
+    def predict(self, seq):
+        """
+        Extrapolates all live tracks to frame seq without running the detector.
+        :param seq: Sequence number of the frame to predict boxes for.
+        :return: List of detection dicts (same format as ObjectDetector.predict()).
+        """
+        self._prune(seq)
+        if not len(self):
+            return []
+        boxes = self._predicted_boxes(seq)
+        centers = ((boxes[:, :2] + boxes[:, 2:]) / 2).astype(np.int32).tolist()
+        return [
+            {
+                'box': box,
+                'center': tuple(center),
+                'conf': conf,
+                'class': cls,
+                'name': name,
+                'track_id': track_id
+            }
+            for box, center, conf, cls, name, track_id in zip(
+                boxes.astype(np.int32).tolist(), centers, self.confs.tolist(),
+                self.classes.tolist(), self.names, self.ids.tolist()
+            )
+        ]
+
+    def reset(self):
+        """Drops all tracks (IDs keep counting up)."""
+        next_id = self.next_id
+        self.__init__(self.iou_threshold, self.max_age, self.velocity_smoothing)
+        self.next_id = next_id